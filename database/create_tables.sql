@@ -37,7 +37,11 @@ DROP TABLE IF EXISTS `exercises`;
 CREATE TABLE `exercises` (
   `id` INT AUTO_INCREMENT PRIMARY KEY,
   `name` VARCHAR(100) NOT NULL,
-  `instructions` VARCHAR(500)
+  `name_key` VARCHAR(100) NOT NULL,
+  `instructions` VARCHAR(500),
+
+  -- name_key is the normalised name (trimmed, single spaces, lower case)
+  UNIQUE KEY `uq_exercises_name_key` (`name_key`)
 );
 
 
@@ -70,6 +74,13 @@ CREATE TABLE `user_completed_workouts` (
   `user_id` INT NOT NULL,
   `workout_id` INT NOT NULL,
   `date_completed` DATE NOT NULL,
+  `idempotency_key` VARCHAR(64) NULL,
+
+  -- Retries with the same key record one completion; NULL keys never clash
+  UNIQUE KEY `uq_user_completed_idempotency` (`user_id`, `idempotency_key`),
+
+  -- Per-user history by date, and the activity calendar's distinct days
+  KEY `idx_user_completed_date` (`user_id`, `date_completed`),
 
   FOREIGN KEY (`user_id`) REFERENCES users(id)
     ON DELETE CASCADE,
@@ -94,3 +105,72 @@ CREATE TABLE `user_favorite_workouts` (
   FOREIGN KEY (`workout_id`) REFERENCES workouts(id)
     ON DELETE CASCADE
 );
+
+
+-- BULK LOAD CHECKPOINTS (progress of resumable bulk loads, one row per shard)
+
+DROP TABLE IF EXISTS `bulk_load_checkpoints`;
+
+CREATE TABLE `bulk_load_checkpoints` (
+  `load_id` CHAR(40) NOT NULL,
+  `shard` INT NOT NULL,
+  `start_offset` BIGINT NOT NULL,
+  `end_offset` BIGINT NOT NULL,
+  `first_id` INT NULL,
+  `byte_offset` BIGINT NOT NULL,
+  `rows_loaded` BIGINT NOT NULL,
+  `done` TINYINT(1) NOT NULL DEFAULT 0,
+
+  PRIMARY KEY (`load_id`, `shard`)
+);
+
+
+-- CHANGE LOG (one row per inserted entity or link, for delta sync)
+
+DROP TABLE IF EXISTS `change_log`;
+
+CREATE TABLE `change_log` (
+  `version` BIGINT UNSIGNED AUTO_INCREMENT PRIMARY KEY,
+  `entity` VARCHAR(20) NOT NULL,
+  `key1` INT NOT NULL,
+  `key2` INT NOT NULL DEFAULT 0,
+  `changed_at` DATETIME(3) NOT NULL DEFAULT CURRENT_TIMESTAMP(3),
+
+  UNIQUE KEY `uq_change_log_entity` (`entity`, `key1`, `key2`)
+);
+
+-- Held by change-logging transactions until commit, so versions are
+-- allocated in commit order.
+
+DROP TABLE IF EXISTS `change_log_clock`;
+
+CREATE TABLE `change_log_clock` (
+  `id` TINYINT NOT NULL PRIMARY KEY
+);
+
+INSERT INTO `change_log_clock` (`id`) VALUES (1);
+
+
+-- USER PROFILES (materialized per-user JSON documents)
+
+DROP TABLE IF EXISTS `user_profiles`;
+
+CREATE TABLE `user_profiles` (
+  `user_id` INT NOT NULL PRIMARY KEY,
+  `document` JSON NOT NULL,
+  `stale` TINYINT(1) NOT NULL DEFAULT 0,
+  `updated_at` DATETIME(3) NOT NULL DEFAULT CURRENT_TIMESTAMP(3)
+    ON UPDATE CURRENT_TIMESTAMP(3),
+
+  FOREIGN KEY (`user_id`) REFERENCES users(id)
+    ON DELETE CASCADE
+);
+
+
+-- USER ID SEQUENCE (user ids for sharded deployments, used on shard 0)
+
+DROP TABLE IF EXISTS `user_id_sequence`;
+
+CREATE TABLE `user_id_sequence` (
+  `id` INT AUTO_INCREMENT PRIMARY KEY
+);
@@ -0,0 +1,20 @@
+#!/bin/bash
+
+# Create and seed the fitness_app_plans schema on the local server for
+# `main.py -c CONFIG check-plans --database fitness_app_plans`.
+# Usage: ./initialize_plan_check.sh
+
+db="fitness_app_plans"
+
+mkdir -p logs
+d=$(date)
+
+echo $d": Creating $db..." | tee -a logs/create_plan_check.log
+mysql -e "DROP DATABASE IF EXISTS $db; CREATE DATABASE $db;" 2>&1 \
+    | tee -a logs/create_plan_check.log
+sed "s/USE \`fitness_app\`/USE \`$db\`/" create_tables.sql | mysql 2>&1 \
+    | tee -a logs/create_plan_check.log
+echo $d": Seeding $db..." | tee -a logs/create_plan_check.log
+mysql < seed_plan_check.sql 2>&1 | tee -a logs/create_plan_check.log
+mysql -e "GRANT SELECT, INSERT, UPDATE, DELETE ON \`$db\`.* TO 'fitness_app_user'@'%';" 2>&1 \
+    | tee -a logs/create_plan_check.log
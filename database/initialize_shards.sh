@@ -0,0 +1,21 @@
+#!/bin/bash
+
+# Create N shard schemas (fitness_app_shard0 .. fitness_app_shard<N-1>) on
+# the local server, each with the full table set, for sharded mode.
+# Usage: ./initialize_shards.sh [N]   (default 2)
+
+shards=${1:-2}
+
+mkdir -p logs
+d=$(date)
+
+for ((i = 0; i < shards; i++)); do
+    db="fitness_app_shard$i"
+    echo $d": Creating $db..." | tee -a logs/create_shards.log
+    mysql -e "DROP DATABASE IF EXISTS $db; CREATE DATABASE $db;" 2>&1 \
+        | tee -a logs/create_shards.log
+    sed "s/USE \`fitness_app\`/USE \`$db\`/" create_tables.sql | mysql 2>&1 \
+        | tee -a logs/create_shards.log
+    mysql -e "GRANT SELECT, INSERT, UPDATE, DELETE ON \`$db\`.* TO 'fitness_app_user'@'%';" 2>&1 \
+        | tee -a logs/create_shards.log
+done
@@ -20,16 +20,16 @@ VALUES ('Core Strength Builder', 'Strengthen the abdominal and lower back muscle
 SET @core = LAST_INSERT_ID();
 
 -- Exercises
-INSERT INTO exercises (name, instructions)
-VALUES ('Push-Ups', 'Keep your back straight and lower yourself to the floor.');
+INSERT INTO exercises (name, name_key, instructions)
+VALUES ('Push-Ups', 'push-ups', 'Keep your back straight and lower yourself to the floor.');
 SET @pushups = LAST_INSERT_ID();
 
-INSERT INTO exercises (name, instructions)
-VALUES ('Squats', 'Stand with feet shoulder-width apart, bend at the knees.');
+INSERT INTO exercises (name, name_key, instructions)
+VALUES ('Squats', 'squats', 'Stand with feet shoulder-width apart, bend at the knees.');
 SET @squats = LAST_INSERT_ID();
 
-INSERT INTO exercises (name, instructions)
-VALUES ('Plank', 'Hold plank position for 30 seconds.');
+INSERT INTO exercises (name, name_key, instructions)
+VALUES ('Plank', 'plank', 'Hold plank position for 30 seconds.');
 SET @plank = LAST_INSERT_ID();
 
 -- Assign exercises to workouts
@@ -47,3 +47,17 @@ VALUES (@olivia, @fullbody, '2025-01-15'),
 INSERT INTO user_favorite_workouts (user_id, workout_id)
 VALUES (@olivia, @core),
        (@jose, @fullbody);
+
+-- Record the seed rows in the change log (as migration 003 does)
+INSERT INTO change_log (entity, key1, key2)
+SELECT 'user', id, 0 FROM users ORDER BY id;
+INSERT INTO change_log (entity, key1, key2)
+SELECT 'exercise', id, 0 FROM exercises ORDER BY id;
+INSERT INTO change_log (entity, key1, key2)
+SELECT 'workout', id, 0 FROM workouts ORDER BY id;
+INSERT INTO change_log (entity, key1, key2)
+SELECT 'workout_exercise', workout_id, exercise_id FROM workout_exercises;
+INSERT INTO change_log (entity, key1, key2)
+SELECT 'favorite', user_id, workout_id FROM user_favorite_workouts;
+INSERT INTO change_log (entity, key1, key2)
+SELECT 'completion', id, 0 FROM user_completed_workouts ORDER BY id;
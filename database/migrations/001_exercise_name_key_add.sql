@@ -0,0 +1,8 @@
+-- Step 1 of 2: add the normalised exercise name column (nullable for now).
+-- Then run: python src/main.py -c CONFIG compact-exercises
+-- which merges duplicates and fills name_key, followed by step 2.
+
+USE `fitness_app`;
+
+ALTER TABLE `exercises`
+  ADD COLUMN `name_key` VARCHAR(100) NULL AFTER `name`;
@@ -0,0 +1,8 @@
+-- Step 2 of 2: enforce one exercise per normalised name.
+-- Run after compact-exercises has filled name_key and merged duplicates.
+
+USE `fitness_app`;
+
+ALTER TABLE `exercises`
+  MODIFY COLUMN `name_key` VARCHAR(100) NOT NULL,
+  ADD UNIQUE KEY `uq_exercises_name_key` (`name_key`);
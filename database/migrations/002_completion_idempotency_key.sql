@@ -0,0 +1,8 @@
+-- Add optional idempotency keys to completions. Existing rows keep NULL,
+-- which the unique key treats as distinct.
+
+USE `fitness_app`;
+
+ALTER TABLE `user_completed_workouts`
+  ADD COLUMN `idempotency_key` VARCHAR(64) NULL AFTER `date_completed`,
+  ADD UNIQUE KEY `uq_user_completed_idempotency` (`user_id`, `idempotency_key`);
@@ -0,0 +1,29 @@
+-- Add the delta sync change log and record every existing row in it, so a
+-- client syncing from version 0 receives the whole data set once.
+
+USE `fitness_app`;
+
+CREATE TABLE IF NOT EXISTS `change_log` (
+  `version` BIGINT UNSIGNED AUTO_INCREMENT PRIMARY KEY,
+  `entity` VARCHAR(20) NOT NULL,
+  `key1` INT NOT NULL,
+  `key2` INT NOT NULL DEFAULT 0,
+  `changed_at` DATETIME(3) NOT NULL DEFAULT CURRENT_TIMESTAMP(3),
+
+  UNIQUE KEY `uq_change_log_entity` (`entity`, `key1`, `key2`)
+);
+
+INSERT IGNORE INTO change_log (entity, key1, key2)
+  SELECT 'user', id, 0 FROM users ORDER BY id;
+INSERT IGNORE INTO change_log (entity, key1, key2)
+  SELECT 'exercise', id, 0 FROM exercises ORDER BY id;
+INSERT IGNORE INTO change_log (entity, key1, key2)
+  SELECT 'workout', id, 0 FROM workouts ORDER BY id;
+INSERT IGNORE INTO change_log (entity, key1, key2)
+  SELECT 'workout_exercise', workout_id, exercise_id FROM workout_exercises
+  ORDER BY workout_id, exercise_id;
+INSERT IGNORE INTO change_log (entity, key1, key2)
+  SELECT 'favorite', user_id, workout_id FROM user_favorite_workouts
+  ORDER BY user_id, workout_id;
+INSERT IGNORE INTO change_log (entity, key1, key2)
+  SELECT 'completion', id, 0 FROM user_completed_workouts ORDER BY id;
@@ -0,0 +1,16 @@
+-- Add materialized user profile documents. Existing users have no row
+-- until the background rebuild (or `main.py rebuild-profiles`) fills it;
+-- until then a profile is built on first read.
+
+USE `fitness_app`;
+
+CREATE TABLE IF NOT EXISTS `user_profiles` (
+  `user_id` INT NOT NULL PRIMARY KEY,
+  `document` JSON NOT NULL,
+  `stale` TINYINT(1) NOT NULL DEFAULT 0,
+  `updated_at` DATETIME(3) NOT NULL DEFAULT CURRENT_TIMESTAMP(3)
+    ON UPDATE CURRENT_TIMESTAMP(3),
+
+  FOREIGN KEY (`user_id`) REFERENCES users(id)
+    ON DELETE CASCADE
+);
@@ -0,0 +1,12 @@
+-- Add the user id sequence used by sharded deployments. Run on shard 0
+-- (or on the database being split) so new ids continue after the
+-- existing users.
+
+USE `fitness_app`;
+
+CREATE TABLE IF NOT EXISTS `user_id_sequence` (
+  `id` INT AUTO_INCREMENT PRIMARY KEY
+);
+
+INSERT IGNORE INTO user_id_sequence (id)
+  SELECT MAX(id) FROM users HAVING MAX(id) IS NOT NULL;
@@ -0,0 +1,7 @@
+-- Index completions by user and date for the activity calendar and the
+-- user-history command.
+
+USE `fitness_app`;
+
+ALTER TABLE `user_completed_workouts`
+  ADD KEY `idx_user_completed_date` (`user_id`, `date_completed`);
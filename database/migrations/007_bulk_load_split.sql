@@ -0,0 +1,12 @@
+-- Store each bulk load's byte-range split with its checkpoints so a
+-- resumed load reuses it. Checkpoints written before this change don't
+-- record their split and are dropped: finish pending imports first, or
+-- rerun them from the start afterwards.
+
+USE `fitness_app`;
+
+DELETE FROM `bulk_load_checkpoints`;
+
+ALTER TABLE `bulk_load_checkpoints`
+  ADD COLUMN `start_offset` BIGINT NOT NULL AFTER `shard`,
+  ADD COLUMN `end_offset` BIGINT NOT NULL AFTER `start_offset`;
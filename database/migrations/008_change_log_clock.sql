@@ -0,0 +1,11 @@
+-- Add the one-row lock change-logging transactions hold until commit, so
+-- change_log versions are allocated in commit order and delta sync can't
+-- skip a transaction that commits late.
+
+USE `fitness_app`;
+
+CREATE TABLE IF NOT EXISTS `change_log_clock` (
+  `id` TINYINT NOT NULL PRIMARY KEY
+);
+
+INSERT IGNORE INTO change_log_clock (id) VALUES (1);
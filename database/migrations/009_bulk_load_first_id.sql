@@ -0,0 +1,7 @@
+-- Store the first reserved user id of each bulk load range, so a sharded
+-- users import assigns the same ids when it resumes. Run on every shard.
+
+USE `fitness_app`;
+
+ALTER TABLE `bulk_load_checkpoints`
+  ADD COLUMN `first_id` INT NULL AFTER `end_offset`;
@@ -0,0 +1,70 @@
+-- Fill the fitness_app_plans schema with enough rows that the optimizer
+-- picks the plans it would pick in production, for check-plans.
+-- Row counts: 200 workouts, 500 exercises, 50,000 users, 500,000
+-- completions, 150,000 favorites, plus change log and profiles.
+
+USE `fitness_app_plans`;
+
+SET SESSION cte_max_recursion_depth = 100000;
+
+INSERT INTO workouts (title, description)
+WITH RECURSIVE seq (n) AS (SELECT 1 UNION ALL SELECT n + 1 FROM seq WHERE n < 200)
+SELECT CONCAT('Plan Check Workout ', n), 'Generated for query plan checks.'
+FROM seq;
+
+INSERT INTO exercises (name, name_key, instructions)
+WITH RECURSIVE seq (n) AS (SELECT 1 UNION ALL SELECT n + 1 FROM seq WHERE n < 500)
+SELECT CONCAT('Plan Check Exercise ', n), CONCAT('plan check exercise ', n),
+       'Generated for query plan checks.'
+FROM seq;
+
+-- Five exercises per workout
+INSERT IGNORE INTO workout_exercises (workout_id, exercise_id)
+SELECT w.id, e.id FROM workouts w JOIN exercises e ON e.id % 100 = w.id % 100;
+
+INSERT INTO users (first_name, middle_name, last_name, birthday, gender)
+WITH RECURSIVE seq (n) AS (SELECT 1 UNION ALL SELECT n + 1 FROM seq WHERE n < 50000)
+SELECT CONCAT('First', n % 997), IF(n % 3 = 0, NULL, 'M'),
+       CONCAT('Last', n % 1009),
+       DATE_FORMAT(DATE_SUB('2005-01-01', INTERVAL n % 15000 DAY), '%Y-%m-%d'),
+       IF(n % 2 = 0, 'F', 'M')
+FROM seq;
+
+SELECT MIN(id), MAX(id) - MIN(id) + 1 INTO @first_workout, @workouts FROM workouts;
+
+-- Ten completions per user over the last two years
+INSERT INTO user_completed_workouts (user_id, workout_id, date_completed)
+WITH RECURSIVE seq (n) AS (SELECT 1 UNION ALL SELECT n + 1 FROM seq WHERE n < 10)
+SELECT u.id, @first_workout + (u.id * 7 + s.n * 13) % @workouts,
+       DATE_SUB(CURDATE(), INTERVAL (u.id + s.n * 37) % 730 DAY)
+FROM users u CROSS JOIN seq s
+ORDER BY u.id, s.n;
+
+-- Three favorites per user
+INSERT IGNORE INTO user_favorite_workouts (user_id, workout_id)
+WITH RECURSIVE seq (n) AS (SELECT 1 UNION ALL SELECT n + 1 FROM seq WHERE n < 3)
+SELECT u.id, @first_workout + (u.id * 11 + s.n * 17) % @workouts
+FROM users u CROSS JOIN seq s;
+
+-- Profiles: one in ten stale, one in fifty missing
+INSERT INTO user_profiles (user_id, document, stale)
+SELECT id, JSON_OBJECT('id', id), id % 10 = 0 FROM users WHERE id % 50 <> 0;
+
+-- Change log backfill (as migration 003 does)
+INSERT IGNORE INTO change_log (entity, key1, key2)
+  SELECT 'user', id, 0 FROM users ORDER BY id;
+INSERT IGNORE INTO change_log (entity, key1, key2)
+  SELECT 'exercise', id, 0 FROM exercises ORDER BY id;
+INSERT IGNORE INTO change_log (entity, key1, key2)
+  SELECT 'workout', id, 0 FROM workouts ORDER BY id;
+INSERT IGNORE INTO change_log (entity, key1, key2)
+  SELECT 'workout_exercise', workout_id, exercise_id FROM workout_exercises
+  ORDER BY workout_id, exercise_id;
+INSERT IGNORE INTO change_log (entity, key1, key2)
+  SELECT 'favorite', user_id, workout_id FROM user_favorite_workouts
+  ORDER BY user_id, workout_id;
+INSERT IGNORE INTO change_log (entity, key1, key2)
+  SELECT 'completion', id, 0 FROM user_completed_workouts ORDER BY id;
+
+ANALYZE TABLE users, workouts, exercises, workout_exercises,
+  user_completed_workouts, user_favorite_workouts, change_log, user_profiles;
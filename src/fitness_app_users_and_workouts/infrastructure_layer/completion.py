@@ -0,0 +1,39 @@
+# Contains the definition for the Completion class
+
+import json
+
+from fitness_app_users_and_workouts.infrastructure_layer.workout import Workout
+
+
+class Completion:
+    """One row of user_completed_workouts.
+
+    Holds ids and the date only; workout points at a Workout shared by
+    every completion of that workout loaded in the same call, instead of
+    a per-row copy with its own exercise list.
+    """
+
+    __slots__ = ("user_id", "workout_id", "date_completed", "workout")
+
+    def __init__(self, user_id: int = 0, workout: Workout = None,
+                 date_completed: str = "") -> None:
+        self.user_id: int = user_id
+        self.workout_id: int = workout.id if workout is not None else 0
+        self.date_completed: str = date_completed
+        self.workout: Workout = workout
+
+    def __str__(self) -> str:
+        return self.to_json()
+
+    def __repr__(self) -> str:
+        return self.to_json()
+
+    def to_dict(self) -> dict:
+        # Same shape the completed-workouts endpoints have always returned.
+        completion_dict = self.workout.to_dict() if self.workout is not None \
+            else {"id": self.workout_id}
+        completion_dict["date_completed"] = self.date_completed
+        return completion_dict
+
+    def to_json(self) -> str:
+        return json.dumps(self.to_dict())
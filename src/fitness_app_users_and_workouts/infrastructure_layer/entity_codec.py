@@ -0,0 +1,506 @@
+# Contains the definition for the EntityCodec class
+
+import struct
+from collections.abc import Sequence
+from datetime import date, datetime
+
+from fitness_app_users_and_workouts.infrastructure_layer.user import User
+from fitness_app_users_and_workouts.infrastructure_layer.workout import Workout
+from fitness_app_users_and_workouts.infrastructure_layer.exercise import Exercise
+from fitness_app_users_and_workouts.infrastructure_layer.completion import Completion
+
+
+class EntityCodec:
+    """Compact binary encoding of users, workouts, exercises and completions.
+
+    An alternative to to_json() for caches, snapshots and hand-off between
+    processes. encode() takes one entity or a list of entities of the same
+    type; decode() accepts bytes, bytearray, memoryview or mmap and reads
+    it in place, and view() returns an EntityList that decodes each item
+    only when it is accessed.
+
+    Layout (little endian):
+        header   MAGIC, u16 format version, u8 kind, u8 flags, u32 count,
+                 u32 table size
+        tables   users and completions only: u32 exercise count,
+                 exercises; u32 workout count, workouts with a list of
+                 exercise indexes
+        offsets  (count + 1) x u32 record offsets from the end of the
+                 offset table; the last one is the total record size
+        records  one per entity, see _pack_<kind>()
+    where str is a u16 byte length followed by UTF-8 (0xFFFF for None,
+    0xFFFE when a u32 length follows), date is a u8 tag followed by a u32
+    day number or a str, and an index into the tables is a u16, or a u32
+    with FLAG_WIDE_INDEX.
+
+    Workouts and exercises referenced by users and completions are stored
+    once in the tables, so completions of the same workout share one
+    Workout after decoding, as they do when loaded from the database.
+    Readers accept FORMAT_VERSION only; bump it when the layout changes.
+    """
+
+    MAGIC = b"FAEB"
+    FORMAT_VERSION = 1
+    HEADER = struct.Struct("<4sHBBII")
+    U8 = struct.Struct("<B")
+    U16 = struct.Struct("<H")
+    U32 = struct.Struct("<I")
+    COMPLETION = struct.Struct("<II")
+
+    NULL_LENGTH = 0xFFFF
+    LONG_LENGTH = 0xFFFE
+
+    KIND_USER = 1
+    KIND_WORKOUT = 2
+    KIND_EXERCISE = 3
+    KIND_COMPLETION = 4
+    FLAG_LIST = 1
+    FLAG_WIDE_INDEX = 2
+
+    DATE_NONE = 0
+    DATE_OBJECT = 1
+    DATE_ISO_STRING = 2
+    DATE_STRING = 3
+
+    def __init__(self) -> None:
+        self._kinds = {
+            User: self.KIND_USER,
+            Workout: self.KIND_WORKOUT,
+            Exercise: self.KIND_EXERCISE,
+            Completion: self.KIND_COMPLETION,
+        }
+        self._packers = {
+            self.KIND_USER: self._pack_user,
+            self.KIND_WORKOUT: self._pack_workout,
+            self.KIND_EXERCISE: self._pack_exercise,
+            self.KIND_COMPLETION: self._pack_completion,
+        }
+        self._unpackers = {
+            self.KIND_USER: self._unpack_user,
+            self.KIND_WORKOUT: self._unpack_workout,
+            self.KIND_EXERCISE: self._unpack_exercise,
+            self.KIND_COMPLETION: self._unpack_completion,
+        }
+
+
+# PUBLIC METHODS
+
+    def encode(self, value) -> bytes:
+        """Encode an entity, or a list of entities of one type."""
+        is_list = isinstance(value, (list, tuple))
+        items = list(value) if is_list else [value]
+        kind = self._kind(items[0]) if items else self.KIND_EXERCISE
+        for item in items:
+            if self._kind(item) != kind:
+                raise ValueError(
+                    f"Cannot mix {type(item).__name__} into a list of "
+                    f"{type(items[0]).__name__}"
+                )
+
+        tables = _Tables(items, kind)
+        flags = (self.FLAG_LIST if is_list else 0) | (
+            self.FLAG_WIDE_INDEX if tables.wide else 0
+        )
+        table_parts: list = []
+        if kind in (self.KIND_USER, self.KIND_COMPLETION):
+            self._pack_tables(tables, table_parts)
+        table_bytes = b"".join(table_parts)
+
+        pack = self._packers[kind]
+        records = []
+        offsets = [0]
+        for item in items:
+            parts: list = []
+            pack(item, parts, tables)
+            record = b"".join(parts)
+            records.append(record)
+            offsets.append(offsets[-1] + len(record))
+
+        return b"".join([
+            self.HEADER.pack(self.MAGIC, self.FORMAT_VERSION, kind, flags,
+                             len(items), len(table_bytes)),
+            table_bytes,
+            struct.pack(f"<{len(offsets)}I", *offsets),
+            *records,
+        ])
+
+    def decode(self, buffer):
+        """Decode what encode() produced: an entity or a list of entities."""
+        with self.view(buffer) as entities:
+            return list(entities) if entities.is_list else entities[0]
+
+    def view(self, buffer) -> "EntityList":
+        """Return a lazy sequence over the entities encoded in buffer.
+
+        The buffer is not copied. Items are decoded on access, and the
+        shared workout and exercise tables on first access. Call release()
+        (or use the view as a context manager) before closing an mmap that
+        backs it.
+        """
+        buf = memoryview(buffer).cast("B")
+        try:
+            if len(buf) < self.HEADER.size:
+                raise ValueError("Buffer too short for an entity header")
+            magic, version, kind, flags, count, table_size = \
+                self.HEADER.unpack_from(buf, 0)
+            if magic != self.MAGIC:
+                raise ValueError("Buffer does not hold encoded entities")
+            if version != self.FORMAT_VERSION or kind not in self._unpackers:
+                raise ValueError(
+                    f"Unsupported entity encoding (version {version}, "
+                    f"kind {kind})"
+                )
+            offsets_start = self.HEADER.size + table_size
+            records_start = offsets_start + (count + 1) * self.U32.size
+            if len(buf) < records_start:
+                raise ValueError("Buffer is truncated")
+            (records_size,) = self.U32.unpack_from(
+                buf, records_start - self.U32.size
+            )
+            if len(buf) < records_start + records_size:
+                raise ValueError("Buffer is truncated")
+        except (ValueError, struct.error):
+            buf.release()
+            raise
+        return EntityList(self, buf, kind, flags, count, offsets_start)
+
+    def unpack(self, entities: "EntityList", offset: int):
+        """Decode the record of entities' kind at offset in its buffer."""
+        entity, _ = self._unpackers[entities.kind](entities.buf, offset,
+                                                   entities)
+        return entity
+
+    def unpack_tables(self, entities: "EntityList") -> list:
+        """Decode the shared tables of entities; returns its workouts."""
+        buf = entities.buf
+        index = entities.index
+        offset = self.HEADER.size
+        (count,) = self.U32.unpack_from(buf, offset)
+        offset += 4
+        exercises = []
+        for _ in range(count):
+            exercise, offset = self._unpack_exercise(buf, offset, entities)
+            exercises.append(exercise)
+
+        (count,) = self.U32.unpack_from(buf, offset)
+        offset += 4
+        workouts = []
+        for _ in range(count):
+            workout, offset = self._unpack_workout_fields(buf, offset)
+            (exercise_count,) = self.U16.unpack_from(buf, offset)
+            offset += 2
+            indexes = struct.unpack_from(
+                f"<{exercise_count}{index.format[-1]}", buf, offset
+            )
+            offset += exercise_count * index.size
+            workout.exercises = [exercises[i] for i in indexes]
+            workouts.append(workout)
+        return workouts
+
+
+# PRIVATE METHODS
+
+    def _kind(self, item) -> int:
+        kind = self._kinds.get(type(item))
+        if kind is None:
+            raise ValueError(f"Cannot encode {type(item).__name__}")
+        return kind
+
+    def _pack_tables(self, tables: "_Tables", parts: list) -> None:
+        parts.append(self.U32.pack(len(tables.exercises)))
+        for exercise in tables.exercises.values():
+            self._pack_exercise(exercise, parts, tables)
+        parts.append(self.U32.pack(len(tables.workouts)))
+        for workout in tables.workouts.values():
+            self._pack_workout_fields(workout, parts)
+            parts.append(self.U16.pack(len(workout.exercises)))
+            parts.append(tables.pack_indexes(
+                [tables.exercise_index[id(ex)] for ex in workout.exercises]
+            ))
+
+    def _pack_user(self, user: User, parts: list, tables: "_Tables") -> None:
+        parts.append(self.U32.pack(user.id))
+        self.pack_str(user.first_name, parts)
+        self.pack_str(user.middle_name, parts)
+        self.pack_str(user.last_name, parts)
+        self._pack_date(user.birthday, parts)
+        self.pack_str(user.gender, parts)
+
+        parts.append(self.U32.pack(len(user.completed_workouts)))
+        for completion in user.completed_workouts:
+            self._pack_workout_ref(completion, parts, tables)
+            self._pack_date(completion.date_completed, parts)
+        parts.append(self.U32.pack(len(user.favorite_workouts)))
+        parts.append(tables.pack_indexes(
+            [tables.workout_index[id(w)] for w in user.favorite_workouts]
+        ))
+
+    def _unpack_user(self, buf: memoryview, offset: int,
+                     entities: "EntityList") -> tuple:
+        workouts = entities.workouts
+        index = entities.index
+        no_index = entities.no_index
+        dates = entities.dates
+
+        user = User()
+        (user.id,) = self.U32.unpack_from(buf, offset)
+        user.first_name, offset = self.unpack_str(buf, offset + 4)
+        user.middle_name, offset = self.unpack_str(buf, offset)
+        user.last_name, offset = self.unpack_str(buf, offset)
+        user.birthday, offset = self._unpack_date(buf, offset, dates)
+        user.gender, offset = self.unpack_str(buf, offset)
+
+        (count,) = self.U32.unpack_from(buf, offset)
+        offset += 4
+        completed = []
+        for _ in range(count):
+            (i,) = index.unpack_from(buf, offset)
+            offset += index.size
+            if i == no_index:
+                (workout_id,) = self.U32.unpack_from(buf, offset)
+                offset += 4
+                completion = Completion(user.id)
+                completion.workout_id = workout_id
+            else:
+                completion = Completion(user.id, workouts[i])
+            completion.date_completed, offset = \
+                self._unpack_date(buf, offset, dates)
+            completed.append(completion)
+        user.completed_workouts = completed
+
+        (count,) = self.U32.unpack_from(buf, offset)
+        offset += 4
+        indexes = struct.unpack_from(f"<{count}{index.format[-1]}", buf, offset)
+        user.favorite_workouts = [workouts[i] for i in indexes]
+        return user, offset + count * index.size
+
+    def _pack_completion(self, completion: Completion, parts: list,
+                         tables: "_Tables") -> None:
+        parts.append(self.COMPLETION.pack(completion.user_id,
+                                          completion.workout_id))
+        self._pack_workout_ref(completion, parts, tables)
+        self._pack_date(completion.date_completed, parts)
+
+    def _unpack_completion(self, buf: memoryview, offset: int,
+                           entities: "EntityList") -> tuple:
+        user_id, workout_id = self.COMPLETION.unpack_from(buf, offset)
+        offset += self.COMPLETION.size
+        (i,) = entities.index.unpack_from(buf, offset)
+        offset += entities.index.size
+        completion = Completion(
+            user_id, entities.workouts[i] if i != entities.no_index else None
+        )
+        completion.workout_id = workout_id
+        completion.date_completed, offset = \
+            self._unpack_date(buf, offset, entities.dates)
+        return completion, offset
+
+    def _pack_workout_ref(self, completion: Completion, parts: list,
+                          tables: "_Tables") -> None:
+        if completion.workout is None:
+            parts.append(tables.index.pack(tables.no_index))
+            if tables.kind == self.KIND_USER:
+                parts.append(self.U32.pack(completion.workout_id))
+        else:
+            parts.append(tables.index.pack(
+                tables.workout_index[id(completion.workout)]
+            ))
+
+    def _pack_workout(self, workout: Workout, parts: list,
+                      tables: "_Tables" = None) -> None:
+        self._pack_workout_fields(workout, parts)
+        parts.append(self.U16.pack(len(workout.exercises)))
+        for exercise in workout.exercises:
+            self._pack_exercise(exercise, parts, tables)
+
+    def _unpack_workout(self, buf: memoryview, offset: int,
+                        entities: "EntityList" = None) -> tuple:
+        workout, offset = self._unpack_workout_fields(buf, offset)
+        (count,) = self.U16.unpack_from(buf, offset)
+        offset += 2
+        for _ in range(count):
+            exercise, offset = self._unpack_exercise(buf, offset, entities)
+            workout.exercises.append(exercise)
+        return workout, offset
+
+    def _pack_workout_fields(self, workout: Workout, parts: list) -> None:
+        parts.append(self.U32.pack(workout.id))
+        self.pack_str(workout.title, parts)
+        self.pack_str(workout.description, parts)
+
+    def _unpack_workout_fields(self, buf: memoryview, offset: int) -> tuple:
+        workout = Workout()
+        (workout.id,) = self.U32.unpack_from(buf, offset)
+        workout.title, offset = self.unpack_str(buf, offset + 4)
+        workout.description, offset = self.unpack_str(buf, offset)
+        return workout, offset
+
+    def _pack_exercise(self, exercise: Exercise, parts: list,
+                       tables: "_Tables" = None) -> None:
+        parts.append(self.U32.pack(exercise.id))
+        self.pack_str(exercise.name, parts)
+        self.pack_str(exercise.instructions, parts)
+
+    def _unpack_exercise(self, buf: memoryview, offset: int,
+                         entities: "EntityList" = None) -> tuple:
+        exercise = Exercise()
+        (exercise.id,) = self.U32.unpack_from(buf, offset)
+        exercise.name, offset = self.unpack_str(buf, offset + 4)
+        exercise.instructions, offset = self.unpack_str(buf, offset)
+        return exercise, offset
+
+    @classmethod
+    def pack_str(cls, value, parts: list) -> None:
+        """Append value to parts in the str format above."""
+        if value is None:
+            parts.append(cls.U16.pack(cls.NULL_LENGTH))
+            return
+        data = str(value).encode("utf-8")
+        if len(data) >= cls.LONG_LENGTH:
+            parts.append(cls.U16.pack(cls.LONG_LENGTH))
+            parts.append(cls.U32.pack(len(data)))
+        else:
+            parts.append(cls.U16.pack(len(data)))
+        parts.append(data)
+
+    @classmethod
+    def unpack_str(cls, buf: memoryview, offset: int) -> tuple:
+        """Read a str written by pack_str(); returns (value, next offset)."""
+        (length,) = cls.U16.unpack_from(buf, offset)
+        offset += 2
+        if length == cls.NULL_LENGTH:
+            return None, offset
+        if length == cls.LONG_LENGTH:
+            (length,) = cls.U32.unpack_from(buf, offset)
+            offset += 4
+        return str(buf[offset: offset + length], "utf-8"), offset + length
+
+    def _pack_date(self, value, parts: list) -> None:
+        # Birthdays come back from MySQL as dates and completion dates as
+        # ISO strings; both are stored as day numbers and decode to the
+        # same type. Anything else is kept as a string.
+        if value is None:
+            parts.append(self.U8.pack(self.DATE_NONE))
+        elif isinstance(value, date) and not isinstance(value, datetime):
+            parts.append(self.U8.pack(self.DATE_OBJECT))
+            parts.append(self.U32.pack(value.toordinal()))
+        elif isinstance(value, str) and self._is_iso_date(value):
+            parts.append(self.U8.pack(self.DATE_ISO_STRING))
+            parts.append(self.U32.pack(date.fromisoformat(value).toordinal()))
+        else:
+            parts.append(self.U8.pack(self.DATE_STRING))
+            self.pack_str(value, parts)
+
+    def _unpack_date(self, buf: memoryview, offset: int, dates: dict) -> tuple:
+        (tag,) = self.U8.unpack_from(buf, offset)
+        offset += 1
+        if tag == self.DATE_NONE:
+            return None, offset
+        if tag == self.DATE_STRING:
+            return self.unpack_str(buf, offset)
+        (ordinal,) = self.U32.unpack_from(buf, offset)
+        key = (tag, ordinal)
+        value = dates.get(key)
+        if value is None:
+            day = date.fromordinal(ordinal)
+            value = dates[key] = (day if tag == self.DATE_OBJECT
+                                  else day.isoformat())
+        return value, offset + 4
+
+    def _is_iso_date(self, value: str) -> bool:
+        if len(value) != 10:
+            return False
+        try:
+            return date.fromisoformat(value).isoformat() == value
+        except ValueError:
+            return False
+
+
+class EntityList(Sequence):
+    """Entities encoded by EntityCodec, decoded from the buffer on access."""
+
+    def __init__(self, codec: EntityCodec, buf: memoryview, kind: int,
+                 flags: int, count: int, offsets_start: int) -> None:
+        self.codec = codec
+        self.buf = buf
+        self.kind = kind
+        self.is_list = bool(flags & EntityCodec.FLAG_LIST)
+        wide = bool(flags & EntityCodec.FLAG_WIDE_INDEX)
+        self.index = EntityCodec.U32 if wide else EntityCodec.U16
+        self.no_index = 0xFFFFFFFF if wide else 0xFFFF
+        # Decoded dates by (tag, day number); dates and ISO strings are
+        # immutable, so records share them.
+        self.dates: dict = {}
+        self._count = count
+        self._offsets_start = offsets_start
+        self._records_start = offsets_start + (count + 1) * EntityCodec.U32.size
+        self._workouts = None
+
+    @property
+    def workouts(self) -> list:
+        if self._workouts is None:
+            self._workouts = self.codec.unpack_tables(self)
+        return self._workouts
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self._count))]
+        if index < 0:
+            index += self._count
+        if not 0 <= index < self._count:
+            raise IndexError("entity index out of range")
+        (offset,) = EntityCodec.U32.unpack_from(
+            self.buf, self._offsets_start + index * EntityCodec.U32.size
+        )
+        return self.codec.unpack(self, self._records_start + offset)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.release()
+
+    def release(self) -> None:
+        """Release the buffer, e.g. before closing the mmap behind it."""
+        self.buf.release()
+
+
+class _Tables:
+    """Distinct workouts and exercises referenced by the items to encode."""
+
+    def __init__(self, items: list, kind: int) -> None:
+        self.kind = kind
+        self.workouts: dict = {}
+        self.workout_index: dict = {}
+        self.exercises: dict = {}
+        self.exercise_index: dict = {}
+
+        for item in items:
+            if kind == EntityCodec.KIND_USER:
+                for completion in item.completed_workouts:
+                    self._add_workout(completion.workout)
+                for workout in item.favorite_workouts:
+                    self._add_workout(workout)
+            elif kind == EntityCodec.KIND_COMPLETION:
+                self._add_workout(item.workout)
+
+        self.wide = max(len(self.workouts), len(self.exercises)) >= 0xFFFF
+        self.index = EntityCodec.U32 if self.wide else EntityCodec.U16
+        self.no_index = 0xFFFFFFFF if self.wide else 0xFFFF
+
+    def pack_indexes(self, indexes: list) -> bytes:
+        return struct.pack(f"<{len(indexes)}{self.index.format[-1]}", *indexes)
+
+    def _add_workout(self, workout: Workout) -> None:
+        # By identity: the same object decodes back to one shared object.
+        if workout is None or id(workout) in self.workout_index:
+            return
+        self.workout_index[id(workout)] = len(self.workouts)
+        self.workouts[id(workout)] = workout
+        for exercise in workout.exercises:
+            if id(exercise) not in self.exercise_index:
+                self.exercise_index[id(exercise)] = len(self.exercises)
+                self.exercises[id(exercise)] = exercise
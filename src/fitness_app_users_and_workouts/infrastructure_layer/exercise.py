@@ -3,6 +3,11 @@
 import json
 
 
+def normalize_exercise_name(name: str) -> str:
+    """Return the key used to detect duplicate exercise names."""
+    return " ".join((name or "").split()).lower()
+
+
 class Exercise:
 
     def __init__(self) -> None:
@@ -16,10 +21,12 @@ class Exercise:
     def __repr__(self) -> str:
         return self.to_json()
 
-    def to_json(self) -> str:
-        exercise_dict = {
+    def to_dict(self) -> dict:
+        return {
             "id": self.id,
             "name": self.name,
             "instructions": self.instructions,
         }
-        return json.dumps(exercise_dict)
+
+    def to_json(self) -> str:
+        return json.dumps(self.to_dict())
@@ -1,8 +1,9 @@
 # Contains the definition for the User class
 
 import json
-from typing import List
+from typing import List, Optional
 from fitness_app_users_and_workouts.infrastructure_layer.workout import Workout
+from fitness_app_users_and_workouts.infrastructure_layer.completion import Completion
 
 
 class User:
@@ -13,7 +14,13 @@ class User:
         self.last_name: str = ""
         self.birthday: str = ""
         self.gender: str = ""
+        # Not populated by AppServices; kept so the JSON keeps its key.
         self.workouts: List[Workout] = []
+        self.completed_workouts: List[Completion] = []
+        self.favorite_workouts: List[Workout] = []
+        # Full counts when the lists above hold only the first few (paging).
+        self.completed_workouts_total: Optional[int] = None
+        self.favorite_workouts_total: Optional[int] = None
 
     def __str__(self) -> str:
         return self.to_json()
@@ -21,18 +28,18 @@ class User:
     def __repr__(self) -> str:
         return self.to_json()
 
-    def to_json(self) -> str:
-        user_dict = {
+    def to_dict(self) -> dict:
+        return {
             "id": self.id,
             "first_name": self.first_name,
             "middle_name": self.middle_name,
             "last_name": self.last_name,
             "birthday": self.birthday,
             "gender": self.gender,
-            "workouts": [],
+            "workouts": [w.to_dict() for w in self.workouts],
+            "completed_workouts": [c.to_dict() for c in self.completed_workouts],
+            "favorite_workouts": [w.to_dict() for w in self.favorite_workouts],
         }
 
-        for w in self.workouts:
-            user_dict["workouts"].append(w.__dict__)
-
-        return json.dumps(user_dict)
+    def to_json(self) -> str:
+        return json.dumps(self.to_dict(), default=str)
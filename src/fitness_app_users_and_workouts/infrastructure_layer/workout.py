@@ -13,6 +13,8 @@ class Workout:
 
         self.exercises: List = []
 
+        # Catalog workouts leave this empty; completions carry their own
+        # date (see Completion), so one Workout can be shared by all of them.
         self.date_completed: str = ""
 
     def __str__(self) -> str:
@@ -21,16 +23,14 @@ class Workout:
     def __repr__(self) -> str:
         return self.to_json()
 
-    def to_json(self) -> str:
-        workout_dict = {
+    def to_dict(self) -> dict:
+        return {
             "id": self.id,
             "title": self.title,
             "description": self.description,
             "date_completed": self.date_completed,
-            "exercises": [],
+            "exercises": [ex.to_dict() for ex in self.exercises],
         }
 
-        for ex in self.exercises:
-            workout_dict["exercises"].append(ex.__dict__)
-
-        return json.dumps(workout_dict)
+    def to_json(self) -> str:
+        return json.dumps(self.to_dict())
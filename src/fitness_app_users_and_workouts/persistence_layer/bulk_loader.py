@@ -0,0 +1,509 @@
+"""Defines the BulkLoader class."""
+
+import csv
+import hashlib
+import inspect
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import List
+
+from mysql import connector
+
+from fitness_app_users_and_workouts.application_base import ApplicationBase
+from fitness_app_users_and_workouts.persistence_layer.resilience import (
+    DUPLICATE_KEY_ERRNO,
+    raise_ignored_errors,
+)
+from fitness_app_users_and_workouts.persistence_layer.sharded_persistence_wrapper import (
+    ShardedPersistenceWrapper,
+)
+
+
+# Insert statement (with a {values} list), input columns, index of the
+# user id column and change_log entity for each loadable table.
+# Completions already recorded under the same idempotency key are
+# skipped; any other bad row fails the load.
+LOAD_TABLES = {
+    "users": (
+        "INSERT INTO users (first_name, middle_name, last_name, birthday, gender) "
+        "VALUES {values}",
+        ["first_name", "middle_name", "last_name", "birthday", "gender"],
+        None,
+        "user",
+    ),
+    "completions": (
+        "INSERT INTO user_completed_workouts "
+        "(user_id, workout_id, date_completed, idempotency_key) "
+        "VALUES {values}",
+        ["user_id", "workout_id", "date_completed", "idempotency_key"],
+        0,
+        "completion",
+    ),
+}
+
+# Sharded users loads insert ids reserved from user_id_sequence, so each
+# row's shard is known before it is written.
+INSERT_USERS_WITH_IDS = (
+    "INSERT INTO users (id, first_name, middle_name, last_name, birthday, gender) "
+    "VALUES {values}"
+)
+
+SELECT_LAST_SEQUENCE_ID = "SELECT COALESCE(MAX(id), 0) FROM user_id_sequence"
+
+INSERT_SEQUENCE_IDS = "INSERT INTO user_id_sequence (id) VALUES {values}"
+
+# Attempts at reserving an id block that allocate_user_id() raced into.
+RESERVE_ATTEMPTS = 5
+
+# Rows naming existing users stale their stored profiles. The users are
+# locked in id order first, as the application's profile writers do, so a
+# concurrent rebuild can't clear the mark with an older document.
+LOCK_USERS = "SELECT id FROM users WHERE id IN ({ids}) ORDER BY id FOR UPDATE"
+
+MARK_PROFILES_STALE = "UPDATE user_profiles SET stale = 1 WHERE user_id IN ({ids})"
+
+# Keys already recorded for the batch's users; read under their row locks.
+SELECT_COMPLETION_KEYS = (
+    "SELECT user_id, idempotency_key FROM user_completed_workouts "
+    "WHERE (user_id, idempotency_key) IN ({pairs})"
+)
+
+# Imported rows are change-logged in their batch's transaction, as the
+# application's writes are: the change_log clock is taken after the insert
+# and held to commit, so versions are allocated in commit order (see
+# MySQLPersistenceWrapper.LOCK_CHANGE_LOG). A multi-row insert of
+# generated ids gets one consecutive block starting at lastrowid.
+LOCK_CHANGE_LOG = "SELECT id FROM change_log_clock WHERE id = 1 FOR UPDATE"
+
+INSERT_CHANGE_RANGE = {
+    "user": (
+        "INSERT IGNORE INTO change_log (entity, key1, key2) "
+        "SELECT 'user', id, 0 FROM users WHERE id BETWEEN %s AND %s"
+    ),
+    "completion": (
+        "INSERT IGNORE INTO change_log (entity, key1, key2) "
+        "SELECT 'completion', id, 0 FROM user_completed_workouts "
+        "WHERE id BETWEEN %s AND %s"
+    ),
+}
+
+INSERT_CHANGES = "INSERT IGNORE INTO change_log (entity, key1, key2) VALUES {values}"
+
+SELECT_CHECKPOINT = (
+    "SELECT byte_offset, rows_loaded, done FROM bulk_load_checkpoints "
+    "WHERE load_id = %s AND shard = %s"
+)
+
+SELECT_SPLIT = (
+    "SELECT start_offset, end_offset, first_id FROM bulk_load_checkpoints "
+    "WHERE load_id = %s ORDER BY shard"
+)
+
+# Also run for splits already stored, to give every database its rows.
+INSERT_SPLIT = (
+    "INSERT INTO bulk_load_checkpoints "
+    "(load_id, shard, start_offset, end_offset, first_id, byte_offset, "
+    "rows_loaded, done) "
+    "VALUES (%s, %s, %s, %s, %s, %s, 0, 0) "
+    "ON DUPLICATE KEY UPDATE load_id = load_id"
+)
+
+UPDATE_CHECKPOINT = (
+    "UPDATE bulk_load_checkpoints "
+    "SET byte_offset = %s, rows_loaded = %s, done = %s "
+    "WHERE load_id = %s AND shard = %s"
+)
+
+# CSV spelling of NULL, as in LOAD DATA; an empty field is an empty string.
+CSV_NULL = "\\N"
+
+
+class BulkLoader(ApplicationBase):
+    """Loads large CSV/JSONL files into MySQL with a pool of processes.
+
+    The input file is split into byte-range shards on line boundaries, so it
+    must be uncompressed with one record per line. The split is stored with
+    the checkpoints before any row is loaded and reused on resume, whatever
+    the worker count. Each worker process opens its own connection and
+    sends each batch as one multi-row INSERT, committed in the same
+    transaction as its shard's checkpoint row, so rerunning the same load
+    after a crash resumes exactly where every shard stopped.
+
+    With database.sharding enabled, rows go to the database owning their
+    user (ShardedPersistenceWrapper.shard_index). Each byte range is then
+    loaded once per database, keeping only that database's rows, so every
+    batch still commits with its own checkpoint. Imported users get ids
+    from a block reserved in user_id_sequence on shard 0 when the load
+    starts; the block's start is stored per range, so a resumed load
+    assigns the same ids.
+
+    In CSV input \\N is NULL and an empty field is an empty string; in JSONL
+    a missing key or null is NULL.
+    """
+
+    def __init__(self, config: dict) -> None:
+        """Initializes bulk loader."""
+        self._config_dict = config
+        self.META = config["meta"]
+        self.DATABASE = config["database"]
+        self.BULK_LOAD = self.DATABASE.get("bulk_load", {})
+
+        super().__init__(
+            subclass_name=self.__class__.__name__,
+            logfile_prefix_name=self.META["log_prefix"],
+        )
+
+        connection_config = self.DATABASE["connection"]["config"]
+        self.DB_CONFIG = {
+            "database": connection_config["database"],
+            "user": connection_config["user"],
+            "host": connection_config["host"],
+            "port": connection_config["port"],
+            "password": connection_config.get("password", ""),
+            "use_pure": self.DATABASE["pool"].get("use_pure", True),
+        }
+        self.batch_size = self.BULK_LOAD.get("batch_size", 1000)
+
+        # Databases rows are written to; the split and the id sequence live
+        # on the first.
+        sharding = self.DATABASE.get("sharding", {})
+        self.sharded = sharding.get("enabled", False)
+        self.TARGETS = [self.DB_CONFIG]
+        if self.sharded:
+            self.TARGETS = [
+                dict(self.DB_CONFIG, **{
+                    k: v for k, v in shard.items() if k != "replicas"
+                })
+                for shard in sharding["shards"]
+            ]
+
+    def load(self, table: str, path: str, workers: int = None,
+             shards: int = None, relax_checks: bool = False) -> dict:
+        """Load path into table. Returns aggregate row counts and throughput."""
+        self._logger.log_debug(
+            f"In {inspect.currentframe().f_code.co_name}()..."
+        )
+        if table not in LOAD_TABLES:
+            raise ValueError(f"Unsupported table: {table}")
+
+        workers = workers or os.cpu_count() or 1
+        shards = shards or workers * 4
+        fmt = "jsonl" if path.endswith((".jsonl", ".json")) else "csv"
+        header, data_start = self._read_header(path, fmt)
+
+        # Identify a load by table, file and size so a rerun resumes it.
+        load_id = hashlib.sha1(
+            f"{table}:{os.path.abspath(path)}:{os.path.getsize(path)}".encode()
+        ).hexdigest()
+        assign_ids = self.sharded and table == "users"
+        ranges = self._reserve_split(
+            load_id, lambda: self._split(path, data_start, shards, assign_ids)
+        )
+
+        started = time.perf_counter()
+        total_rows = 0
+        resumed_rows = 0
+        tasks = [
+            (target, index, len(self.TARGETS), table, path, fmt, header,
+             load_id, shard, start, end, first_id, self.batch_size,
+             relax_checks)
+            for shard, (start, end, first_id) in enumerate(ranges)
+            for index, target in enumerate(self.TARGETS)
+        ]
+
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(_load_shard, task) for task in tasks]
+            for future in as_completed(futures):
+                result = future.result()
+                total_rows += result["rows"]
+                resumed_rows += result["previously_loaded"]
+                elapsed = time.perf_counter() - started
+                self._logger.log_info(
+                    f"Shard {result['shard']} (database {result['database']}) "
+                    f"done: {result['rows']} rows; "
+                    f"{total_rows} total, {total_rows / elapsed:.0f} rows/sec"
+                )
+
+        elapsed = time.perf_counter() - started
+        summary = {
+            "table": table,
+            "shards": len(ranges),
+            "workers": workers,
+            "rows": total_rows,
+            "previously_loaded": resumed_rows,
+            "seconds": elapsed,
+            "rows_per_second": total_rows / elapsed if elapsed else 0.0,
+        }
+        self._logger.log_info(f"Bulk load finished: {summary}")
+        return summary
+
+    def _reserve_split(self, load_id: str, split) -> List[tuple]:
+        """Return the load's stored byte ranges, storing split() if new.
+
+        Checkpoint offsets are only meaningful for the ranges they were
+        taken in, so a resumed load keeps its original split even if the
+        worker count (and so the default shard count) has changed.
+        """
+        ranges = None
+        for target in self.TARGETS:
+            connection = connector.connect(**target)
+            try:
+                cursor = connection.cursor()
+                if ranges is None:
+                    cursor.execute(SELECT_SPLIT, (load_id,))
+                    ranges = [tuple(row) for row in cursor.fetchall()]
+                    if ranges:
+                        self._logger.log_info(
+                            f"Resuming load {load_id} with its "
+                            f"{len(ranges)} shard(s)."
+                        )
+                    else:
+                        ranges = split()
+                for shard, (start, end, first_id) in enumerate(ranges):
+                    cursor.execute(INSERT_SPLIT, (load_id, shard, start, end,
+                                                  first_id, start))
+                connection.commit()
+                cursor.close()
+            finally:
+                connection.close()
+        return ranges
+
+    def _reserve_user_ids(self, count: int) -> int:
+        """Reserve count consecutive ids in user_id_sequence; return the first.
+
+        The block's ids are inserted explicitly, so allocate_user_id()
+        continues after it. If an allocation races into the block, the
+        insert fails on the duplicate and a later block is tried.
+        """
+        connection = connector.connect(**self.TARGETS[0])
+        try:
+            cursor = connection.cursor()
+            for attempt in range(RESERVE_ATTEMPTS):
+                cursor.execute(SELECT_LAST_SEQUENCE_ID)
+                first_id = int(cursor.fetchone()[0]) + 1
+                connection.commit()
+                try:
+                    for chunk in range(first_id, first_id + count,
+                                       self.batch_size):
+                        ids = range(chunk, min(chunk + self.batch_size,
+                                               first_id + count))
+                        cursor.execute(
+                            INSERT_SEQUENCE_IDS.format(
+                                values=", ".join(["(%s)"] * len(ids))
+                            ),
+                            list(ids),
+                        )
+                    connection.commit()
+                    return first_id
+                except connector.Error as e:
+                    connection.rollback()
+                    if (getattr(e, "errno", None) != DUPLICATE_KEY_ERRNO
+                            or attempt == RESERVE_ATTEMPTS - 1):
+                        raise
+        finally:
+            connection.close()
+
+    def _read_header(self, path: str, fmt: str) -> tuple:
+        if fmt == "jsonl":
+            return None, 0
+        with open(path, "rb") as f:
+            first_line = f.readline()
+        header = next(csv.reader([first_line.decode("utf-8-sig")]))
+        return [h.strip() for h in header], len(first_line)
+
+    def _split(self, path: str, data_start: int, shards: int,
+               assign_ids: bool = False) -> List[tuple]:
+        """Return (start, end, first id or None) byte ranges of path."""
+        size = os.path.getsize(path)
+        step = max(1, (size - data_start) // shards)
+        bounds = [data_start]
+        with open(path, "rb") as f:
+            for i in range(1, shards):
+                f.seek(data_start + i * step)
+                f.readline()
+                position = f.tell()
+                if position >= size or position <= bounds[-1]:
+                    continue
+                bounds.append(position)
+        bounds.append(size)
+        ranges = [(bounds[i], bounds[i + 1]) for i in range(len(bounds) - 1)
+                  if bounds[i] < bounds[i + 1]]
+        if not assign_ids:
+            return [(start, end, None) for start, end in ranges]
+
+        counts = [_count_records(path, start, end) for start, end in ranges]
+        first_id = self._reserve_user_ids(sum(counts)) if sum(counts) else 1
+        split = []
+        for (start, end), count in zip(ranges, counts):
+            split.append((start, end, first_id))
+            first_id += count
+        return split
+
+
+def _load_shard(task: tuple) -> dict:
+    """Worker process: load one byte range, checkpointing every batch.
+
+    With several databases, only the rows owned by this task's database
+    are written to it; first_id numbers the range's users.
+    """
+    (db_config, database, databases, table, path, fmt, header, load_id,
+     shard, start, end, first_id, batch_size, relax_checks) = task
+    insert_sql, columns, user_column, entity = LOAD_TABLES[table]
+    if first_id is not None:
+        insert_sql = INSERT_USERS_WITH_IDS
+
+    connection = connector.connect(**db_config)
+    try:
+        cursor = connection.cursor()
+        if relax_checks:
+            # Session-scoped only; safe when the input is known to be clean.
+            cursor.execute("SET SESSION foreign_key_checks = 0")
+            if table != "completions":
+                # Completions are deduplicated by the unique key on
+                # (user_id, idempotency_key), so it stays checked for them.
+                cursor.execute("SET SESSION unique_checks = 0")
+
+        cursor.execute(SELECT_CHECKPOINT, (load_id, shard))
+        offset, previously_loaded, done = cursor.fetchone()
+        if done:
+            return {"shard": shard, "database": database, "rows": 0,
+                    "previously_loaded": previously_loaded}
+
+        rows_loaded = previously_loaded
+        batch = []
+        # Users are numbered by their position in the range.
+        record = 0
+        if first_id is not None and offset > start:
+            record = _count_records(path, start, offset)
+        with open(path, "rb") as f:
+            f.seek(offset)
+            while offset < end:
+                line = f.readline()
+                if not line:
+                    break
+                offset += len(line)
+                text = line.decode("utf-8").strip()
+                if not text:
+                    continue
+                row = _parse_line(text, fmt, header, columns)
+                if first_id is not None:
+                    row = (first_id + record,) + row
+                record += 1
+                # The first column is the owning user's id in either table.
+                if databases > 1 and ShardedPersistenceWrapper.shard_index(
+                    int(row[0]), databases
+                ) != database:
+                    continue
+                batch.append(row)
+
+                if len(batch) >= batch_size:
+                    rows_loaded += len(batch)
+                    _commit_batch(connection, cursor, insert_sql, batch,
+                                  user_column, entity, first_id is not None,
+                                  load_id, shard, offset, rows_loaded, False)
+                    batch = []
+
+        rows_loaded += len(batch)
+        _commit_batch(connection, cursor, insert_sql, batch, user_column,
+                      entity, first_id is not None, load_id, shard, offset,
+                      rows_loaded, True)
+        cursor.close()
+        return {"shard": shard, "database": database,
+                "rows": rows_loaded - previously_loaded,
+                "previously_loaded": previously_loaded}
+    finally:
+        connection.close()
+
+
+def _count_records(path: str, start: int, end: int) -> int:
+    """Count the non-blank lines in a byte range, as _load_shard reads them."""
+    count = 0
+    with open(path, "rb") as f:
+        f.seek(start)
+        offset = start
+        while offset < end:
+            line = f.readline()
+            if not line:
+                break
+            offset += len(line)
+            if line.decode("utf-8").strip():
+                count += 1
+    return count
+
+
+def _parse_line(text: str, fmt: str, header: list, columns: list) -> tuple:
+    if fmt == "jsonl":
+        record = json.loads(text)
+    else:
+        record = {
+            name: None if value == CSV_NULL else value
+            for name, value in zip(header, next(csv.reader([text])))
+        }
+    return tuple(record.get(c) for c in columns)
+
+
+def _commit_batch(connection, cursor, insert_sql: str, batch: list,
+                  user_column, entity: str, explicit_ids: bool, load_id: str,
+                  shard: int, offset: int, rows_loaded: int,
+                  done: bool) -> None:
+    user_ids = []
+    if batch and user_column is not None:
+        user_ids = sorted({int(row[user_column]) for row in batch})
+        ids = ", ".join(["%s"] * len(user_ids))
+        cursor.execute(LOCK_USERS.format(ids=ids), user_ids)
+        cursor.fetchall()
+        batch = _new_completions(cursor, batch)
+    if batch:
+        # Built by hand, as one statement, so generated ids are one block.
+        placeholders = "(" + ", ".join(["%s"] * len(batch[0])) + ")"
+        values = ", ".join([placeholders] * len(batch))
+        cursor.execute(insert_sql.format(values=values),
+                       [value for row in batch for value in row])
+        first_id = cursor.lastrowid
+        cursor.execute(LOCK_CHANGE_LOG)
+        cursor.fetchall()
+        if explicit_ids:
+            changes = ", ".join(["(%s, %s, 0)"] * len(batch))
+            cursor.execute(INSERT_CHANGES.format(values=changes),
+                           [value for row in batch for value in (entity, row[0])])
+        else:
+            cursor.execute(INSERT_CHANGE_RANGE[entity],
+                           (first_id, first_id + len(batch) - 1))
+        raise_ignored_errors(cursor)
+    if user_ids:
+        cursor.execute(MARK_PROFILES_STALE.format(ids=ids), user_ids)
+    cursor.execute(UPDATE_CHECKPOINT,
+                   (offset, rows_loaded, int(done), load_id, shard))
+    connection.commit()
+
+
+def _new_completions(cursor, batch: list) -> list:
+    """Drop completion rows whose (user_id, idempotency_key) is recorded.
+
+    The caller holds the users' row locks, as every completion writer
+    does, so no other writer can record one of these keys meanwhile.
+    Rows without a key are always new.
+    """
+    keyed = list(dict.fromkeys((int(r[0]), r[3]) for r in batch
+                               if r[3] is not None))
+    existing: set = set()
+    if keyed:
+        cursor.execute(
+            SELECT_COMPLETION_KEYS.format(
+                pairs=", ".join(["(%s, %s)"] * len(keyed))
+            ),
+            [value for pair in keyed for value in pair],
+        )
+        existing = {(int(u), k) for u, k in cursor.fetchall()}
+
+    new_rows = []
+    for row in batch:
+        if row[3] is not None:
+            key = (int(row[0]), row[3])
+            if key in existing:
+                continue
+            existing.add(key)
+        new_rows.append(row)
+    return new_rows
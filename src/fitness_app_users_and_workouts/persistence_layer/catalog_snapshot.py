@@ -0,0 +1,236 @@
+"""Defines the CatalogSnapshot class."""
+
+import inspect
+import mmap
+import os
+import struct
+import threading
+from typing import Callable, List, Optional
+
+from fitness_app_users_and_workouts.application_base import ApplicationBase
+from fitness_app_users_and_workouts.infrastructure_layer.workout import Workout
+from fitness_app_users_and_workouts.infrastructure_layer.exercise import Exercise
+from fitness_app_users_and_workouts.infrastructure_layer.entity_codec import EntityCodec
+
+
+class CatalogSnapshot(ApplicationBase):
+    """Memory-mapped on-disk copy of the workout/exercise catalog.
+
+    The snapshot is served immediately on startup while a background thread
+    compares its stored catalog version (row counts and max ids) with the
+    database. If they differ, reads fall back to MySQL until a rebuilt
+    snapshot is swapped in. on_change is called each time the catalog
+    being served changes that way, so cached responses can be dropped.
+
+    File layout (little endian):
+        header   MAGIC, format version, 5 x u64 catalog version,
+                 u32 workout count, u32 exercise count, u32 link count
+        workouts u32 id, str title, str description
+        exercises u32 id, str name, str instructions
+        links    u32 workout_id, u32 exercise_id
+    where str is written by EntityCodec.pack_str().
+    """
+
+    MAGIC = b"FACS"
+    FORMAT_VERSION = 2
+    HEADER = struct.Struct("<4sH5Q3I")
+    U32 = struct.Struct("<I")
+    LINK = struct.Struct("<II")
+
+    def __init__(self, config: dict, db,
+                 on_change: Optional[Callable[[], None]] = None) -> None:
+        """Initializes catalog snapshot."""
+        self._config_dict = config
+        self.META = config["meta"]
+        self.SNAPSHOT = config.get("catalog_snapshot", {})
+        self.DB = db
+        self._on_change = on_change
+
+        super().__init__(
+            subclass_name=self.__class__.__name__,
+            logfile_prefix_name=self.META["log_prefix"],
+        )
+
+        self.path = self.SNAPSHOT.get("path", "data/catalog.snapshot")
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._mmap = None
+        self._version = None
+        self._usable = False
+        self._workouts: Optional[List[Workout]] = None
+        self._exercises: Optional[List[Exercise]] = None
+
+
+# PUBLIC METHODS
+
+    def start(self) -> None:
+        """Map the snapshot file and validate it in the background."""
+        self._open(self.path)
+        self.refresh_async()
+
+    def refresh_async(self) -> None:
+        """Check the catalog version and rebuild the snapshot if stale."""
+        threading.Thread(
+            target=self._refresh, name="catalog-snapshot", daemon=True
+        ).start()
+
+    def invalidate(self) -> None:
+        """Stop serving the snapshot (after a catalog write) and rebuild it."""
+        with self._lock:
+            self._usable = False
+        self.refresh_async()
+
+    def get_workouts(self) -> Optional[List[Workout]]:
+        """Return workouts with exercises, or None if the snapshot is unusable."""
+        with self._lock:
+            if not self._usable:
+                return None
+            if self._workouts is None:
+                self._decode()
+            return [self._copy_workout(w) for w in self._workouts]
+
+    def get_exercises(self) -> Optional[List[Exercise]]:
+        """Return all exercises, or None if the snapshot is unusable."""
+        with self._lock:
+            if not self._usable:
+                return None
+            if self._exercises is None:
+                self._decode()
+            return [self._copy_exercise(ex) for ex in self._exercises]
+
+
+# PRIVATE METHODS
+
+    def _open(self, path: str) -> None:
+        try:
+            with open(path, "rb") as f:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (FileNotFoundError, ValueError):
+            return
+
+        magic, fmt, *rest = self.HEADER.unpack_from(mapped, 0)
+        if magic != self.MAGIC or fmt != self.FORMAT_VERSION:
+            self._logger.log_warning(f"Ignoring incompatible snapshot {path}")
+            mapped.close()
+            return
+
+        with self._lock:
+            old = self._mmap
+            self._mmap = mapped
+            self._version = tuple(rest[:5])
+            self._workouts = None
+            self._exercises = None
+            self._usable = True
+        if old is not None:
+            old.close()
+
+    def _refresh(self) -> None:
+        with self._refresh_lock:
+            try:
+                current = self.DB.select_catalog_version()
+                if current is None:
+                    return
+                if current == self._version:
+                    with self._lock:
+                        self._usable = self._mmap is not None
+                    return
+
+                with self._lock:
+                    self._usable = False
+                self._changed()
+                self._logger.log_debug(
+                    f"Catalog snapshot stale ({self._version} != {current}), rebuilding..."
+                )
+                self._build(self.path)
+                self._open(self.path)
+                self._changed()
+            except Exception as e:
+                self._logger.log_error(
+                    f"{inspect.currentframe().f_code.co_name}: {e}"
+                )
+
+    def _changed(self) -> None:
+        if self._on_change is not None:
+            self._on_change()
+
+    def _build(self, path: str) -> None:
+        # Read the version first: a write racing the build then shows up as
+        # a mismatch on the next check instead of being missed.
+        version = self.DB.select_catalog_version()
+        if version is None:
+            return
+        workouts = list(self.DB.stream_catalog("workouts"))
+        exercises = list(self.DB.stream_catalog("exercises"))
+        links = list(self.DB.stream_catalog("workout_exercises"))
+
+        parts = [self.HEADER.pack(
+            self.MAGIC, self.FORMAT_VERSION, *version,
+            len(workouts), len(exercises), len(links),
+        )]
+        for workout_id, title, description in workouts:
+            parts.append(self.U32.pack(workout_id))
+            EntityCodec.pack_str(title, parts)
+            EntityCodec.pack_str(description, parts)
+        for exercise_id, name, instructions in exercises:
+            parts.append(self.U32.pack(exercise_id))
+            EntityCodec.pack_str(name, parts)
+            EntityCodec.pack_str(instructions, parts)
+        for workout_id, exercise_id in links:
+            parts.append(self.LINK.pack(workout_id, exercise_id))
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(b"".join(parts))
+        os.replace(tmp_path, path)
+
+    def _decode(self) -> None:
+        buf = memoryview(self._mmap)
+        *_, workout_count, exercise_count, link_count = \
+            self.HEADER.unpack_from(buf, 0)
+        offset = self.HEADER.size
+
+        workouts = []
+        for _ in range(workout_count):
+            w = Workout()
+            (w.id,) = self.U32.unpack_from(buf, offset)
+            w.title, offset = EntityCodec.unpack_str(buf, offset + 4)
+            w.description, offset = EntityCodec.unpack_str(buf, offset)
+            workouts.append(w)
+
+        exercises = {}
+        for _ in range(exercise_count):
+            ex = Exercise()
+            (ex.id,) = self.U32.unpack_from(buf, offset)
+            ex.name, offset = EntityCodec.unpack_str(buf, offset + 4)
+            ex.instructions, offset = EntityCodec.unpack_str(buf, offset)
+            exercises[ex.id] = ex
+
+        by_id = {w.id: w for w in workouts}
+        for workout_id, exercise_id in self.LINK.iter_unpack(
+            buf[offset: offset + link_count * self.LINK.size]
+        ):
+            if workout_id in by_id and exercise_id in exercises:
+                by_id[workout_id].exercises.append(exercises[exercise_id])
+
+        buf.release()
+        self._workouts = workouts
+        self._exercises = list(exercises.values())
+
+    def _copy_workout(self, workout: Workout) -> Workout:
+        # Callers may mutate what they get back, so hand out copies.
+        w = Workout()
+        w.id = workout.id
+        w.title = workout.title
+        w.description = workout.description
+        w.exercises = [self._copy_exercise(ex) for ex in workout.exercises]
+        return w
+
+    def _copy_exercise(self, exercise: Exercise) -> Exercise:
+        ex = Exercise()
+        ex.id = exercise.id
+        ex.name = exercise.name
+        ex.instructions = exercise.instructions
+        return ex
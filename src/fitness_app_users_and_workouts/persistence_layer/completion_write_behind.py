@@ -0,0 +1,336 @@
+"""Defines the CompletionWriteBehind class."""
+
+import atexit
+import inspect
+import json
+import os
+import threading
+import time
+from collections import deque
+from typing import Callable, List, Optional
+
+from fitness_app_users_and_workouts.application_base import ApplicationBase
+from fitness_app_users_and_workouts.persistence_layer.resilience import (
+    DatabaseUnavailableError,
+    PersistenceError,
+)
+
+
+class CompletionWriteBehind(ApplicationBase):
+    """Journals workout completions locally and group-commits them to MySQL.
+
+    append() writes the event to an append-only journal and returns at once.
+    A background thread flushes pending events in batches through
+    insert_user_completed_workouts(). The checkpoint file records the last
+    sequence number committed to MySQL; on start, journal entries past the
+    checkpoint are replayed. Delivery is at-least-once: a crash between the
+    commit and the checkpoint write replays that batch, which only produces
+    duplicates for events without an idempotency key.
+
+    append() never waits on MySQL: it dates events with the server's date
+    (cached, as the synchronous path uses it) and checks only that the ids
+    are well formed. Events naming a user or workout that doesn't exist are
+    rejected by MySQL at flush time. A batch MySQL rejects is bisected so
+    the rest is committed; each event rejected on its own is moved to the
+    dead-letter file and list instead of blocking everything queued after
+    it.
+    """
+
+    def __init__(self, config: dict, db,
+                 on_flush: Optional[Callable[[], None]] = None) -> None:
+        """Initializes write-behind buffer."""
+        self._config_dict = config
+        self.META = config["meta"]
+        self.WRITE_BEHIND = config["database"].get("write_behind", {})
+        self.DB = db
+        self._on_flush = on_flush
+
+        super().__init__(
+            subclass_name=self.__class__.__name__,
+            logfile_prefix_name=self.META["log_prefix"],
+        )
+
+        self.journal_path = self.WRITE_BEHIND.get(
+            "journal_path", "data/completions.journal"
+        )
+        self.checkpoint_path = f"{self.journal_path}.checkpoint"
+        self.dead_letter_path = f"{self.journal_path}.dead"
+        self.batch_size = self.WRITE_BEHIND.get("batch_size", 500)
+        self.flush_interval = self.WRITE_BEHIND.get("flush_interval_ms", 200) / 1000
+        self.fsync = self.WRITE_BEHIND.get("fsync", True)
+
+        self._pending: deque = deque()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopping = False
+        self._thread = None
+        self._journal = None
+        self._seq = 0
+        self._dead_letters: List[dict] = []
+
+        # Flush metrics
+        self._flushed_total = 0
+        self._flush_count = 0
+        self._failed_flushes = 0
+        self._dead_lettered = 0
+        self._last_batch_size = 0
+        self._last_flush_seconds = 0.0
+        self._last_flush_lag = 0.0
+        self._max_flush_lag = 0.0
+
+
+# LIFECYCLE
+
+    def start(self) -> None:
+        """Replay unflushed journal entries and start the flusher thread."""
+        journal_dir = os.path.dirname(self.journal_path)
+        if journal_dir:
+            os.makedirs(journal_dir, exist_ok=True)
+
+        self._replay_journal()
+        self._journal = open(self.journal_path, "a", encoding="utf-8")
+
+        self._thread = threading.Thread(
+            target=self._run, name="completion-write-behind", daemon=True
+        )
+        self._thread.start()
+        atexit.register(self.stop)
+        self._logger.log_debug(
+            f"Write-behind started with {len(self._pending)} replayed event(s)."
+        )
+
+    def stop(self) -> None:
+        """Stop the flusher after draining whatever can be committed."""
+        if self._stopping:
+            return
+        self._stopping = True
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.flush()
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+
+
+# PUBLIC METHODS
+
+    def append(self, user_id: int, workout_id: int,
+               idempotency_key: str = None) -> bool:
+        """Durably journal a completion and acknowledge it.
+
+        Returns False, without journaling, if an id is not a positive
+        integer. Ids are not looked up: an event naming a user or workout
+        that doesn't exist is dead-lettered when it is flushed.
+        """
+        try:
+            if not self._validate(user_id, workout_id):
+                self._logger.log_warning(
+                    f"Rejected completion of workout {workout_id} for user "
+                    f"{user_id}: invalid id."
+                )
+                return False
+            day = self.DB.server_today().isoformat()
+            with self._lock:
+                self._seq += 1
+                event = {
+                    "seq": self._seq,
+                    "user_id": user_id,
+                    "workout_id": workout_id,
+                    "date_completed": day,
+                    "idempotency_key": idempotency_key,
+                    "ts": time.time(),
+                }
+                self._journal.write(json.dumps(event) + "\n")
+                self._journal.flush()
+                if self.fsync:
+                    os.fsync(self._journal.fileno())
+                self._pending.append(event)
+                backlog = len(self._pending)
+
+            if backlog >= self.batch_size:
+                self._wakeup.set()
+            return True
+        except Exception as e:
+            self._logger.log_error(
+                f"{inspect.currentframe().f_code.co_name}: {e}"
+            )
+            return False
+
+    def flush(self) -> int:
+        """Commit pending events in batches. Returns the number committed."""
+        committed = 0
+        with self._flush_lock:
+            while True:
+                with self._lock:
+                    batch: List[dict] = [
+                        self._pending[i]
+                        for i in range(min(self.batch_size, len(self._pending)))
+                    ]
+                if not batch:
+                    break
+
+                started = time.perf_counter()
+                dead_before = self._dead_lettered
+                # Settled events (committed or dead-lettered) are always a
+                # prefix of the batch; the rest stays pending and journaled
+                # for the next flush.
+                settled = self._deliver(batch)
+                if settled:
+                    now = time.time()
+                    with self._lock:
+                        for _ in range(settled):
+                            self._pending.popleft()
+                        self._write_checkpoint(batch[settled - 1]["seq"])
+                        if not self._pending:
+                            self._compact_journal()
+
+                    inserted = settled - (self._dead_lettered - dead_before)
+                    self._flush_count += 1
+                    self._flushed_total += inserted
+                    self._last_batch_size = settled
+                    self._last_flush_seconds = time.perf_counter() - started
+                    self._last_flush_lag = now - batch[0]["ts"]
+                    self._max_flush_lag = max(self._max_flush_lag,
+                                              self._last_flush_lag)
+                    committed += inserted
+                if settled < len(batch):
+                    break
+
+        if committed and self._on_flush is not None:
+            self._on_flush()
+        return committed
+
+    def metrics(self) -> dict:
+        """Return flush lag and throughput metrics."""
+        with self._lock:
+            pending = len(self._pending)
+            oldest = self._pending[0]["ts"] if pending else None
+
+        return {
+            "pending": pending,
+            "oldest_pending_age_seconds":
+                (time.time() - oldest) if oldest is not None else 0.0,
+            "flushed_total": self._flushed_total,
+            "flush_count": self._flush_count,
+            "failed_flushes": self._failed_flushes,
+            "dead_lettered": self._dead_lettered,
+            "last_batch_size": self._last_batch_size,
+            "last_flush_seconds": self._last_flush_seconds,
+            "last_flush_lag_seconds": self._last_flush_lag,
+            "max_flush_lag_seconds": self._max_flush_lag,
+        }
+
+    def dead_letters(self) -> List[dict]:
+        """Return the events rejected by MySQL since start."""
+        with self._lock:
+            return list(self._dead_letters)
+
+
+# PRIVATE METHODS
+
+    def _validate(self, user_id: int, workout_id: int) -> bool:
+        return all(isinstance(i, int) and not isinstance(i, bool) and i > 0
+                   for i in (user_id, workout_id))
+
+    def _deliver(self, events: List[dict]) -> int:
+        """Insert events, bisecting around rejected ones.
+
+        Returns how many leading events were settled: committed, or
+        rejected on their own and dead-lettered. Stops at the first
+        unavailable error, leaving the rest for a later flush.
+        """
+        rows = [
+            (e["user_id"], e["workout_id"], e["date_completed"],
+             e.get("idempotency_key"))
+            for e in events
+        ]
+        try:
+            self.DB.insert_user_completed_workouts(rows)
+            return len(events)
+        except DatabaseUnavailableError as e:
+            self._logger.log_warning(f"Flush failed: {e}")
+            self._failed_flushes += 1
+            return 0
+        except PersistenceError as e:
+            if len(events) == 1:
+                self._dead_letter(events[0], e)
+                return 1
+        middle = len(events) // 2
+        settled = self._deliver(events[:middle])
+        if settled < middle:
+            return settled
+        return middle + self._deliver(events[middle:])
+
+    def _dead_letter(self, event: dict, error: Exception) -> None:
+        self._logger.log_error(
+            f"{inspect.currentframe().f_code.co_name}: completion "
+            f"{event['seq']} rejected: {error}"
+        )
+        record = dict(event, error=str(error))
+        with open(self.dead_letter_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record) + "\n")
+            f.flush()
+            if self.fsync:
+                os.fsync(f.fileno())
+        with self._lock:
+            self._dead_letters.append(record)
+        self._dead_lettered += 1
+
+    def _run(self) -> None:
+        while not self._stopping:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                self._logger.log_error(
+                    f"{inspect.currentframe().f_code.co_name}: {e}"
+                )
+
+    def _replay_journal(self) -> None:
+        checkpoint = self._read_checkpoint()
+        self._seq = checkpoint
+
+        if not os.path.exists(self.journal_path):
+            return
+
+        with open(self.journal_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    event = json.loads(line)
+                except ValueError:
+                    # A torn final line from a crash mid-write was never
+                    # acknowledged, so it is safe to drop.
+                    self._logger.log_warning(
+                        f"Skipping unreadable journal line: {line!r}"
+                    )
+                    continue
+                self._seq = max(self._seq, event["seq"])
+                if event["seq"] > checkpoint:
+                    self._pending.append(event)
+
+    def _read_checkpoint(self) -> int:
+        try:
+            with open(self.checkpoint_path, "r", encoding="utf-8") as f:
+                return int(f.read().strip() or 0)
+        except FileNotFoundError:
+            return 0
+
+    def _write_checkpoint(self, seq: int) -> None:
+        tmp_path = f"{self.checkpoint_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(str(seq))
+            f.flush()
+            if self.fsync:
+                os.fsync(f.fileno())
+        os.replace(tmp_path, self.checkpoint_path)
+
+    def _compact_journal(self) -> None:
+        # Everything journaled is committed, so start a fresh journal.
+        # Sequence numbers keep increasing via the checkpoint file.
+        if self._journal is None:
+            return
+        self._journal.close()
+        self._journal = open(self.journal_path, "w", encoding="utf-8")
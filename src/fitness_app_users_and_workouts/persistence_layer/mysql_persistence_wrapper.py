@@ -2,24 +2,42 @@
 
 import json
 import inspect
+import itertools
+import threading
+import time
+from datetime import date, datetime, timezone
 from enum import Enum
-from typing import List, Optional
-
-from mysql import connector
-from mysql.connector.pooling import MySQLConnectionPool
+from typing import Callable, Iterator, List, Optional
 
 from fitness_app_users_and_workouts.application_base import ApplicationBase
+from fitness_app_users_and_workouts.persistence_layer.unit_of_work import UnitOfWork
+from fitness_app_users_and_workouts.persistence_layer.resilience import (
+    DUPLICATE_KEY_ERRNO,
+    DatabaseUnavailableError,
+    PersistenceError,
+    QueryError,
+    Resilience,
+    classify_error,
+    raise_ignored_errors,
+    resilient,
+)
 import inspect
 from typing import List
 from fitness_app_users_and_workouts.infrastructure_layer.user import User
 from fitness_app_users_and_workouts.infrastructure_layer.workout import Workout
-from fitness_app_users_and_workouts.infrastructure_layer.exercise import Exercise
+from fitness_app_users_and_workouts.infrastructure_layer.completion import Completion
+from fitness_app_users_and_workouts.infrastructure_layer.exercise import (
+    Exercise,
+    normalize_exercise_name,
+)
 
 
 
 class MySQLPersistenceWrapper(ApplicationBase):
     """Handles MySQL operations for the Fitness App."""
 
+    SERVER_CLOCK_TTL_SECONDS = 600
+
     def __init__(self, config: dict) -> None:
         """Initializes MySQL wrapper."""
         self._config_dict = config
@@ -41,13 +59,64 @@ class MySQLPersistenceWrapper(ApplicationBase):
             "password", ""
         )
 
+        # Bound connect waits so an unreachable server fails in seconds.
+        self.RESILIENCE = self.DATABASE.get("resilience", {})
+        self.DB_CONFIG["connection_timeout"] = self.RESILIENCE.get(
+            "connect_timeout_seconds", 3
+        )
+
         self._logger.log_debug(f"DB Connection Config Dict: {self.DB_CONFIG}")
 
-        # Database Connection Pool
+        # Retry/circuit-breaker policy applied by @resilient methods, which
+        # raise PersistenceError subclasses instead of returning empty results.
+        self._resilience = Resilience(self.RESILIENCE)
+
+        # Database Connection Pool (primary: all writes). With the default
+        # "background" warm-up, pools connect on their own threads and the
+        # first call waits only for a pool that isn't ready yet.
+        self._background_warm_up = (
+            self.DATABASE["pool"].get("warm_up", "background") == "background"
+        )
         self._connection_pool = self._initialize_database_connection_pool(
             self.DB_CONFIG
         )
 
+        # Read Replica Pools. Each replica entry overrides the primary
+        # connection config (typically host/port).
+        self.ROUTING = self.DATABASE.get("routing", {})
+        self._read_balancing = self.ROUTING.get("balancing", "round_robin")
+        self._read_your_writes_seconds = self.ROUTING.get(
+            "read_your_writes_seconds", 5
+        )
+        self._replica_pools: List[_ReplicaPool] = []
+        for i, replica in enumerate(self.DATABASE.get("replicas", [])):
+            replica_config = dict(self.DB_CONFIG)
+            replica_config.update(replica)
+            pool = self._initialize_database_connection_pool(
+                replica_config,
+                pool_name=f"{self.DATABASE['pool']['name']}_replica{i}",
+            )
+            self._replica_pools.append(
+                _ReplicaPool(f"{replica_config['host']}:{replica_config['port']}", pool)
+            )
+        self._replica_cycle = itertools.cycle(range(len(self._replica_pools)))
+        self._replica_cycle_lock = threading.Lock()
+
+        # Normalised exercise name -> id, loaded on first use and mirrored
+        # by the unique key on exercises.name_key.
+        self._exercise_name_index: Optional[dict] = None
+        self._exercise_name_index_lock = threading.Lock()
+
+        # Server UTC offset in seconds and when it was read, for
+        # server_today() without a round trip per call.
+        self._server_utc_offset: Optional[tuple] = None
+
+        # Read-your-writes state: per-thread session and per-user windows
+        # during which reads are pinned to the primary.
+        self._session = threading.local()
+        self._user_write_times: dict = {}
+        self._user_write_times_lock = threading.Lock()
+
         # User Column ENUMS
         self.UserColumns = Enum(
             "UserColumns",
@@ -114,19 +183,369 @@ class MySQLPersistenceWrapper(ApplicationBase):
             "WHERE we.workout_id = %s"
         )
 
+        # Paged users, optionally filtered by name. Pages start after a
+        # known id where possible, so OFFSET only skips pages not yet seen.
+        self.SELECT_USERS_PAGE_FILTERED = (
+            "SELECT id, first_name, middle_name, last_name, birthday, gender "
+            "FROM users "
+            "WHERE id > %s "
+            "AND CONCAT_WS(' ', first_name, middle_name, last_name) LIKE %s "
+            "ORDER BY id LIMIT %s OFFSET %s"
+        )
+        self.COUNT_USERS_FILTERED = (
+            "SELECT COUNT(*) FROM users "
+            "WHERE CONCAT_WS(' ', first_name, middle_name, last_name) LIKE %s"
+        )
+
+        # Paged workouts, optionally filtered by title
+        self.SELECT_WORKOUTS_PAGE_FILTERED = (
+            "SELECT id, title, description FROM workouts "
+            "WHERE id > %s AND title LIKE %s ORDER BY id LIMIT %s OFFSET %s"
+        )
+        self.COUNT_WORKOUTS_FILTERED = (
+            "SELECT COUNT(*) FROM workouts WHERE title LIKE %s"
+        )
+
+        # Completed/favorite workout titles for a set of users ({ids} is
+        # replaced with one placeholder per id)
+        self.SELECT_COMPLETED_TITLES_FOR_USERS = (
+            "SELECT c.user_id, w.id, w.title, c.date_completed "
+            "FROM user_completed_workouts c "
+            "JOIN workouts w ON w.id = c.workout_id "
+            "WHERE c.user_id IN ({ids}) ORDER BY c.user_id, c.date_completed"
+        )
+        self.SELECT_FAVORITE_TITLES_FOR_USERS = (
+            "SELECT f.user_id, w.id, w.title "
+            "FROM user_favorite_workouts f "
+            "JOIN workouts w ON w.id = f.workout_id "
+            "WHERE f.user_id IN ({ids}) ORDER BY f.user_id, w.id"
+        )
+        # The same, capped at %s rows per user, with each user's total
+        self.SELECT_COMPLETED_TITLES_FOR_USERS_CAPPED = (
+            "SELECT user_id, id, title, date_completed, total FROM ("
+            "SELECT c.user_id, w.id, w.title, c.date_completed, "
+            "ROW_NUMBER() OVER (PARTITION BY c.user_id "
+            "ORDER BY c.date_completed, c.id) AS n, "
+            "COUNT(*) OVER (PARTITION BY c.user_id) AS total "
+            "FROM user_completed_workouts c "
+            "JOIN workouts w ON w.id = c.workout_id "
+            "WHERE c.user_id IN ({ids})) ranked "
+            "WHERE n <= %s ORDER BY user_id, n"
+        )
+        self.SELECT_FAVORITE_TITLES_FOR_USERS_CAPPED = (
+            "SELECT user_id, id, title, total FROM ("
+            "SELECT f.user_id, w.id, w.title, "
+            "ROW_NUMBER() OVER (PARTITION BY f.user_id ORDER BY w.id) AS n, "
+            "COUNT(*) OVER (PARTITION BY f.user_id) AS total "
+            "FROM user_favorite_workouts f "
+            "JOIN workouts w ON w.id = f.workout_id "
+            "WHERE f.user_id IN ({ids})) ranked "
+            "WHERE n <= %s ORDER BY user_id, n"
+        )
+
+        # Exercises for a set of workouts
+        self.SELECT_EXERCISES_FOR_WORKOUTS = (
+            "SELECT we.workout_id, e.id, e.name, e.instructions "
+            "FROM exercises e "
+            "JOIN workout_exercises we ON we.exercise_id = e.id "
+            "WHERE we.workout_id IN ({ids}) ORDER BY we.workout_id, e.id"
+        )
+
+        # Export: next page of users after a given id (keyset pagination)
+        self.SELECT_USERS_PAGE = (
+            "SELECT id, first_name, middle_name, last_name, birthday, gender "
+            "FROM users WHERE id > %s ORDER BY id LIMIT %s"
+        )
+
+        # Batch CLI: next page of workouts after a given id
+        self.SELECT_WORKOUTS_PAGE = (
+            "SELECT id, title, description "
+            "FROM workouts WHERE id > %s ORDER BY id LIMIT %s"
+        )
+
+        # Batch CLI: one user's completions on or after a date
+        self.SELECT_USER_HISTORY = (
+            "SELECT c.id, c.workout_id, w.title, c.date_completed "
+            "FROM user_completed_workouts c "
+            "JOIN workouts w ON w.id = c.workout_id "
+            "WHERE c.user_id = %s AND c.date_completed >= %s "
+            "ORDER BY c.date_completed, c.id LIMIT %s"
+        )
+
+        # Activity calendar: the days a user was active (covered by
+        # idx_user_completed_date)
+        self.SELECT_USER_COMPLETION_DATES = (
+            "SELECT DISTINCT date_completed FROM user_completed_workouts "
+            "WHERE user_id = %s"
+        )
+
+        # Export: completion rows for a user id range
+        self.SELECT_COMPLETIONS_FOR_USER_RANGE = (
+            "SELECT id, user_id, workout_id, date_completed "
+            "FROM user_completed_workouts "
+            "WHERE user_id > %s AND user_id <= %s ORDER BY user_id, id"
+        )
+
+        # Export: favorite rows for a user id range
+        self.SELECT_FAVORITES_FOR_USER_RANGE = (
+            "SELECT user_id, workout_id "
+            "FROM user_favorite_workouts "
+            "WHERE user_id > %s AND user_id <= %s ORDER BY user_id, workout_id"
+        )
+
+        # Analytics: completions joined with user attributes, in change-log
+        # order after a version. Ids are allocated at insert, not commit, so
+        # a lower id can become visible after a higher one; versions can't.
+        self.SELECT_COMPLETION_CHANGES_WITH_USERS = (
+            "SELECT l.version, c.id, c.user_id, c.workout_id, "
+            "c.date_completed, u.birthday, u.gender "
+            "FROM change_log l "
+            "JOIN user_completed_workouts c ON c.id = l.key1 "
+            "JOIN users u ON u.id = c.user_id "
+            "WHERE l.version > %s AND l.entity = 'completion' "
+            "ORDER BY l.version"
+        )
+
+        # Exercise name index
+        self.SELECT_EXERCISE_NAME_KEYS = (
+            "SELECT id, name_key FROM exercises"
+        )
+        self.SELECT_EXERCISE_IDS_BY_NAME_KEY = (
+            "SELECT id, name_key FROM exercises WHERE name_key IN ({ids})"
+        )
+
+        # Cheap catalog version check: row counts and max ids
+        self.SELECT_SERVER_UTC_OFFSET = (
+            "SELECT TIMESTAMPDIFF(SECOND, UTC_TIMESTAMP(), NOW())"
+        )
+        self.SELECT_CATALOG_VERSION = (
+            "SELECT "
+            "(SELECT COUNT(*) FROM workouts), "
+            "(SELECT COALESCE(MAX(id), 0) FROM workouts), "
+            "(SELECT COUNT(*) FROM exercises), "
+            "(SELECT COALESCE(MAX(id), 0) FROM exercises), "
+            "(SELECT COUNT(*) FROM workout_exercises)"
+        )
+        # Changes with every write: logged inserts (imports included) and
+        # unfavorites move the change-log version, compaction the catalog.
+        self.SELECT_DATA_VERSION = (
+            "SELECT "
+            "(SELECT COALESCE(MAX(version), 0) FROM change_log), "
+            "(SELECT COUNT(*) FROM workouts), "
+            "(SELECT COALESCE(MAX(id), 0) FROM workouts), "
+            "(SELECT COUNT(*) FROM exercises), "
+            "(SELECT COALESCE(MAX(id), 0) FROM exercises), "
+            "(SELECT COUNT(*) FROM workout_exercises)"
+        )
+
+        # Export: workout/exercise links
+        self.SELECT_ALL_WORKOUT_EXERCISES = (
+            "SELECT workout_id, exercise_id FROM workout_exercises "
+            "ORDER BY workout_id, exercise_id"
+        )
+
+        # Single-row inserts. A NULL id takes the next AUTO_INCREMENT value;
+        # LAST_INSERT_ID(id) makes lastrowid the existing exercise's id when
+        # the name is already taken.
+        self.INSERT_USER_ID = "INSERT INTO user_id_sequence () VALUES ()"
+        self.INSERT_USER = (
+            "INSERT INTO users "
+            "(id, first_name, middle_name, last_name, birthday, gender) "
+            "VALUES (%s, %s, %s, %s, %s, %s)"
+        )
+        self.INSERT_WORKOUT = (
+            "INSERT INTO workouts (id, title, description) VALUES (%s, %s, %s)"
+        )
+        self.INSERT_EXERCISE = (
+            "INSERT INTO exercises (id, name, name_key, instructions) "
+            "VALUES (%s, %s, %s, %s) "
+            "ON DUPLICATE KEY UPDATE id = LAST_INSERT_ID(id)"
+        )
+        self.INSERT_LINK = (
+            "INSERT INTO workout_exercises (workout_id, exercise_id) VALUES (%s, %s)"
+        )
+        self.INSERT_FAVORITE = (
+            "INSERT INTO user_favorite_workouts (user_id, workout_id) "
+            "VALUES (%s, %s)"
+        )
+
+        # Multi-row inserts; {rows} is one (%s, ...) group per row. The
+        # IGNORE forms are for rows that may already exist (links to
+        # existing workouts, replayed catalog rows); other errors they
+        # downgrade to warnings are raised by raise_ignored_errors.
+        self.INSERT_USER_ROWS = (
+            "INSERT INTO users "
+            "(id, first_name, middle_name, last_name, birthday, gender) "
+            "VALUES {rows}"
+        )
+        self.INSERT_WORKOUT_ROWS = (
+            "INSERT INTO workouts (id, title, description) VALUES {rows}"
+        )
+        self.INSERT_IGNORE_WORKOUT_ROWS = (
+            "INSERT IGNORE INTO workouts (id, title, description) VALUES {rows}"
+        )
+        self.INSERT_IGNORE_EXERCISE_ROWS = (
+            "INSERT IGNORE INTO exercises (id, name, name_key, instructions) "
+            "VALUES {rows}"
+        )
+        self.INSERT_LINK_ROWS = (
+            "INSERT INTO workout_exercises (workout_id, exercise_id) VALUES {rows}"
+        )
+        self.INSERT_IGNORE_LINK_ROWS = (
+            "INSERT IGNORE INTO workout_exercises (workout_id, exercise_id) "
+            "VALUES {rows}"
+        )
+        self.INSERT_IGNORE_FAVORITE_ROWS = (
+            "INSERT IGNORE INTO user_favorite_workouts (user_id, workout_id) "
+            "VALUES {rows}"
+        )
+        self.INSERT_COMPLETION_ROWS = (
+            "INSERT INTO user_completed_workouts "
+            "(user_id, workout_id, date_completed, idempotency_key) VALUES {rows}"
+        )
+
+        # Exercise compaction: relink a duplicate's workouts to the kept
+        # row, then drop the duplicate.
+        self.SELECT_EXERCISE_NAMES = "SELECT id, name FROM exercises ORDER BY id"
+        self.RELINK_EXERCISE = (
+            "INSERT IGNORE INTO workout_exercises (workout_id, exercise_id) "
+            "SELECT workout_id, %s FROM workout_exercises WHERE exercise_id = %s"
+        )
+        self.DELETE_EXERCISE_LINKS = (
+            "DELETE FROM workout_exercises WHERE exercise_id = %s"
+        )
+        self.DELETE_EXERCISE = "DELETE FROM exercises WHERE id = %s"
+        self.UPDATE_EXERCISE_NAME_KEY = (
+            "UPDATE exercises SET name_key = %s WHERE id = %s"
+        )
+
+        # Delta sync: one change_log row per inserted entity or link, written
+        # in the same transaction as the insert. key2 is 0 for entities.
+        # Writers take the clock row before logging and hold it to commit,
+        # so versions are allocated in commit order: once a version is
+        # visible, every lower one is committed (or rolled back) too.
+        self.LOCK_CHANGE_LOG = (
+            "SELECT id FROM change_log_clock WHERE id = 1 FOR UPDATE"
+        )
+        self.INSERT_CHANGE = (
+            "INSERT IGNORE INTO change_log (entity, key1, key2) "
+            "VALUES (%s, %s, %s)"
+        )
+        self.INSERT_CHANGE_ROWS = (
+            "INSERT IGNORE INTO change_log (entity, key1, key2) VALUES {rows}"
+        )
+        self.REPLACE_CHANGE_ROWS = (
+            "REPLACE INTO change_log (entity, key1, key2) VALUES {rows}"
+        )
+        self.INSERT_COMPLETION_CHANGES = (
+            "INSERT IGNORE INTO change_log (entity, key1, key2) "
+            "SELECT 'completion', id, 0 FROM user_completed_workouts "
+            "WHERE id BETWEEN %s AND %s"
+        )
+        self.SELECT_CHANGES_SINCE = (
+            "SELECT version, entity, key1, key2 FROM change_log "
+            "WHERE version > %s ORDER BY version LIMIT %s"
+        )
+        self.SELECT_USERS_BY_IDS = (
+            "SELECT id, first_name, middle_name, last_name, birthday, gender "
+            "FROM users WHERE id IN ({ids})"
+        )
+        self.SELECT_WORKOUTS_BY_IDS = (
+            "SELECT id, title, description FROM workouts WHERE id IN ({ids})"
+        )
+        self.SELECT_EXERCISES_BY_IDS = (
+            "SELECT id, name, instructions FROM exercises WHERE id IN ({ids})"
+        )
+        self.SELECT_COMPLETIONS_BY_IDS = (
+            "SELECT id, user_id, workout_id, date_completed "
+            "FROM user_completed_workouts WHERE id IN ({ids})"
+        )
+
+        # Favorites can be removed, so a user/workout pair keeps exactly one
+        # of a 'favorite' or 'unfavorite' change row: each write deletes the
+        # other kind, and an unfavorite is re-logged with a new version.
+        self.DELETE_FAVORITE_CHANGES = (
+            "DELETE FROM change_log WHERE entity = %s AND key1 = %s "
+            "AND key2 IN ({ids})"
+        )
+        self.DELETE_UNFAVORITE_CHANGES = (
+            "DELETE FROM change_log WHERE entity = 'unfavorite' "
+            "AND (key1, key2) IN ({pairs})"
+        )
+        self.SELECT_FAVORITE_STATES = (
+            "SELECT w.id, f.workout_id IS NOT NULL FROM workouts w "
+            "LEFT JOIN user_favorite_workouts f "
+            "ON f.workout_id = w.id AND f.user_id = %s "
+            "WHERE w.id IN ({ids})"
+        )
+        self.DELETE_FAVORITES = (
+            "DELETE FROM user_favorite_workouts "
+            "WHERE user_id = %s AND workout_id IN ({ids})"
+        )
+        self.SELECT_WORKOUT_IDS = "SELECT id FROM workouts WHERE id IN ({ids})"
+        # Completion writers hold the user row lock, so keys read here
+        # cannot be inserted by anyone else before the transaction ends.
+        self.SELECT_COMPLETION_KEYS = (
+            "SELECT user_id, idempotency_key FROM user_completed_workouts "
+            "WHERE (user_id, idempotency_key) IN ({pairs})"
+        )
+
+        # Materialized profiles: one JSON document per user, rebuilt in the
+        # transaction that changes the user's completions or favorites.
+        # The user row lock serializes rebuilds of the same profile.
+        self.SELECT_USER_FOR_UPDATE = (
+            "SELECT id, first_name, middle_name, last_name, birthday, gender "
+            "FROM users WHERE id = %s FOR UPDATE"
+        )
+        self.UPSERT_PROFILE = (
+            "INSERT INTO user_profiles (user_id, document, stale) "
+            "VALUES (%s, %s, 0) "
+            "ON DUPLICATE KEY UPDATE document = VALUES(document), stale = 0"
+        )
+        self.SELECT_PROFILE = (
+            "SELECT document FROM user_profiles "
+            "WHERE user_id = %s AND stale = 0"
+        )
+        self.MARK_PROFILES_STALE = (
+            "UPDATE user_profiles SET stale = 1 WHERE user_id IN ({ids})"
+        )
+        self.SELECT_USERS_FOR_UPDATE = (
+            "SELECT id, first_name, middle_name, last_name, birthday, gender "
+            "FROM users WHERE id IN ({ids}) ORDER BY id FOR UPDATE"
+        )
+        # Catalog changes stale the profiles embedding the workouts. Their
+        # users are locked (in id order, like every profile writer) before
+        # marking, so a rebuild can't overwrite the mark with a document
+        # read before the change.
+        self.SELECT_EXERCISE_WORKOUT_IDS = (
+            "SELECT DISTINCT workout_id FROM workout_exercises "
+            "WHERE exercise_id IN ({ids})"
+        )
+        self.SELECT_WORKOUTS_USERS = (
+            "SELECT user_id FROM user_completed_workouts WHERE workout_id IN ({ids}) "
+            "UNION SELECT user_id FROM user_favorite_workouts WHERE workout_id IN ({ids})"
+        )
+        self.SELECT_PROFILE_REBUILD_IDS = (
+            "SELECT u.id FROM users u "
+            "LEFT JOIN user_profiles p ON p.user_id = u.id "
+            "WHERE u.id > %s AND (p.user_id IS NULL OR p.stale = 1) "
+            "ORDER BY u.id LIMIT %s"
+        )
+
 
 
 
 # PUBLIC SELECTION METHODS
 
 
+    @resilient
     def select_all_users(self) -> List[User]:
         cursor = None
         results = None
         user_list: List[User] = []
 
         try:
-            connection = self._connection_pool.get_connection()
+            connection = self._get_read_connection()
             with connection:
                 cursor = connection.cursor()
                 with cursor:
@@ -140,14 +559,15 @@ class MySQLPersistenceWrapper(ApplicationBase):
             self._logger.log_error(
                 f"{inspect.currentframe().f_code.co_name}: {e}"
             )
-            return []
+            raise
 
+    @resilient
     def select_all_workouts(self) -> List[Workout]:
         cursor = None
         results = None
         workout_list: List[Workout] = []
         try:
-            connection = self._connection_pool.get_connection()
+            connection = self._get_read_connection()
             with connection:
                 cursor = connection.cursor()
                 with cursor:
@@ -165,14 +585,15 @@ class MySQLPersistenceWrapper(ApplicationBase):
             self._logger.log_error(
                 f"{inspect.currentframe().f_code.co_name}: {e}"
             )
-            return []
+            raise
 
+    @resilient
     def select_all_exercises(self) -> List[Exercise]:
         cursor = None
         results = None
         exercises: List[Exercise] = []
         try:
-            connection = self._connection_pool.get_connection()
+            connection = self._get_read_connection()
             with connection:
                 cursor = connection.cursor()
                 with cursor:
@@ -192,15 +613,23 @@ class MySQLPersistenceWrapper(ApplicationBase):
             self._logger.log_error(
                 f"{inspect.currentframe().f_code.co_name}: {e}"
             )
-            return []
+            raise
+
+    @resilient
+    def select_user_completed(self, user_id: int,
+                              workouts: dict = None) -> List[Completion]:
+        """Return the user's completions, sharing one Workout per id.
 
-    def select_user_completed(self, user_id: int) -> List[Workout]:
+        workouts maps workout id -> Workout; pass the same dict across
+        calls to share workouts (and their exercises) between users.
+        """
         cursor = None
         results = None
-        completed_workouts: List[Workout] = []
+        completed_workouts: List[Completion] = []
+        workouts = {} if workouts is None else workouts
 
         try:
-            connection = self._connection_pool.get_connection()
+            connection = self._get_read_connection(user_id)
             with connection:
                 cursor = connection.cursor()
                 with cursor:
@@ -208,13 +637,15 @@ class MySQLPersistenceWrapper(ApplicationBase):
                     results = cursor.fetchall()
 
             for row in results:
-                w = Workout()
-                w.id = row[0]
-                w.title = row[1]
-                w.description = row[2]
-                w.date_completed = str(row[3])
-                w.exercises = self.select_workout_exercises(w.id)
-                completed_workouts.append(w)
+                w = workouts.get(row[0])
+                if w is None:
+                    w = Workout()
+                    w.id = row[0]
+                    w.title = row[1]
+                    w.description = row[2]
+                    w.exercises = self.select_workout_exercises(w.id)
+                    workouts[w.id] = w
+                completed_workouts.append(Completion(user_id, w, str(row[3])))
 
             return completed_workouts
 
@@ -222,15 +653,19 @@ class MySQLPersistenceWrapper(ApplicationBase):
             self._logger.log_error(
                 f"{inspect.currentframe().f_code.co_name}: {e}"
             )
-            return []
+            raise
 
-    def select_user_favorites(self, user_id: int) -> List[Workout]:
+    @resilient
+    def select_user_favorites(self, user_id: int,
+                              workouts: dict = None) -> List[Workout]:
+        """Return the user's favorite workouts, shared through workouts."""
         cursor = None
         results = None
         favorite_workouts: List[Workout] = []
+        workouts = {} if workouts is None else workouts
 
         try:
-            connection = self._connection_pool.get_connection()
+            connection = self._get_read_connection(user_id)
             with connection:
                 cursor = connection.cursor()
                 with cursor:
@@ -238,11 +673,14 @@ class MySQLPersistenceWrapper(ApplicationBase):
                     results = cursor.fetchall()
 
             for row in results:
-                w = Workout()
-                w.id = row[0]
-                w.title = row[1]
-                w.description = row[2]
-                w.exercises = self.select_workout_exercises(w.id)
+                w = workouts.get(row[0])
+                if w is None:
+                    w = Workout()
+                    w.id = row[0]
+                    w.title = row[1]
+                    w.description = row[2]
+                    w.exercises = self.select_workout_exercises(w.id)
+                    workouts[w.id] = w
                 favorite_workouts.append(w)
 
             return favorite_workouts
@@ -251,15 +689,33 @@ class MySQLPersistenceWrapper(ApplicationBase):
             self._logger.log_error(
                 f"{inspect.currentframe().f_code.co_name}: {e}"
             )
-            return []
+            raise
 
+    @resilient
+    def select_user_completion_dates(self, user_id: int) -> List[date]:
+        """Return the distinct dates on which the user completed a workout."""
+        try:
+            connection = self._get_read_connection(user_id)
+            with connection:
+                cursor = connection.cursor()
+                with cursor:
+                    cursor.execute(self.SELECT_USER_COMPLETION_DATES, (user_id,))
+                    return [row[0] for row in cursor.fetchall()]
+
+        except Exception as e:
+            self._logger.log_error(
+                f"{inspect.currentframe().f_code.co_name}: {e}"
+            )
+            raise
+
+    @resilient
     def select_workout_exercises(self, workout_id: int) -> List[Exercise]:
         cursor = None
         results = None
         exercises: List[Exercise] = []
 
         try:
-            connection = self._connection_pool.get_connection()
+            connection = self._get_read_connection()
             with connection:
                 cursor = connection.cursor()
                 with cursor:
@@ -279,24 +735,242 @@ class MySQLPersistenceWrapper(ApplicationBase):
             self._logger.log_error(
                 f"{inspect.currentframe().f_code.co_name}: {e}"
             )
+            raise
+
+ # PAGED SELECTION METHODS
+
+
+    @resilient
+    def select_users_page(self, offset: int, limit: int,
+                          name_filter: str = "",
+                          after_id: int = 0) -> List[User]:
+        """Return one page of users (without workouts), ordered by id.
+
+        offset counts from the first matching user after after_id.
+        """
+        try:
+            connection = self._get_read_connection()
+            with connection:
+                cursor = connection.cursor()
+                with cursor:
+                    cursor.execute(
+                        self.SELECT_USERS_PAGE_FILTERED,
+                        (after_id, self._like_pattern(name_filter), limit,
+                         offset),
+                    )
+                    results = cursor.fetchall()
+
+            return self._populate_user_objects(results)
+
+        except Exception as e:
+            self._logger.log_error(
+                f"{inspect.currentframe().f_code.co_name}: {e}"
+            )
+            raise
+
+    def count_users(self, name_filter: str = "") -> int:
+        return self._count(self.COUNT_USERS_FILTERED, name_filter)
+
+    @resilient
+    def select_workouts_page(self, offset: int, limit: int,
+                             title_filter: str = "",
+                             after_id: int = 0) -> List[Workout]:
+        """Return one page of workouts with exercises, ordered by id.
+
+        offset counts from the first matching workout after after_id.
+        """
+        try:
+            connection = self._get_read_connection()
+            with connection:
+                cursor = connection.cursor()
+                with cursor:
+                    cursor.execute(
+                        self.SELECT_WORKOUTS_PAGE_FILTERED,
+                        (after_id, self._like_pattern(title_filter), limit,
+                         offset),
+                    )
+                    results = cursor.fetchall()
+
+            workout_list = self._populate_workout_objects(results)
+            exercises = self.select_exercises_for_workouts(
+                [w.id for w in workout_list]
+            )
+            for w in workout_list:
+                w.exercises = exercises.get(w.id, [])
+
+            return workout_list
+
+        except Exception as e:
+            self._logger.log_error(
+                f"{inspect.currentframe().f_code.co_name}: {e}"
+            )
+            raise
+
+    def count_workouts(self, title_filter: str = "") -> int:
+        return self._count(self.COUNT_WORKOUTS_FILTERED, title_filter)
+
+    def select_completed_for_users(self, user_ids: List[int],
+                                   workouts: dict = None,
+                                   per_user: int = None,
+                                   totals: dict = None) -> dict:
+        """Map user id -> completions (workout title only, no exercises).
+
+        With per_user, at most that many (the oldest) per user are read,
+        and totals, if given, is filled with each user's full count.
+        """
+        completed: dict = {}
+        workouts = {} if workouts is None else workouts
+        if per_user is None:
+            rows = self._select_for_ids(self.SELECT_COMPLETED_TITLES_FOR_USERS,
+                                        user_ids)
+        else:
+            rows = self._select_for_ids(
+                self.SELECT_COMPLETED_TITLES_FOR_USERS_CAPPED, user_ids,
+                (per_user,),
+            )
+        for row in rows:
+            w = self._title_only_workout(workouts, row[1], row[2])
+            completed.setdefault(row[0], []).append(
+                Completion(row[0], w, str(row[3]))
+            )
+            if per_user is not None and totals is not None:
+                totals[row[0]] = row[4]
+        return completed
+
+    def select_favorites_for_users(self, user_ids: List[int],
+                                   workouts: dict = None,
+                                   per_user: int = None,
+                                   totals: dict = None) -> dict:
+        """Map user id -> favorite workouts (title only, no exercises).
+
+        per_user and totals work as in select_completed_for_users().
+        """
+        favorites: dict = {}
+        workouts = {} if workouts is None else workouts
+        if per_user is None:
+            rows = self._select_for_ids(self.SELECT_FAVORITE_TITLES_FOR_USERS,
+                                        user_ids)
+        else:
+            rows = self._select_for_ids(
+                self.SELECT_FAVORITE_TITLES_FOR_USERS_CAPPED, user_ids,
+                (per_user,),
+            )
+        for row in rows:
+            favorites.setdefault(row[0], []).append(
+                self._title_only_workout(workouts, row[1], row[2])
+            )
+            if per_user is not None and totals is not None:
+                totals[row[0]] = row[3]
+        return favorites
+
+    def _title_only_workout(self, workouts: dict, workout_id: int,
+                            title: str) -> Workout:
+        w = workouts.get(workout_id)
+        if w is None:
+            w = Workout()
+            w.id = workout_id
+            w.title = title
+            workouts[workout_id] = w
+        return w
+
+    def select_exercises_for_workouts(self, workout_ids: List[int]) -> dict:
+        """Map workout id -> exercises, in one query."""
+        exercises: dict = {}
+        for row in self._select_for_ids(
+            self.SELECT_EXERCISES_FOR_WORKOUTS, workout_ids
+        ):
+            ex = Exercise()
+            ex.id = row[1]
+            ex.name = row[2]
+            ex.instructions = row[3]
+            exercises.setdefault(row[0], []).append(ex)
+        return exercises
+
+    @resilient
+    def _select_for_ids(self, query: str, ids: List[int],
+                        params: tuple = ()) -> List:
+        if not ids:
             return []
+        try:
+            connection = self._get_read_connection()
+            with connection:
+                cursor = connection.cursor()
+                with cursor:
+                    cursor.execute(
+                        query.format(ids=", ".join(["%s"] * len(ids))),
+                        tuple(ids) + tuple(params),
+                    )
+                    return cursor.fetchall()
+
+        except Exception as e:
+            self._logger.log_error(
+                f"{inspect.currentframe().f_code.co_name}: {e}"
+            )
+            raise
 
- # INSERT / LINK METHODS
+    @resilient
+    def _count(self, query: str, text_filter: str) -> int:
+        try:
+            connection = self._get_read_connection()
+            with connection:
+                cursor = connection.cursor()
+                with cursor:
+                    cursor.execute(query, (self._like_pattern(text_filter),))
+                    return int(cursor.fetchone()[0])
+
+        except Exception as e:
+            self._logger.log_error(
+                f"{inspect.currentframe().f_code.co_name}: {e}"
+            )
+            raise
 
+    def _like_pattern(self, text: str) -> str:
+        escaped = (text or "").replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        return f"%{escaped}%"
 
+# INSERT / LINK METHODS
+
+
+    @resilient(idempotent=False)
+    def allocate_user_id(self) -> int:
+        """Reserve a new user id from the user_id_sequence table.
+
+        A sharded import reserves blocks of explicit ids; an id handed out
+        while one was being inserted collides with it and is retried.
+        """
+        try:
+            connection = self._connection_pool.get_connection()
+            with connection:
+                cursor = connection.cursor()
+                with cursor:
+                    for attempt in range(3):
+                        try:
+                            cursor.execute(self.INSERT_USER_ID)
+                            connection.commit()
+                            return cursor.lastrowid
+                        except Exception as e:
+                            if (getattr(e, "errno", None) != DUPLICATE_KEY_ERRNO
+                                    or attempt == 2):
+                                raise
+                            connection.rollback()
+        except Exception as e:
+            self._logger.log_error(
+                f"{inspect.currentframe().f_code.co_name}: {e}"
+            )
+            raise
+
+    @resilient(idempotent=False)
     def insert_user(self, user: User) -> Optional[int]:
+        """Insert a user; a non-zero user.id is used instead of AUTO_INCREMENT."""
         try:
             connection = self._connection_pool.get_connection()
             with connection:
                 cursor = connection.cursor()
                 with cursor:
                     cursor.execute(
-                        """
-                        INSERT INTO users
-                        (first_name, middle_name, last_name, birthday, gender)
-                        VALUES (%s, %s, %s, %s, %s)
-                        """,
+                        self.INSERT_USER,
                         (
+                            user.id or None,
                             user.first_name,
                             user.middle_name,
                             user.last_name,
@@ -304,56 +978,181 @@ class MySQLPersistenceWrapper(ApplicationBase):
                             user.gender,
                         ),
                     )
+                    user_id = cursor.lastrowid or user.id
+                    self._lock_change_log(cursor)
+                    cursor.execute(self.INSERT_CHANGE, ("user", user_id, 0))
+                    self._write_profile(
+                        cursor, self._lock_profile(cursor, user_id)
+                    )
                     connection.commit()
-                    return cursor.lastrowid
+                    self._note_write(user_id)
+                    return user_id
         except Exception as e:
             self._logger.log_error(
                 f"{inspect.currentframe().f_code.co_name}: {e}"
             )
-            return None
+            raise
 
+    @resilient(idempotent=False)
     def insert_workout(self, workout: Workout) -> Optional[int]:
+        """Insert a workout; a non-zero workout.id is used as given."""
         try:
             connection = self._connection_pool.get_connection()
             with connection:
                 cursor = connection.cursor()
                 with cursor:
                     cursor.execute(
-                        """
-                        INSERT INTO workouts (title, description)
-                        VALUES (%s, %s)
-                        """,
-                        (workout.title, workout.description),
+                        self.INSERT_WORKOUT,
+                        (workout.id or None, workout.title, workout.description),
                     )
+                    workout_id = cursor.lastrowid or workout.id
+                    self._lock_change_log(cursor)
+                    cursor.execute(self.INSERT_CHANGE, ("workout", workout_id, 0))
                     connection.commit()
-                    return cursor.lastrowid
+                    self._note_write()
+                    return workout_id
         except Exception as e:
             self._logger.log_error(
                 f"{inspect.currentframe().f_code.co_name}: {e}"
             )
-            return None
+            raise
 
+    @resilient
     def insert_exercise(self, exercise: Exercise) -> Optional[int]:
+        """Insert an exercise, or return the id of one with the same name.
+
+        A non-zero exercise.id is used for the new row as given.
+        """
         try:
+            name_key = normalize_exercise_name(exercise.name)
             connection = self._connection_pool.get_connection()
             with connection:
                 cursor = connection.cursor()
                 with cursor:
                     cursor.execute(
-                        """
-                        INSERT INTO exercises (name, instructions)
-                        VALUES (%s, %s)
-                        """,
-                        (exercise.name, exercise.instructions),
+                        self.INSERT_EXERCISE,
+                        (exercise.id or None, exercise.name, name_key,
+                         exercise.instructions),
                     )
+                    exercise_id = cursor.lastrowid
+                    self._lock_change_log(cursor)
+                    # Ignored when the exercise was already logged.
+                    cursor.execute(self.INSERT_CHANGE,
+                                   ("exercise", exercise_id, 0))
                     connection.commit()
-                    return cursor.lastrowid
+                    self._note_write()
+
+            with self._exercise_name_index_lock:
+                if self._exercise_name_index is not None:
+                    self._exercise_name_index[name_key] = exercise_id
+            return exercise_id
         except Exception as e:
             self._logger.log_error(
                 f"{inspect.currentframe().f_code.co_name}: {e}"
             )
-            return None
+            raise
+
+    @resilient
+    def upsert_exercises(self, exercises: List[Exercise]) -> List[Optional[int]]:
+        """Return an id for each exercise, inserting only unknown names.
+
+        Names are resolved through the in-memory index first, then with one
+        batched lookup for the misses; only names absent from the database
+        are inserted.
+        """
+        try:
+            keys = [normalize_exercise_name(ex.name) for ex in exercises]
+            index = self._get_exercise_name_index()
+
+            missing = sorted({k for k in keys if k not in index})
+            if missing:
+                found = {
+                    row[1]: row[0]
+                    for row in self._select_for_ids(
+                        self.SELECT_EXERCISE_IDS_BY_NAME_KEY, missing
+                    )
+                }
+                with self._exercise_name_index_lock:
+                    index.update(found)
+
+            ids: List[Optional[int]] = []
+            for ex, key in zip(exercises, keys):
+                if key not in index:
+                    # insert_exercise() records the new id in the index.
+                    self.insert_exercise(ex)
+                ids.append(index.get(key))
+            return ids
 
+        except Exception as e:
+            self._logger.log_error(
+                f"{inspect.currentframe().f_code.co_name}: {e}"
+            )
+            raise
+
+    @resilient
+    def compact_exercises(self) -> dict:
+        """Merge exercises with the same normalised name into the lowest id.
+
+        Relinks workout_exercises to the kept row, deletes the duplicates
+        and fills name_key, all in one transaction. Run once before the
+        unique key on name_key is enforced.
+        """
+        connection = self._connection_pool.get_connection()
+        with connection:
+            cursor = connection.cursor()
+            with cursor:
+                try:
+                    cursor.execute(self.SELECT_EXERCISE_NAMES)
+                    keep: dict = {}
+                    duplicates: dict = {}
+                    for exercise_id, name in cursor.fetchall():
+                        key = normalize_exercise_name(name)
+                        if key in keep:
+                            duplicates[exercise_id] = keep[key]
+                        else:
+                            keep[key] = exercise_id
+
+                    # Stored profiles embed the ids being merged away.
+                    stale_user_ids = []
+                    if duplicates:
+                        workout_ids = [row[0] for row in self._execute_for_ids(
+                            cursor, self.SELECT_EXERCISE_WORKOUT_IDS,
+                            list(duplicates),
+                        )]
+                        stale_user_ids = self._lock_workouts_users(cursor,
+                                                                   workout_ids)
+
+                    for duplicate_id, kept_id in duplicates.items():
+                        cursor.execute(self.RELINK_EXERCISE,
+                                       (kept_id, duplicate_id))
+                        cursor.execute(self.DELETE_EXERCISE_LINKS,
+                                       (duplicate_id,))
+                        cursor.execute(self.DELETE_EXERCISE, (duplicate_id,))
+
+                    cursor.executemany(self.UPDATE_EXERCISE_NAME_KEY,
+                                       list(keep.items()))
+                    self._execute_for_ids(cursor, self.MARK_PROFILES_STALE,
+                                          stale_user_ids)
+                    connection.commit()
+                except Exception:
+                    connection.rollback()
+                    raise
+
+        with self._exercise_name_index_lock:
+            self._exercise_name_index = dict(keep)
+        self._note_write()
+        return {"kept": len(keep), "merged": len(duplicates)}
+
+    def _get_exercise_name_index(self) -> dict:
+        with self._exercise_name_index_lock:
+            if self._exercise_name_index is None:
+                index = {}
+                for row in self._stream_rows(self.SELECT_EXERCISE_NAME_KEYS, ()):
+                    index[row[1]] = row[0]
+                self._exercise_name_index = index
+            return self._exercise_name_index
+
+    @resilient(idempotent=False)
     def link_workout_exercise(self, workout_id: int, exercise_id: int) -> bool:
         """Create association between a workout and an exercise."""
         try:
@@ -361,21 +1160,23 @@ class MySQLPersistenceWrapper(ApplicationBase):
             with connection:
                 cursor = connection.cursor()
                 with cursor:
-                    cursor.execute(
-                        """
-                        INSERT INTO workout_exercises (workout_id, exercise_id)
-                        VALUES (%s, %s)
-                        """,
-                        (workout_id, exercise_id),
-                    )
+                    user_ids = self._lock_workouts_users(cursor, [workout_id])
+                    cursor.execute(self.INSERT_LINK, (workout_id, exercise_id))
+                    self._lock_change_log(cursor)
+                    cursor.execute(self.INSERT_CHANGE,
+                                   ("workout_exercise", workout_id, exercise_id))
+                    self._execute_for_ids(cursor, self.MARK_PROFILES_STALE,
+                                          user_ids)
                     connection.commit()
+                    self._note_write()
                     return True
         except Exception as e:
             self._logger.log_error(
                 f"{inspect.currentframe().f_code.co_name}: {e}"
             )
-            return False
+            raise
 
+    @resilient(idempotent=False)
     def insert_user_favorite_workout(
         self, user_id: int, workout_id: int
     ) -> bool:
@@ -384,49 +1185,1004 @@ class MySQLPersistenceWrapper(ApplicationBase):
             with connection:
                 cursor = connection.cursor()
                 with cursor:
-                    cursor.execute(
-                        """
-                        INSERT INTO user_favorite_workouts (user_id, workout_id)
-                        VALUES (%s, %s)
-                        """,
-                        (user_id, workout_id),
-                    )
+                    user_row = self._lock_profile(cursor, user_id)
+                    cursor.execute(self.INSERT_FAVORITE, (user_id, workout_id))
+                    self._lock_change_log(cursor)
+                    cursor.execute(self.DELETE_FAVORITE_CHANGES.format(ids="%s"),
+                                   ("unfavorite", user_id, workout_id))
+                    cursor.execute(self.INSERT_CHANGE,
+                                   ("favorite", user_id, workout_id))
+                    self._write_profile(cursor, user_row)
                     connection.commit()
+                    self._note_write(user_id)
                     return True
         except Exception as e:
             self._logger.log_error(
                 f"{inspect.currentframe().f_code.co_name}: {e}"
             )
-            return False
+            raise
     
-    def insert_user_completed_workout(self, user_id: int, workout_id: int) -> bool:
+    def insert_user_completed_workout(self, user_id: int, workout_id: int,
+                                      idempotency_key: str = None) -> bool:
         """Record that a user completed a workout."""
+        return self.insert_user_completed_workout_once(
+            user_id, workout_id, idempotency_key
+        ) is not None
+
+    @resilient(idempotent=False)
+    def insert_user_completed_workout_once(
+        self, user_id: int, workout_id: int, idempotency_key: str = None
+    ) -> Optional[bool]:
+        """Record a completion unless (user_id, idempotency_key) exists.
+
+        Returns True if a row was inserted and False if it was a duplicate.
+        A NULL key never counts as a duplicate.
+        """
+        try:
+            connection = self._connection_pool.get_connection()
+            with connection:
+                cursor = connection.cursor()
+                with cursor:
+                    user_row = self._lock_profile(cursor, user_id)
+                    if user_row is None:
+                        raise QueryError(f"User {user_id} does not exist")
+                    inserted = bool(self._insert_completions(
+                        cursor, [(user_id, workout_id, None, idempotency_key)]
+                    ))
+                    if inserted:
+                        self._write_profile(cursor, user_row)
+                    connection.commit()
+                    self._note_write(user_id)
+                    return inserted
+        except Exception as e:
+            self._logger.log_error(
+                f"{inspect.currentframe().f_code.co_name}: {e}"
+            )
+            raise
+
+    @resilient(idempotent=False)
+    def insert_user_completed_workouts(self, rows: List[tuple]) -> bool:
+        """Record many completions as one multi-row insert and commit.
+
+        Each row is (user_id, workout_id, date_completed, idempotency_key),
+        where a date of None means the server's date; rows whose key
+        already exists for the user are skipped.
+        """
+        if not rows:
+            return True
         try:
             connection = self._connection_pool.get_connection()
             with connection:
                 cursor = connection.cursor()
                 with cursor:
+                    user_ids = sorted({row[0] for row in rows})
+                    self._execute_for_ids(cursor, self.SELECT_USERS_FOR_UPDATE,
+                                          user_ids)
+                    if self._insert_completions(cursor, rows):
+                        # Rebuilding every profile here would multiply the
+                        # flush's round trips; they are rebuilt on next
+                        # read or by the background rebuild.
+                        cursor.execute(
+                            self.MARK_PROFILES_STALE.format(
+                                ids=", ".join(["%s"] * len(user_ids))
+                            ),
+                            user_ids,
+                        )
+                    connection.commit()
+                    for user_id in {row[0] for row in rows}:
+                        self._note_write(user_id)
+                    return True
+        except Exception as e:
+            self._logger.log_error(
+                f"{inspect.currentframe().f_code.co_name}: {e}"
+            )
+            raise
+
+
+# BULK USER METHODS
+
+    @resilient
+    def insert_user_favorite_workouts(self, user_id: int,
+                                      workout_ids: List[int]) -> dict:
+        """Favorite many workouts with one multi-row insert.
+
+        Returns {workout_id: "added" | "exists" | "not_found"}, or an empty
+        dict if the user does not exist.
+        """
+        workout_ids = list(dict.fromkeys(workout_ids))
+        if not workout_ids:
+            return {}
+        try:
+            connection = self._connection_pool.get_connection()
+            with connection:
+                cursor = connection.cursor()
+                with cursor:
+                    user_row = self._lock_profile(cursor, user_id)
+                    if user_row is None:
+                        connection.rollback()
+                        return {}
+                    # Favorite writes all hold the user lock, so the
+                    # states read here are the ones the insert sees.
                     cursor.execute(
-                        """
-                        INSERT INTO user_completed_workouts (user_id, workout_id, date_completed)
-                        VALUES (%s, %s, CURDATE())
-                        """,
-                        (user_id, workout_id),
+                        self.SELECT_FAVORITE_STATES.format(
+                            ids=", ".join(["%s"] * len(workout_ids))
+                        ),
+                        (user_id, *workout_ids),
                     )
+                    states = dict(cursor.fetchall())
+                    outcomes = {
+                        w: ("not_found" if w not in states
+                            else "exists" if states[w] else "added")
+                        for w in workout_ids
+                    }
+                    added = [w for w in workout_ids if outcomes[w] == "added"]
+                    if added:
+                        self._insert_rows(
+                            cursor, self.INSERT_IGNORE_FAVORITE_ROWS,
+                            [(user_id, w) for w in added],
+                        )
+                        self._log_favorite_changes(cursor, "favorite", user_id,
+                                                   added)
+                        self._write_profile(cursor, user_row)
                     connection.commit()
-                    return True
+                    self._note_write(user_id)
+                    return outcomes
+        except Exception as e:
+            self._logger.log_error(
+                f"{inspect.currentframe().f_code.co_name}: {e}"
+            )
+            raise
+
+    @resilient
+    def delete_user_favorite_workouts(self, user_id: int,
+                                      workout_ids: List[int]) -> dict:
+        """Unfavorite many workouts with one DELETE ... IN.
+
+        Returns {workout_id: "removed" | "not_favorite"}, or an empty dict
+        if the user does not exist.
+        """
+        workout_ids = list(dict.fromkeys(workout_ids))
+        if not workout_ids:
+            return {}
+        try:
+            connection = self._connection_pool.get_connection()
+            with connection:
+                cursor = connection.cursor()
+                with cursor:
+                    user_row = self._lock_profile(cursor, user_id)
+                    if user_row is None:
+                        connection.rollback()
+                        return {}
+                    placeholders = ", ".join(["%s"] * len(workout_ids))
+                    cursor.execute(
+                        self.SELECT_FAVORITE_STATES.format(ids=placeholders),
+                        (user_id, *workout_ids),
+                    )
+                    removed = [w for w, is_favorite in cursor.fetchall()
+                               if is_favorite]
+                    if removed:
+                        cursor.execute(
+                            self.DELETE_FAVORITES.format(
+                                ids=", ".join(["%s"] * len(removed))
+                            ),
+                            (user_id, *removed),
+                        )
+                        self._log_favorite_changes(cursor, "unfavorite",
+                                                   user_id, removed)
+                        self._write_profile(cursor, user_row)
+                    connection.commit()
+                    self._note_write(user_id)
+                    removed = set(removed)
+                    return {
+                        w: "removed" if w in removed else "not_favorite"
+                        for w in workout_ids
+                    }
+        except Exception as e:
+            self._logger.log_error(
+                f"{inspect.currentframe().f_code.co_name}: {e}"
+            )
+            raise
+
+    @resilient(idempotent=False)
+    def insert_user_completed_workouts_for_user(
+        self, user_id: int, workout_ids: List[int],
+        date_completed: date = None, idempotency_keys: List[str] = None
+    ) -> dict:
+        """Record completions of many workouts with one multi-row insert.
+
+        idempotency_keys, if given, holds one key (or None) per workout id.
+        date_completed defaults to the server's date. Returns
+        {workout_id: "completed" | "duplicate" | "not_found"}, or an empty
+        dict if the user does not exist.
+        """
+        keys = dict(zip(workout_ids, idempotency_keys or [None] * len(workout_ids)))
+        if not keys:
+            return {}
+        try:
+            connection = self._connection_pool.get_connection()
+            with connection:
+                cursor = connection.cursor()
+                with cursor:
+                    user_row = self._lock_profile(cursor, user_id)
+                    if user_row is None:
+                        connection.rollback()
+                        return {}
+                    cursor.execute(
+                        self.SELECT_WORKOUT_IDS.format(
+                            ids=", ".join(["%s"] * len(keys))
+                        ),
+                        tuple(keys),
+                    )
+                    found = [row[0] for row in cursor.fetchall()]
+                    inserted = {row[1] for row in self._insert_completions(
+                        cursor,
+                        [(user_id, w, date_completed, keys[w]) for w in found],
+                    )}
+                    if inserted:
+                        self._write_profile(cursor, user_row)
+                    connection.commit()
+                    self._note_write(user_id)
+                    found = set(found)
+                    return {
+                        w: ("completed" if w in inserted
+                            else "duplicate" if w in found else "not_found")
+                        for w in keys
+                    }
+        except Exception as e:
+            self._logger.log_error(
+                f"{inspect.currentframe().f_code.co_name}: {e}"
+            )
+            raise
+
+    def _log_favorite_changes(self, cursor, entity: str, user_id: int,
+                              workout_ids: List[int]) -> None:
+        other = "unfavorite" if entity == "favorite" else "favorite"
+        placeholders = ", ".join(["%s"] * len(workout_ids))
+        self._lock_change_log(cursor)
+        cursor.execute(
+            self.DELETE_FAVORITE_CHANGES.format(ids=placeholders),
+            (other, user_id, *workout_ids),
+        )
+        # REPLACE gives a repeated unfavorite a new version.
+        self._insert_rows(
+            cursor,
+            self.INSERT_CHANGE_ROWS if entity == "favorite"
+            else self.REPLACE_CHANGE_ROWS,
+            [(entity, user_id, w) for w in workout_ids],
+        )
+
+
+# UNIT OF WORK
+
+
+    def session(self) -> UnitOfWork:
+        """Start a unit of work whose writes commit as one transaction."""
+        return UnitOfWork(self)
+
+    @resilient(idempotent=False)
+    def commit_unit_of_work(self, uow: UnitOfWork) -> dict:
+        """Write a UnitOfWork's queue on one connection and commit once.
+
+        Returns the number of rows written per table. Generated ids are
+        copied to the queued entities only after the commit, so a failed
+        attempt leaves them untouched and the unit can be retried.
+        """
+        try:
+            return self._commit_unit_of_work(uow, replay=False)
+        except Exception as e:
+            self._logger.log_error(
+                f"{inspect.currentframe().f_code.co_name}: {e}"
+            )
+            raise
+
+    @resilient
+    def replay_unit_of_work(self, uow: UnitOfWork) -> dict:
+        """Commit catalog rows already committed elsewhere, with their ids.
+
+        Used to copy a unit's workouts, exercises and links to the other
+        shards. Rows that already exist are skipped, so a replay can be
+        retried after an ambiguous failure.
+        """
+        try:
+            return self._commit_unit_of_work(uow, replay=True)
+        except Exception as e:
+            self._logger.log_error(
+                f"{inspect.currentframe().f_code.co_name}: {e}"
+            )
+            raise
+
+    def _commit_unit_of_work(self, uow: UnitOfWork, replay: bool) -> dict:
+        # Loaded before taking the transaction's connection.
+        index = self._get_exercise_name_index() if uow.exercises else {}
+        connection = self._connection_pool.get_connection()
+        with connection:
+            cursor = connection.cursor()
+            with cursor:
+                try:
+                    counts, new_ids, name_keys = self._write_unit_of_work(
+                        cursor, uow, index, replay
+                    )
+                    connection.commit()
+                except Exception:
+                    connection.rollback()
+                    raise
+
+        for entity in uow.users + uow.workouts + uow.exercises:
+            entity.id = new_ids.get(id(entity), entity.id)
+        with self._exercise_name_index_lock:
+            if self._exercise_name_index is not None:
+                self._exercise_name_index.update(name_keys)
+        self._note_write()
+        for user_id in {f[0] for f in uow.favorites + uow.completions}:
+            self._note_write(user_id)
+        return counts
+
+    def _write_unit_of_work(self, cursor, uow: UnitOfWork,
+                            exercise_index: dict, replay: bool = False) -> tuple:
+        new_ids: dict = {}
+
+        def ref(entity) -> int:
+            if isinstance(entity, int):
+                return entity
+            return new_ids.get(id(entity)) or entity.id
+
+        # Lock profile owners first, as the single-row writes do: users
+        # gaining favorites or completions, and users of existing workouts
+        # gaining exercises (whose profiles go stale).
+        queued_workouts = {id(w) for w in uow.workouts}
+        relinked = sorted({
+            ref(w) for w, _ in uow.links
+            if isinstance(w, int) or id(w) not in queued_workouts
+        })
+        touched = sorted({f[0] for f in uow.favorites + uow.completions})
+        stale_user_ids = []
+        if relinked:
+            stale_user_ids = [row[0] for row in self._execute_for_ids(
+                cursor, self.SELECT_WORKOUTS_USERS, relinked
+            ) if row[0] not in touched]
+        locked = {
+            row[0]: row
+            for row in self._execute_for_ids(
+                cursor, self.SELECT_USERS_FOR_UPDATE,
+                sorted(set(touched) | set(stale_user_ids)),
+            )
+        }
+
+        self._insert_entities(
+            cursor,
+            self.INSERT_USER_ROWS,
+            uow.users,
+            lambda u: (u.id or None, u.first_name, u.middle_name,
+                       u.last_name, u.birthday, u.gender),
+            new_ids,
+        )
+        self._insert_entities(
+            cursor,
+            self.INSERT_IGNORE_WORKOUT_ROWS if replay else self.INSERT_WORKOUT_ROWS,
+            uow.workouts,
+            lambda w: (w.id or None, w.title, w.description),
+            new_ids,
+        )
+
+        # Exercises are resolved by name: only names not yet known are
+        # inserted, then one lookup maps every name to its id.
+        name_keys: dict = {}
+        missing: dict = {}
+        inserted_exercises = 0
+        for ex in uow.exercises:
+            key = normalize_exercise_name(ex.name)
+            name_keys[key] = None
+            if key not in exercise_index:
+                missing.setdefault(key, ex)
+        if missing:
+            rows = [(ex.id or None, ex.name, key, ex.instructions)
+                    for key, ex in missing.items()]
+            inserted_exercises = self._insert_rows(
+                cursor, self.INSERT_IGNORE_EXERCISE_ROWS, rows,
+            )
+        if name_keys:
+            for exercise_id, key in self._execute_for_ids(
+                cursor, self.SELECT_EXERCISE_IDS_BY_NAME_KEY, list(name_keys)
+            ):
+                name_keys[key] = exercise_id
+            for ex in uow.exercises:
+                new_ids[id(ex)] = name_keys[normalize_exercise_name(ex.name)]
+
+        counts = {
+            "users": len(uow.users),
+            "workouts": len(uow.workouts),
+            "exercises": inserted_exercises,
+        }
+        changes = (
+            [("user", new_ids[id(u)], 0) for u in uow.users]
+            + [("workout", new_ids[id(w)], 0) for w in uow.workouts]
+            + [("exercise", name_keys[key], 0) for key in missing]
+        )
+
+        links = list(dict.fromkeys((ref(w), ref(e)) for w, e in uow.links))
+        favorites = list(dict.fromkeys((u, ref(w)) for u, w in uow.favorites))
+        # Links to workouts created here can't exist yet, so they use a
+        # plain INSERT; re-linking an existing workout is a no-op. Either
+        # way an unknown exercise id fails the unit.
+        created = set() if replay else {new_ids[id(w)] for w in uow.workouts}
+        counts["links"] = self._insert_rows(
+            cursor, self.INSERT_LINK_ROWS,
+            [link for link in links if link[0] in created],
+        ) + self._insert_rows(
+            cursor, self.INSERT_IGNORE_LINK_ROWS,
+            [link for link in links if link[0] not in created],
+        )
+        counts["favorites"] = self._insert_rows(
+            cursor, self.INSERT_IGNORE_FAVORITE_ROWS, favorites,
+        )
+        changes += [("workout_exercise", w, e) for w, e in links]
+        changes += [("favorite", u, w) for u, w in favorites]
+        self._lock_change_log(cursor)
+        if favorites:
+            cursor.execute(
+                self.DELETE_UNFAVORITE_CHANGES.format(
+                    pairs=", ".join(["(%s, %s)"] * len(favorites))
+                ),
+                [value for row in favorites for value in row],
+            )
+
+        counts["completions"] = len(self._insert_completions(
+            cursor, [(u, ref(w), day, key) for u, w, day, key in uow.completions]
+        ))
+        self._insert_rows(cursor, self.INSERT_CHANGE_ROWS, changes)
+
+        # Profiles: users of existing workouts that gained exercises go
+        # stale, then new and touched users are rebuilt.
+        self._execute_for_ids(cursor, self.MARK_PROFILES_STALE,
+                              [u for u in stale_user_ids if u in locked])
+        for u in uow.users:
+            self._write_profile(cursor, (new_ids[id(u)], u.first_name,
+                                         u.middle_name, u.last_name,
+                                         u.birthday, u.gender))
+        for user_id in touched:
+            self._write_profile(cursor, locked.get(user_id))
+
+        return counts, new_ids, {k: v for k, v in name_keys.items() if v}
+
+    def _insert_completions(self, cursor, rows: List[tuple]) -> List[tuple]:
+        """Insert completion rows whose idempotency key is new; return them.
+
+        Rows are (user_id, workout_id, date_completed or None for the
+        server's date, idempotency_key). The caller must hold the row locks
+        of every user in rows, as all completion writers do, so existing
+        keys are filtered here instead of with INSERT IGNORE (which would
+        also hide foreign key and conversion errors). The remaining rows go
+        in one plain multi-row INSERT, whose ids are one block starting at
+        lastrowid, and are change-logged by that exact range.
+        """
+        keyed = list(dict.fromkeys((r[0], r[3]) for r in rows if r[3] is not None))
+        existing: set = set()
+        if keyed:
+            cursor.execute(
+                self.SELECT_COMPLETION_KEYS.format(
+                    pairs=", ".join(["(%s, %s)"] * len(keyed))
+                ),
+                [value for pair in keyed for value in pair],
+            )
+            existing = {tuple(row) for row in cursor.fetchall()}
+
+        new_rows = []
+        for row in rows:
+            if row[3] is not None:
+                if (row[0], row[3]) in existing:
+                    continue
+                existing.add((row[0], row[3]))
+            new_rows.append(row)
+        if new_rows:
+            self._insert_rows(
+                cursor, self.INSERT_COMPLETION_ROWS, new_rows,
+                "(%s, %s, COALESCE(%s, CURDATE()), %s)",
+            )
+            first_id = cursor.lastrowid
+            self._lock_change_log(cursor)
+            cursor.execute(self.INSERT_COMPLETION_CHANGES,
+                           (first_id, first_id + len(new_rows) - 1))
+        return new_rows
+
+    def _insert_entities(self, cursor, query: str, entities: list, values,
+                         new_ids: dict) -> None:
+        """Multi-row insert of entities, recording their ids in new_ids.
+
+        Rows with and without an explicit id go in separate statements: a
+        multi-row insert of only generated ids gets one consecutive block
+        starting at lastrowid.
+        """
+        explicit = [e for e in entities if e.id]
+        generated = [e for e in entities if not e.id]
+        for group in (explicit, generated):
+            if not group:
+                continue
+            self._insert_rows(cursor, query, [values(e) for e in group])
+            first_id = cursor.lastrowid
+            for i, e in enumerate(group):
+                new_ids[id(e)] = e.id or first_id + i
+
+    def _insert_rows(self, cursor, query: str, rows: list,
+                     row_template: str = None) -> int:
+        """Insert rows with one multi-row statement; returns rows inserted.
+
+        query is one of the *_ROWS statements; {rows} is filled in here.
+        """
+        if not rows:
+            return 0
+        cursor.execute(query.format(rows=self._values_clause(rows, row_template)),
+                       [value for row in rows for value in row])
+        count = cursor.rowcount
+        if query.startswith("INSERT IGNORE"):
+            raise_ignored_errors(cursor)
+        return count
+
+    def _values_clause(self, rows: list, row_template: str = None) -> str:
+        row_template = row_template or "(" + ", ".join(["%s"] * len(rows[0])) + ")"
+        return ", ".join([row_template] * len(rows))
+
+    def _lock_change_log(self, cursor) -> None:
+        """Hold the change_log clock until commit (see LOCK_CHANGE_LOG)."""
+        cursor.execute(self.LOCK_CHANGE_LOG)
+        cursor.fetchall()
+
+    def _lock_workouts_users(self, cursor, workout_ids: List[int]) -> List[int]:
+        """Lock the users whose profiles embed workout_ids; return their ids."""
+        user_ids = sorted(row[0] for row in self._execute_for_ids(
+            cursor, self.SELECT_WORKOUTS_USERS, workout_ids
+        ))
+        return [row[0] for row in self._execute_for_ids(
+            cursor, self.SELECT_USERS_FOR_UPDATE, user_ids
+        )]
+
+    def _execute_for_ids(self, cursor, query: str, ids: list) -> list:
+        if not ids:
+            return []
+        cursor.execute(query.format(ids=", ".join(["%s"] * len(ids))), tuple(ids))
+        return cursor.fetchall()
+
+
+# USER PROFILES
+
+
+    @resilient
+    def select_user_profile(self, user_id: int) -> Optional[str]:
+        """Return the user's profile document, or None if missing or stale."""
+        try:
+            connection = self._get_read_connection(user_id)
+            with connection:
+                cursor = connection.cursor()
+                with cursor:
+                    cursor.execute(self.SELECT_PROFILE, (user_id,))
+                    row = cursor.fetchone()
+                    return row[0] if row else None
+
+        except Exception as e:
+            self._logger.log_error(
+                f"{inspect.currentframe().f_code.co_name}: {e}"
+            )
+            raise
+
+    @resilient
+    def rebuild_user_profile(self, user_id: int) -> Optional[str]:
+        """Rebuild and store the user's profile; None if there is no user."""
+        try:
+            connection = self._connection_pool.get_connection()
+            with connection:
+                cursor = connection.cursor()
+                with cursor:
+                    try:
+                        document = self._write_profile(
+                            cursor, self._lock_profile(cursor, user_id)
+                        )
+                        connection.commit()
+                    except Exception:
+                        connection.rollback()
+                        raise
+                    self._note_write(user_id)
+                    return document
+
+        except Exception as e:
+            self._logger.log_error(
+                f"{inspect.currentframe().f_code.co_name}: {e}"
+            )
+            raise
+
+    @resilient
+    def select_profile_rebuild_ids(self, after_id: int, limit: int) -> List[int]:
+        """Return ids of users whose profile is missing or stale."""
+        try:
+            connection = self._connection_pool.get_connection()
+            with connection:
+                cursor = connection.cursor()
+                with cursor:
+                    cursor.execute(self.SELECT_PROFILE_REBUILD_IDS,
+                                   (after_id, limit))
+                    return [row[0] for row in cursor.fetchall()]
+
+        except Exception as e:
+            self._logger.log_error(
+                f"{inspect.currentframe().f_code.co_name}: {e}"
+            )
+            raise
+
+    def _lock_profile(self, cursor, user_id: int) -> Optional[tuple]:
+        # Taken before any other statement so the transaction's snapshot
+        # includes every profile change committed before the lock.
+        cursor.execute(self.SELECT_USER_FOR_UPDATE, (user_id,))
+        return cursor.fetchone()
+
+    def _write_profile(self, cursor, user_row: Optional[tuple]) -> Optional[str]:
+        """Build the profile document for user_row and upsert it."""
+        if user_row is None:
+            return None
+        user = self._populate_user_objects([user_row])[0]
+        workouts: dict = {}
+
+        def workout(row: tuple) -> Workout:
+            w = workouts.get(row[0])
+            if w is None:
+                w = Workout()
+                w.id, w.title, w.description = row[0], row[1], row[2]
+                workouts[w.id] = w
+            return w
+
+        cursor.execute(self.SELECT_USER_COMPLETED, (user.id,))
+        user.completed_workouts = [
+            Completion(user.id, workout(row), str(row[3]))
+            for row in cursor.fetchall()
+        ]
+        cursor.execute(self.SELECT_USER_FAVORITES, (user.id,))
+        user.favorite_workouts = [workout(row) for row in cursor.fetchall()]
+
+        if workouts:
+            cursor.execute(
+                self.SELECT_EXERCISES_FOR_WORKOUTS.format(
+                    ids=", ".join(["%s"] * len(workouts))
+                ),
+                tuple(workouts),
+            )
+            for row in cursor.fetchall():
+                ex = Exercise()
+                ex.id, ex.name, ex.instructions = row[1], row[2], row[3]
+                workouts[row[0]].exercises.append(ex)
+
+        document = user.to_json()
+        cursor.execute(self.UPSERT_PROFILE, (user.id, document))
+        return document
+
+    @resilient
+    def select_changes_since(self, version: int, limit: int) -> List[tuple]:
+        """Return (version, entity, key1, key2) change rows after version."""
+        try:
+            connection = self._connection_pool.get_connection()
+            with connection:
+                cursor = connection.cursor()
+                with cursor:
+                    cursor.execute(self.SELECT_CHANGES_SINCE, (version, limit))
+                    return cursor.fetchall()
+
+        except Exception as e:
+            self._logger.log_error(
+                f"{inspect.currentframe().f_code.co_name}: {e}"
+            )
+            raise
+
+    def select_users_by_ids(self, user_ids: List[int]) -> List[User]:
+        return self._populate_user_objects(
+            self._select_for_ids(self.SELECT_USERS_BY_IDS, user_ids)
+        )
+
+    def select_workouts_by_ids(self, workout_ids: List[int]) -> List[Workout]:
+        return self._populate_workout_objects(
+            self._select_for_ids(self.SELECT_WORKOUTS_BY_IDS, workout_ids)
+        )
+
+    def select_exercises_by_ids(self, exercise_ids: List[int]) -> List[Exercise]:
+        exercises: List[Exercise] = []
+        for row in self._select_for_ids(self.SELECT_EXERCISES_BY_IDS,
+                                        exercise_ids):
+            ex = Exercise()
+            ex.id = row[0]
+            ex.name = row[1]
+            ex.instructions = row[2]
+            exercises.append(ex)
+        return exercises
+
+    def select_completions_by_ids(self, completion_ids: List[int]) -> List[tuple]:
+        """Return raw (id, user_id, workout_id, date_completed) rows."""
+        return self._select_for_ids(self.SELECT_COMPLETIONS_BY_IDS,
+                                    completion_ids)
+
+    @resilient
+    def select_catalog_version(self) -> Optional[tuple]:
+        """Return (workouts, max workout id, exercises, max exercise id, links)."""
+        try:
+            connection = self._get_read_connection()
+            with connection:
+                cursor = connection.cursor()
+                with cursor:
+                    cursor.execute(self.SELECT_CATALOG_VERSION)
+                    row = cursor.fetchone()
+            return tuple(int(v) for v in row)
+
         except Exception as e:
             self._logger.log_error(
                 f"{inspect.currentframe().f_code.co_name}: {e}"
             )
-            return False
+            raise
+
+    @resilient
+    def select_data_version(self) -> tuple:
+        """Return a tuple that changes whenever the stored data does."""
+        try:
+            connection = self._get_read_connection()
+            with connection:
+                cursor = connection.cursor()
+                with cursor:
+                    cursor.execute(self.SELECT_DATA_VERSION)
+                    row = cursor.fetchone()
+            return tuple(int(v) for v in row)
+
+        except Exception as e:
+            self._logger.log_error(
+                f"{inspect.currentframe().f_code.co_name}: {e}"
+            )
+            raise
+
+    def server_today(self) -> date:
+        """Return the date CURDATE() gives on the server, usually cached.
+
+        The server's UTC offset is re-read every SERVER_CLOCK_TTL_SECONDS
+        (time zone changes); if it can't be read, the last known offset or
+        else the local date is used.
+        """
+        cached = self._server_utc_offset
+        if cached is None or time.monotonic() - cached[1] > self.SERVER_CLOCK_TTL_SECONDS:
+            try:
+                cached = (self.select_server_utc_offset(), time.monotonic())
+                self._server_utc_offset = cached
+            except PersistenceError:
+                if cached is None:
+                    return date.today()
+        return datetime.fromtimestamp(time.time() + cached[0], timezone.utc).date()
+
+    @resilient
+    def select_server_utc_offset(self) -> int:
+        """Return the server session's offset from UTC in seconds."""
+        try:
+            connection = self._connection_pool.get_connection()
+            with connection:
+                cursor = connection.cursor()
+                with cursor:
+                    cursor.execute(self.SELECT_SERVER_UTC_OFFSET)
+                    return int(cursor.fetchone()[0])
+
+        except Exception as e:
+            self._logger.log_error(
+                f"{inspect.currentframe().f_code.co_name}: {e}"
+            )
+            raise
+
+
+# QUERY PLANS
+
+    def sql_statements(self) -> dict:
+        """Return the SQL statement constants defined above, by name."""
+        return {
+            name: value for name, value in vars(self).items()
+            if name.isupper() and isinstance(value, str)
+        }
+
+    @resilient
+    def explain(self, query: str, params: tuple = ()) -> dict:
+        """Return the primary's EXPLAIN FORMAT=JSON plan for query.
+
+        EXPLAIN does not execute the statement, so writes are safe to pass.
+        """
+        try:
+            connection = self._connection_pool.get_connection()
+            with connection:
+                cursor = connection.cursor()
+                with cursor:
+                    cursor.execute("EXPLAIN FORMAT=JSON " + query, params)
+                    return json.loads(cursor.fetchone()[0])
+
+        except Exception as e:
+            self._logger.log_error(
+                f"{inspect.currentframe().f_code.co_name}: {e}"
+            )
+            raise
+
+
+# STREAMING (EXPORT) METHODS
+
+    def stream_users_page(self, after_user_id: int, limit: int) -> Iterator[tuple]:
+        """Yield up to limit raw user rows with id > after_user_id."""
+        return self._stream_rows(self.SELECT_USERS_PAGE, (after_user_id, limit))
+
+    def stream_workouts_page(self, after_workout_id: int,
+                             limit: int) -> Iterator[tuple]:
+        """Yield up to limit raw workout rows with id > after_workout_id."""
+        return self._stream_rows(
+            self.SELECT_WORKOUTS_PAGE, (after_workout_id, limit)
+        )
+
+    def stream_user_history(self, user_id: int, since: str,
+                            limit: int) -> Iterator[tuple]:
+        """Yield a user's completion rows dated on or after since."""
+        return self._stream_rows(
+            self.SELECT_USER_HISTORY, (user_id, since, limit)
+        )
+
+    def stream_completions_for_user_range(
+        self, after_user_id: int, last_user_id: int
+    ) -> Iterator[tuple]:
+        """Yield raw completion rows for after_user_id < user_id <= last_user_id."""
+        return self._stream_rows(
+            self.SELECT_COMPLETIONS_FOR_USER_RANGE, (after_user_id, last_user_id)
+        )
+
+    def stream_favorites_for_user_range(
+        self, after_user_id: int, last_user_id: int
+    ) -> Iterator[tuple]:
+        """Yield raw favorite rows for after_user_id < user_id <= last_user_id."""
+        return self._stream_rows(
+            self.SELECT_FAVORITES_FOR_USER_RANGE, (after_user_id, last_user_id)
+        )
+
+    def stream_completion_changes_with_users(
+        self, after_version: int
+    ) -> Iterator[tuple]:
+        """Yield completion rows joined with user birthday/gender, each led
+        by its change-log version, for versions after after_version."""
+        return self._stream_rows(
+            self.SELECT_COMPLETION_CHANGES_WITH_USERS, (after_version,)
+        )
+
+    def stream_catalog(self, table: str) -> Iterator[tuple]:
+        """Yield raw rows of a catalog table: workouts, exercises or workout_exercises."""
+        queries = {
+            "workouts": self.SELECT_ALL_WORKOUTS + " ORDER BY id",
+            "exercises": self.SELECT_ALL_EXERCISES + " ORDER BY id",
+            "workout_exercises": self.SELECT_ALL_WORKOUT_EXERCISES,
+        }
+        return self._stream_rows(queries[table], ())
+
+    def _stream_rows(self, query: str, params: tuple,
+                     chunk_size: int = 1000) -> Iterator[tuple]:
+        """Yield rows from an unbuffered cursor, chunk_size rows at a time.
+
+        The unbuffered cursor reads rows off the socket as they are fetched,
+        so memory stays bounded by chunk_size regardless of result size.
+        Unlike the select_* methods, errors propagate to the caller so a
+        partial stream is never mistaken for a complete one.
+        """
+        # Streams are never retried: rows may already have been consumed.
+        self._resilience.guard()
+        try:
+            connection = self._get_read_connection()
+        except Exception as e:
+            error = classify_error(e)
+            self._resilience.record(error)
+            raise error from e
+        cursor = None
+        try:
+            cursor = connection.cursor(buffered=False)
+            cursor.execute(query, params)
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                yield from rows
+            self._resilience.record()
+        except Exception as e:
+            error = classify_error(e)
+            self._resilience.record(error)
+            raise error from e
+        finally:
+            try:
+                if cursor is not None:
+                    cursor.close()
+            except Exception as e:
+                # Abandoned streams leave unread rows on the connection.
+                self._logger.log_debug(
+                    f"{inspect.currentframe().f_code.co_name}: {e}"
+                )
+            connection.close()
+
+
+# READ/WRITE ROUTING
+
+    def primary_reads(self):
+        """Context manager pinning this thread's reads to the primary."""
+        return _PrimaryReads(self._session)
+
+    def get_resilience_stats(self) -> dict:
+        """Return circuit breaker state and retry counters."""
+        return self._resilience.stats()
+
+    def get_replica_stats(self) -> List[dict]:
+        """Return in-flight and served read counts for each replica."""
+        return [
+            {"replica": r.name, "in_flight": r.in_flight, "served": r.served,
+             "failures": r.failures}
+            for r in self._replica_pools
+        ]
+
+    def get_pool_stats(self) -> List[dict]:
+        """Return whether each pool has connected and how long it took."""
+        return [
+            {"pool": p.name, "ready": p.is_ready(),
+             "ready_seconds": p.ready_seconds}
+            for p in [self._connection_pool]
+            + [r.pool for r in self._replica_pools]
+        ]
+
+    def _note_write(self, user_id: Optional[int] = None) -> None:
+        now = time.monotonic()
+        self._session.last_write = now
+        if user_id is not None:
+            with self._user_write_times_lock:
+                self._user_write_times[user_id] = now
+                if len(self._user_write_times) > 10000:
+                    cutoff = now - self._read_your_writes_seconds
+                    self._user_write_times = {
+                        u: t for u, t in self._user_write_times.items()
+                        if t >= cutoff
+                    }
+
+    def _must_read_primary(self, user_id: Optional[int]) -> bool:
+        if getattr(self._session, "pinned", 0):
+            return True
+        cutoff = time.monotonic() - self._read_your_writes_seconds
+        if getattr(self._session, "last_write", float("-inf")) >= cutoff:
+            return True
+        if user_id is not None:
+            with self._user_write_times_lock:
+                return self._user_write_times.get(user_id, float("-inf")) >= cutoff
+        return False
+
+    def _get_read_connection(self, user_id: Optional[int] = None):
+        """Check out a connection for a read, preferring a replica."""
+        if not self._replica_pools or self._must_read_primary(user_id):
+            return self._connection_pool.get_connection()
+
+        if self._read_balancing == "least_busy":
+            replica = min(self._replica_pools, key=lambda r: r.in_flight)
+        else:
+            with self._replica_cycle_lock:
+                replica = self._replica_pools[next(self._replica_cycle)]
+
+        try:
+            return replica.get_connection()
+        except Exception as e:
+            replica.failures += 1
+            self._logger.log_warning(
+                f"Replica {replica.name} unavailable, reading from primary: {e}"
+            )
+            return self._connection_pool.get_connection()
+
+
+    def _initialize_database_connection_pool(self, config: dict,
+                                             pool_name: str = None):
+        pool_name = pool_name or self.DATABASE["pool"]["name"]
+        return _WarmingPool(
+            pool_name,
+            lambda: self._create_database_connection_pool(config, pool_name),
+            background=self._background_warm_up,
+        )
+
+    def _create_database_connection_pool(self, config: dict, pool_name: str):
+        # The driver is imported here, off the startup path when warming
+        # up in the background.
+        from mysql import connector
+        from mysql.connector.pooling import MySQLConnectionPool
 
-   
-    def _initialize_database_connection_pool(self, config: dict):
         try:
             self._logger.log_debug("Creating connection pool...")
             cnx_pool = MySQLConnectionPool(
-                pool_name=self.DATABASE["pool"]["name"],
+                pool_name=pool_name,
                 pool_size=self.DATABASE["pool"]["size"],
                 pool_reset_session=self.DATABASE["pool"]["reset_session"],
                 **config,
@@ -484,3 +2240,123 @@ class MySQLPersistenceWrapper(ApplicationBase):
 
         
 
+
+
+
+class _WarmingPool:
+    """Connection pool created on a background thread.
+
+    get_connection() blocks until the pool exists, so only a call made
+    before the warm-up finished waits for it. If creating the pool failed,
+    the next call after RETRY_SECONDS tries again on the caller's thread;
+    calls in between fail at once with DatabaseUnavailableError.
+    """
+
+    RETRY_SECONDS = 5
+
+    def __init__(self, name: str, create: Callable[[], Optional[object]],
+                 background: bool = True) -> None:
+        self.name = name
+        self._create = create
+        self._pool = None
+        self._failed_at = None
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+        self.ready_seconds: Optional[float] = None
+        if background:
+            threading.Thread(
+                target=self._warm_up, name=f"pool-warm-up-{name}", daemon=True
+            ).start()
+        else:
+            self._warm_up()
+
+    def get_connection(self):
+        self._ready.wait()
+        pool = self._pool
+        if pool is None:
+            with self._lock:
+                if self._pool is None and (
+                    time.monotonic() - self._failed_at >= self.RETRY_SECONDS
+                ):
+                    self._pool = self._create()
+                    self._failed_at = time.monotonic()
+                pool = self._pool
+            if pool is None:
+                raise DatabaseUnavailableError(
+                    f"Connection pool {self.name} could not be created",
+                    retry_safe=True,
+                )
+        return pool.get_connection()
+
+    def is_ready(self) -> bool:
+        return self._ready.is_set()
+
+    def _warm_up(self) -> None:
+        started = time.perf_counter()
+        try:
+            self._pool = self._create()
+        finally:
+            self._failed_at = time.monotonic()
+            self.ready_seconds = time.perf_counter() - started
+            self._ready.set()
+
+
+class _ReplicaPool:
+    """A replica connection pool with in-flight tracking for balancing."""
+
+    def __init__(self, name: str, pool: _WarmingPool) -> None:
+        self.name = name
+        self.pool = pool
+        self.in_flight = 0
+        self.served = 0
+        self.failures = 0
+        self._lock = threading.Lock()
+
+    def get_connection(self):
+        connection = self.pool.get_connection()
+        with self._lock:
+            self.in_flight += 1
+            self.served += 1
+        return _TrackedConnection(connection, self)
+
+    def release(self) -> None:
+        with self._lock:
+            self.in_flight -= 1
+
+
+class _TrackedConnection:
+    """Proxy for a pooled connection that reports its return to the pool."""
+
+    def __init__(self, connection, replica: _ReplicaPool) -> None:
+        self._connection = connection
+        self._replica = replica
+        self._released = False
+
+    def __getattr__(self, name):
+        return getattr(self._connection, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+    def close(self) -> None:
+        if not self._released:
+            self._released = True
+            self._replica.release()
+        self._connection.close()
+
+
+class _PrimaryReads:
+    """Context manager that routes the current thread's reads to the primary."""
+
+    def __init__(self, session: threading.local) -> None:
+        self._session = session
+
+    def __enter__(self):
+        self._session.pinned = getattr(self._session, "pinned", 0) + 1
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self._session.pinned -= 1
@@ -0,0 +1,95 @@
+"""Defines the ProfileRebuilder class."""
+
+import inspect
+import threading
+
+from fitness_app_users_and_workouts.application_base import ApplicationBase
+from fitness_app_users_and_workouts.persistence_layer.resilience import (
+    PersistenceError,
+)
+
+
+class ProfileRebuilder(ApplicationBase):
+    """Rebuilds missing and stale user profile documents in the background.
+
+    Single-row writes rebuild the affected profile in their own
+    transaction; this job covers the rest: users created before profiles
+    existed, and profiles marked stale by batched completion flushes or
+    by exercises linked to a workout. Users are walked in id order in
+    batches, so a backfill can be interrupted and resumed at any time.
+    """
+
+    def __init__(self, config: dict, db) -> None:
+        """Initializes profile rebuilder."""
+        self._config_dict = config
+        self.META = config["meta"]
+        self.PROFILES = config.get("profiles", {})
+        self.DB = db
+
+        super().__init__(
+            subclass_name=self.__class__.__name__,
+            logfile_prefix_name=self.META["log_prefix"],
+        )
+
+        self.batch_size = self.PROFILES.get("rebuild_batch_size", 500)
+        self.interval = self.PROFILES.get("rebuild_interval_seconds", 30)
+        self._wakeup = threading.Event()
+        self._stopping = False
+        self._thread = None
+
+
+# LIFECYCLE
+
+    def start(self) -> None:
+        """Start the background rebuild thread."""
+        self._thread = threading.Thread(
+            target=self._run, name="profile-rebuilder", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the rebuild thread after its current batch."""
+        if self._stopping:
+            return
+        self._stopping = True
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join()
+
+
+# PUBLIC METHODS
+
+    def rebuild_pending(self) -> int:
+        """Rebuild every missing or stale profile. Returns the count."""
+        rebuilt = 0
+        after_id = 0
+        while not self._stopping:
+            user_ids = self.DB.select_profile_rebuild_ids(after_id,
+                                                          self.batch_size)
+            if not user_ids:
+                break
+            for user_id in user_ids:
+                if self.DB.rebuild_user_profile(user_id) is not None:
+                    rebuilt += 1
+            after_id = user_ids[-1]
+
+        if rebuilt:
+            self._logger.log_info(f"Rebuilt {rebuilt} user profile(s).")
+        return rebuilt
+
+
+# PRIVATE METHODS
+
+    def _run(self) -> None:
+        while not self._stopping:
+            try:
+                self.rebuild_pending()
+            except PersistenceError as e:
+                self._logger.log_warning(
+                    f"{inspect.currentframe().f_code.co_name}: {e}"
+                )
+            except Exception as e:
+                self._logger.log_error(
+                    f"{inspect.currentframe().f_code.co_name}: {e}"
+                )
+            self._wakeup.wait(self.interval)
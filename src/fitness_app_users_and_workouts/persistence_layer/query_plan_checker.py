@@ -0,0 +1,318 @@
+"""Defines the QueryPlanChecker class."""
+
+import difflib
+import inspect
+import json
+import os
+import re
+
+from fitness_app_users_and_workouts.application_base import ApplicationBase
+from fitness_app_users_and_workouts.persistence_layer.resilience import QueryError
+
+
+class QueryPlanChecker(ApplicationBase):
+    """EXPLAIN-based regression check of the wrapper's SQL statements.
+
+    Every statement constant of MySQLPersistenceWrapper is explained with
+    sample parameters against a seeded database (see
+    database/initialize_plan_check.sh). A plan fails when it scans one of
+    LARGE_TABLES in full, or sorts or builds a temporary table over one,
+    unless the statement is listed in EXPECTED with the reason.
+
+    Each plan is also reduced to its shape (tables, access types, keys,
+    sort and temporary-table steps, no costs or row estimates) and compared
+    with a JSON snapshot, so index and query changes show up as diffs in
+    review.
+    """
+
+    LARGE_TABLES = {
+        "users", "user_completed_workouts", "user_favorite_workouts",
+        "change_log", "user_profiles",
+    }
+
+    # Statements that read a large table in full by design, and why.
+    EXPECTED = {
+        "SELECT_ALL_USERS": "get_all_users returns every user",
+        "SELECT_USERS_PAGE_FILTERED": "substring name search (LIKE '%...%')",
+        "COUNT_USERS_FILTERED": "substring name search (LIKE '%...%')",
+        "SELECT_COMPLETED_TITLES_FOR_USERS_CAPPED":
+            "window and sort over the listed users' completions only",
+        "SELECT_FAVORITE_TITLES_FOR_USERS_CAPPED":
+            "window and sort over the listed users' favorites only",
+        "SELECT_WORKOUTS_USERS": "UNION dedupes the listed workouts' users",
+    }
+
+    # Sample values for each statement's %s placeholders, in order; any
+    # statement not listed gets 1 for each. Values are chosen to match rows
+    # of the seeded database.
+    PARAMS = {
+        "SELECT_USERS_PAGE_FILTERED": (0, "%First1%", 10, 0),
+        "COUNT_USERS_FILTERED": ("%First1%",),
+        "SELECT_WORKOUTS_PAGE_FILTERED": (0, "%Workout%", 10, 0),
+        "SELECT_COMPLETED_TITLES_FOR_USERS_CAPPED": (5,),
+        "SELECT_FAVORITE_TITLES_FOR_USERS_CAPPED": (5,),
+        "COUNT_WORKOUTS_FILTERED": ("%Workout%",),
+        "SELECT_USERS_PAGE": (100, 10),
+        "SELECT_WORKOUTS_PAGE": (10, 10),
+        "SELECT_USER_HISTORY": (100, "2024-01-01", 50),
+        "SELECT_COMPLETIONS_FOR_USER_RANGE": (100, 600),
+        "SELECT_FAVORITES_FOR_USER_RANGE": (100, 600),
+        "SELECT_COMPLETION_CHANGES_WITH_USERS": (100000,),
+        "INSERT_CHANGE": ("favorite", 1, 1),
+        "INSERT_COMPLETION_CHANGES": (1000, 1010),
+        "SELECT_CHANGES_SINCE": (100000, 1000),
+        "DELETE_FAVORITE_CHANGES": ("unfavorite", 1),
+        "UPSERT_PROFILE": (1, '{"id": 1}'),
+        "SELECT_PROFILE_REBUILD_IDS": (100, 500),
+        "INSERT_USER": (None, "Plan", "", "Check", "2000-01-01", "M"),
+        "INSERT_USER_ROWS": (None, "Plan", "", "Check", "2000-01-01", "M"),
+        "INSERT_WORKOUT": (None, "Plan check", "Plan check workout"),
+        "INSERT_WORKOUT_ROWS": (None, "Plan check", "Plan check workout"),
+        "INSERT_IGNORE_WORKOUT_ROWS": (1, "Plan check", "Plan check workout"),
+        "INSERT_EXERCISE": (None, "Plan Check", "plan check", "Plan check."),
+        "INSERT_IGNORE_EXERCISE_ROWS": (
+            None, "Plan Check", "plan check", "Plan check."
+        ),
+        "INSERT_COMPLETION_ROWS": (100, 1, "2024-01-01", "plan-check-3"),
+        "INSERT_CHANGE_ROWS": ("favorite", 1, 1),
+        "REPLACE_CHANGE_ROWS": ("unfavorite", 1, 1),
+        "RELINK_EXERCISE": (1, 2),
+        "UPDATE_EXERCISE_NAME_KEY": ("plan check", 1),
+    }
+
+    # Values for {pairs} lists; others get (user_id, key) completion pairs.
+    PAIRS = ((100, "plan-check-1"), (100, "plan-check-2"))
+    PAIR_LISTS = {
+        "DELETE_UNFAVORITE_CHANGES": ((100, 1), (100, 2)),
+    }
+
+    # Values for {ids} lists; others get (1, 2, 3).
+    ID_LISTS = {
+        "SELECT_EXERCISE_IDS_BY_NAME_KEY": (
+            "plan check exercise 1", "plan check exercise 2",
+            "plan check exercise 3",
+        ),
+    }
+
+    # Plan nodes shown in the snapshot as steps of their own.
+    OPERATIONS = {
+        "ordering_operation", "grouping_operation", "duplicates_removal",
+        "union_result", "materialized_from_subquery", "attached_subqueries",
+        "optimized_away_subqueries", "buffer_result", "windowing",
+    }
+
+    SQL_VERBS = ("SELECT", "INSERT", "UPDATE", "DELETE", "REPLACE")
+
+    NOT_ALIASES = {
+        "WHERE", "ON", "JOIN", "LEFT", "RIGHT", "INNER", "CROSS", "ORDER",
+        "GROUP", "LIMIT", "SET", "VALUES", "SELECT", "UNION", "USING", "FOR",
+    }
+
+    def __init__(self, config: dict, db) -> None:
+        """Initializes query plan checker."""
+        self._config_dict = config
+        self.META = config["meta"]
+        self.DB = db
+
+        super().__init__(
+            subclass_name=self.__class__.__name__,
+            logfile_prefix_name=self.META["log_prefix"],
+        )
+
+
+# PUBLIC METHODS
+
+    def check(self, snapshot_path: str, update: bool = False) -> dict:
+        """Explain every statement, flag bad plans and diff the snapshot.
+
+        Returns {"statements", "problems", "waived", "diff", "created"}:
+        problems and waived map statement names to messages, diff holds
+        unified diff lines against the snapshot. With update, the snapshot
+        is rewritten. A missing snapshot is captured from the current
+        plans, with created set and no diff.
+        """
+        shapes: dict = {}
+        problems: dict = {}
+        waived: dict = {}
+        statements = self.statements()
+        for name, template in sorted(statements.items()):
+            query, params = self.sample(name, template)
+            try:
+                plan = self.DB.explain(query, params)
+            except QueryError as e:
+                problems[name] = [f"EXPLAIN failed: {e}"]
+                continue
+            aliases = self._aliases(query)
+            shapes[name] = self._shape(plan, aliases)
+            found = self._problems(plan, aliases)
+            if found and name in self.EXPECTED:
+                waived[name] = [f"{p} ({self.EXPECTED[name]})" for p in found]
+            elif found:
+                problems[name] = found
+
+        new_text = json.dumps(shapes, indent=2, sort_keys=True) + "\n"
+        created = not os.path.exists(snapshot_path)
+        diff: list = []
+        if created:
+            with open(snapshot_path, "w", encoding="utf-8") as f:
+                f.write(new_text)
+            self._logger.log_info(f"Created query plan snapshot {snapshot_path}.")
+        else:
+            with open(snapshot_path, "r", encoding="utf-8") as f:
+                old_text = f.read()
+            diff = list(difflib.unified_diff(
+                old_text.splitlines(), new_text.splitlines(),
+                fromfile=f"{snapshot_path} (snapshot)",
+                tofile=f"{snapshot_path} (current)", lineterm="",
+            ))
+        if update and diff:
+            with open(snapshot_path, "w", encoding="utf-8") as f:
+                f.write(new_text)
+            self._logger.log_info(f"Updated query plan snapshot {snapshot_path}.")
+
+        for name, messages in problems.items():
+            for message in messages:
+                self._logger.log_warning(
+                    f"{inspect.currentframe().f_code.co_name}: {name}: {message}"
+                )
+        return {
+            "statements": len(statements),
+            "problems": problems,
+            "waived": waived,
+            "diff": diff,
+            "created": created,
+        }
+
+    def statements(self) -> dict:
+        """Return the wrapper's SQL statement constants by name."""
+        return {
+            name: sql for name, sql in self.DB.sql_statements().items()
+            if sql.lstrip().upper().startswith(self.SQL_VERBS)
+        }
+
+    def sample(self, name: str, template: str) -> tuple:
+        """Return (query, params) for template with sample values filled in.
+
+        A {rows} list gets one row, with a %s per column inserted.
+        """
+        template = re.sub(
+            r"\(([^()]*)\)(\s*VALUES\s*)\{rows\}",
+            lambda m: f"({m.group(1)}){m.group(2)}("
+                      + ", ".join(["%s"] * len(m.group(1).split(","))) + ")",
+            template,
+        )
+        scalars = iter(self.PARAMS.get(name, ()))
+        ids = self.ID_LISTS.get(name, (1, 2, 3))
+        pairs = self.PAIR_LISTS.get(name, self.PAIRS)
+        params: list = []
+        for token in re.findall(r"%s|\{ids\}|\{pairs\}", template):
+            if token == "%s":
+                params.append(next(scalars, 1))
+            elif token == "{ids}":
+                params.extend(ids)
+            else:
+                params.extend(value for pair in pairs for value in pair)
+        query = template.replace("{ids}", ", ".join(["%s"] * len(ids))).replace(
+            "{pairs}", ", ".join(["(%s, %s)"] * len(pairs))
+        )
+        return query, tuple(params)
+
+
+# PRIVATE METHODS
+
+    def _aliases(self, query: str) -> dict:
+        # EXPLAIN names tables by alias; map aliases back to tables.
+        aliases = {}
+        for table, alias in re.findall(
+            r"\b(?:FROM|JOIN|UPDATE|INTO)\s+(\w+)(?:\s+(?:AS\s+)?(\w+))?",
+            query, flags=re.IGNORECASE,
+        ):
+            aliases[table] = table
+            if alias and alias.upper() not in self.NOT_ALIASES:
+                aliases[alias] = table
+        return aliases
+
+    def _shape(self, node, aliases: dict, depth: int = 0,
+               lines: list = None) -> list:
+        """Flatten a plan to one line per table access or operation."""
+        lines = [] if lines is None else lines
+        if isinstance(node, list):
+            for item in node:
+                self._shape(item, aliases, depth, lines)
+            return lines
+        if not isinstance(node, dict):
+            return lines
+
+        if "table_name" in node and (node.get("insert") or node.get("replace")):
+            # The target of an INSERT or REPLACE; it is written, not read.
+            table = aliases.get(node["table_name"], node["table_name"])
+            verb = "replace" if node.get("replace") else "insert"
+            lines.append("  " * depth + f"{verb} into {table}")
+        elif "table_name" in node:
+            table = aliases.get(node["table_name"], node["table_name"])
+            parts = [f"table {table}", node.get("access_type", "-")]
+            if node.get("key"):
+                parts.append(f"key={node['key']}")
+            if node.get("used_key_parts"):
+                parts.append("(" + ", ".join(node["used_key_parts"]) + ")")
+            if node.get("using_index"):
+                parts.append("covering")
+            parts += self._flags(node)
+            lines.append("  " * depth + " ".join(parts))
+        elif "message" in node:
+            lines.append("  " * depth + node["message"])
+
+        for key, value in node.items():
+            if key == "cost_info" or not isinstance(value, (dict, list)):
+                continue
+            if key in self.OPERATIONS:
+                flags = self._flags(value) if isinstance(value, dict) else []
+                lines.append("  " * depth + " ".join([key] + flags))
+                self._shape(value, aliases, depth + 1, lines)
+            else:
+                self._shape(value, aliases, depth, lines)
+        return lines
+
+    def _flags(self, node: dict) -> list:
+        flags = []
+        if node.get("using_filesort"):
+            flags.append("filesort")
+        if node.get("using_temporary_table"):
+            flags.append("temporary")
+        return flags
+
+    def _problems(self, plan: dict, aliases: dict) -> list:
+        problems: list = []
+        self._walk_problems(plan, aliases, problems)
+        return list(dict.fromkeys(problems))
+
+    def _walk_problems(self, node, aliases: dict, problems: list) -> set:
+        """Collect problems under node; returns the large tables read there."""
+        large: set = set()
+        if isinstance(node, list):
+            for item in node:
+                large |= self._walk_problems(item, aliases, problems)
+            return large
+        if not isinstance(node, dict):
+            return large
+
+        if "table_name" in node and not (node.get("insert")
+                                         or node.get("replace")):
+            table = aliases.get(node["table_name"], node["table_name"])
+            if table in self.LARGE_TABLES:
+                large.add(table)
+                if node.get("access_type") == "ALL":
+                    problems.append(f"full table scan of {table}")
+                elif node.get("access_type") == "index":
+                    problems.append(f"full index scan of {table}")
+        for value in node.values():
+            if isinstance(value, (dict, list)):
+                large |= self._walk_problems(value, aliases, problems)
+
+        for flag in self._flags(node):
+            for table in sorted(large):
+                problems.append(
+                    f"{'filesort' if flag == 'filesort' else 'temporary table'}"
+                    f" over {table}"
+                )
+        return large
@@ -0,0 +1,290 @@
+"""Defines persistence errors, the CircuitBreaker and the Resilience policy."""
+
+import functools
+import random
+import threading
+import time
+
+
+# MySQL error numbers that mean the server could not be reached at all,
+# so the statement was never sent.
+CONNECT_ERRNOS = {
+    1040,  # ER_CON_COUNT_ERROR: too many connections
+    2002,  # CR_CONNECTION_ERROR: local socket
+    2003,  # CR_CONN_HOST_ERROR: can't connect to host
+    2005,  # CR_UNKNOWN_HOST
+}
+
+# The server rolled the transaction back, so the statement had no effect.
+ROLLED_BACK_ERRNOS = {
+    1205,  # ER_LOCK_WAIT_TIMEOUT
+    1213,  # ER_LOCK_DEADLOCK
+}
+
+# The connection dropped mid-statement; a write may or may not have landed.
+LOST_ERRNOS = {
+    2006,  # CR_SERVER_GONE_ERROR
+    2013,  # CR_SERVER_LOST
+    2055,  # CR_SERVER_LOST_EXTENDED
+}
+
+# The only warning INSERT IGNORE is used to swallow.
+DUPLICATE_KEY_ERRNO = 1062  # ER_DUP_ENTRY
+
+
+class PersistenceError(Exception):
+    """A persistence call failed; distinct from a call that found no rows."""
+
+
+class QueryError(PersistenceError):
+    """The database answered but rejected the statement. Not retried."""
+
+
+class UnsupportedOperationError(PersistenceError):
+    """The configured persistence layer can't serve this call at all."""
+
+
+class DatabaseUnavailableError(PersistenceError):
+    """The database could not be reached or did not finish the call.
+
+    retry_safe is True when the statement is known not to have taken
+    effect, so even a non-idempotent write may be repeated.
+    """
+
+    def __init__(self, message: str, retry_safe: bool = False) -> None:
+        super().__init__(message)
+        self.retry_safe = retry_safe
+
+
+class CircuitOpenError(DatabaseUnavailableError):
+    """Raised without touching MySQL while the circuit breaker is open."""
+
+    def __init__(self, message: str, retry_after: float) -> None:
+        super().__init__(message, retry_safe=True)
+        self.retry_after = retry_after
+
+
+def classify_error(error: Exception) -> PersistenceError:
+    """Map a driver exception to a typed PersistenceError."""
+    if isinstance(error, PersistenceError):
+        return error
+    # Imported here so importing this module doesn't load the driver.
+    from mysql import connector
+    from mysql.connector import errors as mysql_errors
+
+    if isinstance(error, mysql_errors.PoolError):
+        # Pool exhausted: nothing was sent.
+        return DatabaseUnavailableError(str(error), retry_safe=True)
+    if isinstance(error, connector.Error):
+        errno = getattr(error, "errno", None)
+        if errno in CONNECT_ERRNOS or errno in ROLLED_BACK_ERRNOS:
+            return DatabaseUnavailableError(str(error), retry_safe=True)
+        if errno in LOST_ERRNOS or isinstance(
+            error, (mysql_errors.InterfaceError, mysql_errors.OperationalError)
+        ):
+            return DatabaseUnavailableError(str(error), retry_safe=False)
+        return QueryError(str(error))
+    if isinstance(error, (ConnectionError, TimeoutError)):
+        return DatabaseUnavailableError(str(error), retry_safe=False)
+    return QueryError(f"{type(error).__name__}: {error}")
+
+
+def raise_ignored_errors(cursor) -> None:
+    """Raise QueryError if the last INSERT IGNORE skipped a row for a reason
+    other than a duplicate key.
+
+    IGNORE also downgrades foreign key violations and data conversion
+    errors to warnings, which would otherwise drop rows silently.
+    """
+    if not getattr(cursor, "warning_count", 1):
+        return
+    cursor.execute("SHOW WARNINGS")
+    for _, code, message in cursor.fetchall():
+        if code != DUPLICATE_KEY_ERRNO:
+            raise QueryError(f"{code}: {message}")
+
+
+class CircuitBreaker:
+    """Closed / open / half-open breaker over consecutive failures.
+
+    After failure_threshold consecutive unavailable errors the circuit opens
+    and calls fail at once for reset_timeout seconds. Then up to
+    half_open_max_calls probe calls are let through: one success closes the
+    circuit, one failure opens it again.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 5,
+                 reset_timeout: float = 10.0,
+                 half_open_max_calls: int = 1) -> None:
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_max_calls = half_open_max_calls
+
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probes = 0
+        self._lock = threading.Lock()
+
+        self._rejected = 0
+        self._times_opened = 0
+
+    def before_call(self) -> None:
+        """Raise CircuitOpenError if the call must not reach MySQL."""
+        with self._lock:
+            if self._state == self.OPEN:
+                remaining = self._opened_at + self.reset_timeout - time.monotonic()
+                if remaining > 0:
+                    self._rejected += 1
+                    raise CircuitOpenError(
+                        f"Database circuit open; retry in {remaining:.1f}s",
+                        retry_after=remaining,
+                    )
+                self._state = self.HALF_OPEN
+                self._probes = 0
+            if self._state == self.HALF_OPEN:
+                if self._probes >= self.half_open_max_calls:
+                    self._rejected += 1
+                    raise CircuitOpenError(
+                        "Database circuit half-open; probe in progress",
+                        retry_after=self.reset_timeout,
+                    )
+                self._probes += 1
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._state = self.CLOSED
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._state == self.HALF_OPEN or \
+                    self._failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    self._times_opened += 1
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+
+    @property
+    def is_open(self) -> bool:
+        with self._lock:
+            return self._state == self.OPEN
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "state": self._state,
+                "consecutive_failures": self._failures,
+                "rejected_calls": self._rejected,
+                "times_opened": self._times_opened,
+            }
+
+
+class Resilience:
+    """Retry with jittered exponential backoff behind a circuit breaker.
+
+    Only the outermost resilient call on a thread retries and reports to
+    the breaker; calls it makes internally just raise typed errors, so
+    nested reads never multiply the retry budget.
+    """
+
+    def __init__(self, config: dict) -> None:
+        retry = config.get("retry", {})
+        breaker = config.get("circuit_breaker", {})
+
+        self.max_attempts = max(1, retry.get("max_attempts", 3))
+        self.base_delay = retry.get("base_delay_ms", 50) / 1000
+        self.max_delay = retry.get("max_delay_ms", 1000) / 1000
+        self.breaker = CircuitBreaker(
+            failure_threshold=breaker.get("failure_threshold", 5),
+            reset_timeout=breaker.get("reset_timeout_seconds", 10),
+            half_open_max_calls=breaker.get("half_open_max_calls", 1),
+        )
+
+        self._depth = threading.local()
+        self._retries = 0
+        self._failures = 0
+
+    def call(self, fn, *args, idempotent: bool = True, **kwargs):
+        """Run fn, retrying transient failures; raise PersistenceError."""
+        depth = getattr(self._depth, "value", 0)
+        if depth:
+            return self._run(fn, args, kwargs)
+
+        attempt = 0
+        while True:
+            attempt += 1
+            self.breaker.before_call()
+            self._depth.value = 1
+            try:
+                result = self._run(fn, args, kwargs)
+            except DatabaseUnavailableError as e:
+                self.breaker.record_failure()
+                self._failures += 1
+                can_retry = idempotent or e.retry_safe
+                if attempt >= self.max_attempts or not can_retry \
+                        or self.breaker.is_open:
+                    raise
+                self._retries += 1
+                time.sleep(self._backoff(attempt))
+                continue
+            except QueryError:
+                # MySQL answered, so it is healthy.
+                self.breaker.record_success()
+                raise
+            finally:
+                self._depth.value = 0
+            self.breaker.record_success()
+            return result
+
+    def guard(self) -> None:
+        """Fail fast if the breaker is open (for calls that can't retry)."""
+        if not getattr(self._depth, "value", 0):
+            self.breaker.before_call()
+
+    def record(self, error: Exception = None) -> None:
+        """Report the outcome of a guarded call to the breaker."""
+        if getattr(self._depth, "value", 0):
+            return
+        if isinstance(error, DatabaseUnavailableError):
+            self.breaker.record_failure()
+            self._failures += 1
+        else:
+            self.breaker.record_success()
+
+    def stats(self) -> dict:
+        stats = self.breaker.stats()
+        stats["retries"] = self._retries
+        stats["unavailable_errors"] = self._failures
+        return stats
+
+    def _run(self, fn, args, kwargs):
+        try:
+            return fn(*args, **kwargs)
+        except Exception as e:
+            raise classify_error(e) from e
+
+    def _backoff(self, attempt: int) -> float:
+        # "Full jitter": uniform over [0, capped exponential delay].
+        return random.uniform(
+            0, min(self.max_delay, self.base_delay * (2 ** (attempt - 1)))
+        )
+
+
+def resilient(method=None, *, idempotent: bool = True):
+    """Decorate a MySQLPersistenceWrapper method to run under self._resilience."""
+    def decorate(fn):
+        @functools.wraps(fn)
+        def call(self, *args, **kwargs):
+            return self._resilience.call(fn, self, *args,
+                                         idempotent=idempotent, **kwargs)
+        return call
+
+    if method is not None:
+        return decorate(method)
+    return decorate
@@ -0,0 +1,504 @@
+"""Defines the ShardedPersistenceWrapper class."""
+
+import contextlib
+import copy
+import heapq
+import inspect
+import itertools
+import struct
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from typing import Iterator, List, Optional
+
+from fitness_app_users_and_workouts.application_base import ApplicationBase
+from fitness_app_users_and_workouts.persistence_layer.mysql_persistence_wrapper import (
+    MySQLPersistenceWrapper,
+)
+from fitness_app_users_and_workouts.persistence_layer.unit_of_work import UnitOfWork
+from fitness_app_users_and_workouts.infrastructure_layer.user import User
+from fitness_app_users_and_workouts.infrastructure_layer.workout import Workout
+from fitness_app_users_and_workouts.infrastructure_layer.exercise import Exercise
+
+
+class ShardedPersistenceWrapper(ApplicationBase):
+    """Spreads user data over several MySQL databases by user id hash.
+
+    Each entry of database.sharding.shards overrides the connection config
+    (a different schema on one server, or a different host) and gets its
+    own MySQLPersistenceWrapper, pools and circuit breaker. A user, their
+    completions, favorites and profile live on shard
+    crc32(user_id) % len(shards). User ids come from user_id_sequence on
+    shard 0 so they stay unique across shards.
+
+    The workout/exercise catalog is replicated: writes go to shard 0 first,
+    which assigns ids, then to every other shard with the same ids. Catalog
+    reads are served by shard 0. A replica write that fails after shard 0
+    committed leaves that shard missing rows until reconcile_catalog()
+    copies them. Calls spanning users (get_all_users, paging, batched
+    lookups) are scattered to the shards in parallel and the results
+    merged in user id order.
+
+    Completion ids and change-log versions are per shard, so delta sync
+    and the completion analytics are not available in sharded mode: the
+    methods keyed by them are not defined here, and their callers check
+    for them (AppServices.get_changes_since raises
+    UnsupportedOperationError, which the HTTP API answers with 501).
+    """
+
+    USER_ID = struct.Struct(">I")
+
+    CATALOG_TABLES = ("exercises", "workouts", "workout_exercises")
+
+    def __init__(self, config: dict) -> None:
+        """Initializes one persistence wrapper per shard."""
+        self._config_dict = config
+        self.META = config["meta"]
+        self.SHARDING = config["database"]["sharding"]
+
+        super().__init__(
+            subclass_name=self.__class__.__name__,
+            logfile_prefix_name=self.META["log_prefix"]
+        )
+
+        self.shards: List[MySQLPersistenceWrapper] = [
+            MySQLPersistenceWrapper(self._shard_config(i, shard))
+            for i, shard in enumerate(self.SHARDING["shards"])
+        ]
+        if not self.shards:
+            raise ValueError("database.sharding.shards is empty")
+        self._catalog = self.shards[0]
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.SHARDING.get("scatter_workers",
+                                          2 * len(self.shards)),
+            thread_name_prefix="shard-scatter",
+        )
+        self._logger.log_info(f"Sharding users over {len(self.shards)} databases.")
+
+
+# ROUTING
+
+    def shard_for(self, user_id: int) -> MySQLPersistenceWrapper:
+        """Return the shard that owns user_id."""
+        return self.shards[self.shard_index(user_id, len(self.shards))]
+
+    @classmethod
+    def shard_index(cls, user_id: int, shard_count: int) -> int:
+        """Return the index of the shard owning user_id (also for imports)."""
+        return zlib.crc32(cls.USER_ID.pack(user_id)) % shard_count
+
+    def _group_by_shard(self, user_ids) -> dict:
+        groups: dict = {}
+        for user_id in user_ids:
+            groups.setdefault(self.shard_for(user_id), []).append(user_id)
+        return groups
+
+    def _scatter(self, calls: list) -> list:
+        """Run (fn, args) pairs in parallel; results in call order."""
+        if len(calls) == 1:
+            fn, args = calls[0]
+            return [fn(*args)]
+        futures = [self._executor.submit(fn, *args) for fn, args in calls]
+        return [f.result() for f in futures]
+
+    def _all_shards(self, method: str, *args) -> list:
+        return self._scatter(
+            [(getattr(shard, method), args) for shard in self.shards]
+        )
+
+    def _shard_config(self, index: int, shard: dict) -> dict:
+        config = copy.deepcopy(self._config_dict)
+        database = config["database"]
+        shard = dict(shard)
+        del database["sharding"]
+        database["replicas"] = shard.pop("replicas", [])
+        database["connection"]["config"].update(shard)
+        database["pool"]["name"] = f"{database['pool']['name']}_shard{index}"
+        return config
+
+
+# USERS (SCATTER-GATHER)
+
+    def select_all_users(self) -> List[User]:
+        users = itertools.chain.from_iterable(self._all_shards("select_all_users"))
+        return sorted(users, key=lambda u: u.id)
+
+    def count_users(self, name_filter: str = "") -> int:
+        return sum(self._all_shards("count_users", name_filter))
+
+    def select_users_page(self, offset: int, limit: int,
+                          name_filter: str = "",
+                          after_id: int = 0) -> List[User]:
+        # Any shard may hold the whole page, so each returns offset + limit.
+        pages = self._all_shards("select_users_page", 0, offset + limit,
+                                 name_filter, after_id)
+        merged = heapq.merge(*pages, key=lambda u: u.id)
+        return list(itertools.islice(merged, offset, offset + limit))
+
+    def select_users_by_ids(self, user_ids: List[int]) -> List[User]:
+        groups = self._group_by_shard(user_ids)
+        results = self._scatter(
+            [(shard.select_users_by_ids, (ids,)) for shard, ids in groups.items()]
+        )
+        return list(itertools.chain.from_iterable(results))
+
+    def select_completed_for_users(self, user_ids: List[int],
+                                   workouts: dict = None,
+                                   per_user: int = None,
+                                   totals: dict = None) -> dict:
+        return self._gather_for_users("select_completed_for_users", user_ids,
+                                      workouts, per_user, totals)
+
+    def select_favorites_for_users(self, user_ids: List[int],
+                                   workouts: dict = None,
+                                   per_user: int = None,
+                                   totals: dict = None) -> dict:
+        return self._gather_for_users("select_favorites_for_users", user_ids,
+                                      workouts, per_user, totals)
+
+    def select_data_version(self) -> tuple:
+        return tuple(itertools.chain.from_iterable(
+            self._all_shards("select_data_version")
+        ))
+
+    def select_profile_rebuild_ids(self, after_id: int, limit: int) -> List[int]:
+        ids = self._all_shards("select_profile_rebuild_ids", after_id, limit)
+        return list(itertools.islice(heapq.merge(*ids), limit))
+
+    def stream_users_page(self, after_user_id: int, limit: int) -> Iterator[tuple]:
+        streams = [shard.stream_users_page(after_user_id, limit)
+                   for shard in self.shards]
+        return itertools.islice(
+            heapq.merge(*streams, key=lambda row: row[0]), limit
+        )
+
+    def stream_completions_for_user_range(
+        self, after_user_id: int, last_user_id: int
+    ) -> Iterator[tuple]:
+        return heapq.merge(
+            *[shard.stream_completions_for_user_range(after_user_id, last_user_id)
+              for shard in self.shards],
+            key=lambda row: row[1],
+        )
+
+    def stream_favorites_for_user_range(
+        self, after_user_id: int, last_user_id: int
+    ) -> Iterator[tuple]:
+        return heapq.merge(
+            *[shard.stream_favorites_for_user_range(after_user_id, last_user_id)
+              for shard in self.shards],
+            key=lambda row: row[0],
+        )
+
+    def insert_user(self, user: User) -> Optional[int]:
+        user.id = self._catalog.allocate_user_id()
+        return self.shard_for(user.id).insert_user(user)
+
+    def insert_user_completed_workouts(self, rows: List[tuple]) -> bool:
+        """Insert each shard's part of the batch; True if all committed."""
+        groups: dict = {}
+        for row in rows:
+            groups.setdefault(self.shard_for(row[0]), []).append(row)
+        return all(self._scatter(
+            [(shard.insert_user_completed_workouts, (part,))
+             for shard, part in groups.items()]
+        ))
+
+    def _gather_for_users(self, method: str, user_ids: List[int],
+                          workouts: dict = None, per_user: int = None,
+                          totals: dict = None) -> dict:
+        groups = self._group_by_shard(user_ids)
+        # Shards fill separate workouts dicts (no dict shared across
+        # threads); the results are then pointed at one Workout per id.
+        # Totals are per user, so shards can share that dict.
+        results = self._scatter([
+            (getattr(shard, method), (ids, {}, per_user, totals))
+            for shard, ids in groups.items()
+        ])
+        workouts = {} if workouts is None else workouts
+        merged: dict = {}
+        for result in results:
+            for user_id, items in result.items():
+                for i, item in enumerate(items):
+                    if isinstance(item, Workout):
+                        items[i] = workouts.setdefault(item.id, item)
+                    else:
+                        item.workout = workouts.setdefault(item.workout.id,
+                                                           item.workout)
+                merged[user_id] = items
+        return merged
+
+
+# USERS (SINGLE SHARD)
+
+    def select_user_completed(self, user_id: int, workouts: dict = None):
+        return self.shard_for(user_id).select_user_completed(user_id, workouts)
+
+    def select_user_favorites(self, user_id: int, workouts: dict = None):
+        return self.shard_for(user_id).select_user_favorites(user_id, workouts)
+
+    def insert_user_favorite_workout(self, user_id: int, workout_id: int) -> bool:
+        return self.shard_for(user_id).insert_user_favorite_workout(
+            user_id, workout_id
+        )
+
+    def insert_user_completed_workout(self, user_id: int, workout_id: int,
+                                      idempotency_key: str = None) -> bool:
+        return self.shard_for(user_id).insert_user_completed_workout(
+            user_id, workout_id, idempotency_key
+        )
+
+    def insert_user_completed_workout_once(
+        self, user_id: int, workout_id: int, idempotency_key: str = None
+    ) -> Optional[bool]:
+        return self.shard_for(user_id).insert_user_completed_workout_once(
+            user_id, workout_id, idempotency_key
+        )
+
+    def insert_user_favorite_workouts(self, user_id: int,
+                                      workout_ids: List[int]) -> dict:
+        return self.shard_for(user_id).insert_user_favorite_workouts(
+            user_id, workout_ids
+        )
+
+    def delete_user_favorite_workouts(self, user_id: int,
+                                      workout_ids: List[int]) -> dict:
+        return self.shard_for(user_id).delete_user_favorite_workouts(
+            user_id, workout_ids
+        )
+
+    def insert_user_completed_workouts_for_user(
+        self, user_id: int, workout_ids: List[int],
+        date_completed: date = None, idempotency_keys: List[str] = None
+    ) -> dict:
+        return self.shard_for(user_id).insert_user_completed_workouts_for_user(
+            user_id, workout_ids, date_completed, idempotency_keys
+        )
+
+    def select_user_completion_dates(self, user_id: int) -> list:
+        return self.shard_for(user_id).select_user_completion_dates(user_id)
+
+    def select_user_profile(self, user_id: int) -> Optional[str]:
+        return self.shard_for(user_id).select_user_profile(user_id)
+
+    def rebuild_user_profile(self, user_id: int) -> Optional[str]:
+        return self.shard_for(user_id).rebuild_user_profile(user_id)
+
+    def stream_user_history(self, user_id: int, since: str,
+                            limit: int) -> Iterator[tuple]:
+        return self.shard_for(user_id).stream_user_history(user_id, since, limit)
+
+
+# CATALOG (REPLICATED)
+
+    def insert_workout(self, workout: Workout) -> Optional[int]:
+        workout.id = self._catalog.insert_workout(workout)
+        self._replicate("insert_workout", workout)
+        return workout.id
+
+    def insert_exercise(self, exercise: Exercise) -> Optional[int]:
+        exercise.id = self._catalog.insert_exercise(exercise)
+        self._replicate("insert_exercise", exercise)
+        return exercise.id
+
+    def upsert_exercises(self, exercises: List[Exercise]) -> List[Optional[int]]:
+        ids = self._catalog.upsert_exercises(exercises)
+        for ex, exercise_id in zip(exercises, ids):
+            ex.id = exercise_id
+        self._replicate("upsert_exercises", exercises)
+        return ids
+
+    def link_workout_exercise(self, workout_id: int, exercise_id: int) -> bool:
+        self._catalog.link_workout_exercise(workout_id, exercise_id)
+        self._replicate("link_workout_exercise", workout_id, exercise_id)
+        return True
+
+    def compact_exercises(self) -> dict:
+        # Every shard holds the same rows, so each keeps the same ids.
+        return self._all_shards("compact_exercises")[0]
+
+    def _replicate(self, method: str, *args) -> None:
+        try:
+            self._scatter(
+                [(getattr(shard, method), args) for shard in self.shards[1:]]
+            )
+        except Exception as e:
+            self._logger.log_error(
+                f"{inspect.currentframe().f_code.co_name}: {method} did not "
+                f"reach every shard: {e}"
+            )
+            raise
+
+    def reconcile_catalog(self) -> dict:
+        """Copy catalog rows missing on other shards from shard 0.
+
+        Returns the number of rows copied per table. Rows only present on
+        a replica are left alone and logged.
+        """
+        copied = {table: 0 for table in self.CATALOG_TABLES}
+        source = {
+            table: {row[:2] if table == "workout_exercises" else row[0]: row
+                    for row in self._catalog.stream_catalog(table)}
+            for table in self.CATALOG_TABLES
+        }
+        for i, shard in enumerate(self.shards[1:], start=1):
+            for table in self.CATALOG_TABLES:
+                present = {
+                    row[:2] if table == "workout_exercises" else row[0]
+                    for row in shard.stream_catalog(table)
+                }
+                extra = len(present - source[table].keys())
+                if extra:
+                    self._logger.log_warning(
+                        f"Shard {i} has {extra} {table} row(s) not on shard 0."
+                    )
+                for key in sorted(source[table].keys() - present):
+                    self._copy_catalog_row(shard, table, source[table][key])
+                    copied[table] += 1
+        return copied
+
+    def _copy_catalog_row(self, shard, table: str, row: tuple) -> None:
+        if table == "exercises":
+            ex = Exercise()
+            ex.id, ex.name, ex.instructions = row
+            shard.insert_exercise(ex)
+        elif table == "workouts":
+            w = Workout()
+            w.id, w.title, w.description = row
+            shard.insert_workout(w)
+        else:
+            shard.link_workout_exercise(*row)
+
+
+# CATALOG AND SHARD-0 READS
+
+    def select_all_workouts(self) -> List[Workout]:
+        return self._catalog.select_all_workouts()
+
+    def select_all_exercises(self) -> List[Exercise]:
+        return self._catalog.select_all_exercises()
+
+    def select_workouts_page(self, offset: int, limit: int,
+                             title_filter: str = "",
+                             after_id: int = 0) -> List[Workout]:
+        return self._catalog.select_workouts_page(offset, limit, title_filter,
+                                                  after_id)
+
+    def count_workouts(self, title_filter: str = "") -> int:
+        return self._catalog.count_workouts(title_filter)
+
+    def select_workout_exercises(self, workout_id: int) -> List[Exercise]:
+        return self._catalog.select_workout_exercises(workout_id)
+
+    def select_workouts_by_ids(self, workout_ids: List[int]) -> List[Workout]:
+        return self._catalog.select_workouts_by_ids(workout_ids)
+
+    def select_exercises_by_ids(self, exercise_ids: List[int]) -> List[Exercise]:
+        return self._catalog.select_exercises_by_ids(exercise_ids)
+
+    def select_exercises_for_workouts(self, workout_ids: List[int]) -> dict:
+        return self._catalog.select_exercises_for_workouts(workout_ids)
+
+    def stream_catalog(self, table: str) -> Iterator[tuple]:
+        return self._catalog.stream_catalog(table)
+
+    def stream_workouts_page(self, after_workout_id: int,
+                             limit: int) -> Iterator[tuple]:
+        return self._catalog.stream_workouts_page(after_workout_id, limit)
+
+    def select_catalog_version(self) -> Optional[tuple]:
+        return self._catalog.select_catalog_version()
+
+    def allocate_user_id(self) -> int:
+        return self._catalog.allocate_user_id()
+
+    def server_today(self) -> date:
+        return self._catalog.server_today()
+
+    def select_server_utc_offset(self) -> int:
+        return self._catalog.select_server_utc_offset()
+
+
+# UNIT OF WORK
+
+    def session(self) -> UnitOfWork:
+        """Start a unit of work; see commit_unit_of_work for atomicity."""
+        return UnitOfWork(self)
+
+    def commit_unit_of_work(self, uow: UnitOfWork) -> dict:
+        """Commit the catalog part, then each user shard's part.
+
+        Each part is one transaction on its shard. The catalog part
+        commits on shard 0 first, which assigns the ids, and is then
+        replayed on the other shards with replay_unit_of_work, which
+        skips rows already there and is retried like any idempotent call.
+        User rows, favorites and completions are then committed per
+        owning shard in parallel.
+
+        Only a unit touching one shard's users and no catalog rows is
+        atomic. A unit spanning shards is not: if a later part fails, the
+        parts already committed stay committed and the error is raised.
+        reconcile_catalog() repairs replicas a failed replay left behind.
+        """
+        counts: dict = {}
+        catalog = UnitOfWork(self._catalog)
+        catalog.workouts, catalog.exercises = uow.workouts, uow.exercises
+        catalog.links = uow.links
+        if not catalog.is_empty():
+            counts = catalog.commit()
+            replica = UnitOfWork(None)
+            replica.workouts, replica.exercises = uow.workouts, uow.exercises
+            replica.links = uow.links
+            self._replicate("replay_unit_of_work", replica)
+
+        parts: dict = {}
+
+        def part(user_id: int) -> UnitOfWork:
+            return parts.setdefault(self.shard_for(user_id), UnitOfWork(None))
+
+        for user in uow.users:
+            user.id = user.id or self._catalog.allocate_user_id()
+            part(user.id).users.append(user)
+        for favorite in uow.favorites:
+            part(favorite[0]).favorites.append(favorite)
+        for completion in uow.completions:
+            part(completion[0]).completions.append(completion)
+        for result in self._scatter(
+            [(shard.commit_unit_of_work, (part,)) for shard, part in parts.items()]
+        ):
+            for table, count in result.items():
+                counts[table] = counts.get(table, 0) + count
+        return counts
+
+
+# OPERATIONS
+
+    def primary_reads(self):
+        """Context manager pinning this thread's reads to every primary."""
+        stack = contextlib.ExitStack()
+        for shard in self.shards:
+            stack.enter_context(shard.primary_reads())
+        return stack
+
+    def get_resilience_stats(self) -> dict:
+        """Return circuit breaker state and retry counters per shard."""
+        return {
+            f"shard{i}": shard.get_resilience_stats()
+            for i, shard in enumerate(self.shards)
+        }
+
+    def get_pool_stats(self) -> List[dict]:
+        """Return the pool warm-up state of every shard."""
+        return [
+            dict(stats, shard=i)
+            for i, shard in enumerate(self.shards)
+            for stats in shard.get_pool_stats()
+        ]
+
+    def get_replica_stats(self) -> List[dict]:
+        """Return replica statistics of every shard."""
+        return [
+            dict(stats, shard=i)
+            for i, shard in enumerate(self.shards)
+            for stats in shard.get_replica_stats()
+        ]
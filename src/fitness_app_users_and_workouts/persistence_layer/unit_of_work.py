@@ -0,0 +1,82 @@
+"""Defines the UnitOfWork class."""
+
+from datetime import date
+from typing import Optional, Union
+
+from fitness_app_users_and_workouts.infrastructure_layer.user import User
+from fitness_app_users_and_workouts.infrastructure_layer.workout import Workout
+from fitness_app_users_and_workouts.infrastructure_layer.exercise import Exercise
+
+
+class UnitOfWork:
+    """Queues inserts and links, then writes them in one transaction.
+
+    Obtain one from the persistence wrapper's session(). Nothing touches
+    the database until commit() (or leaving the with block without an
+    exception), which hands the queue to the wrapper's
+    commit_unit_of_work(): one multi-row statement per table on a single
+    connection, committed or rolled back as a whole.
+
+    Links, favorites and completions may refer to a Workout or Exercise
+    queued in the same unit instead of an id; those ids are resolved
+    during the commit. Generated ids are written back to the queued
+    entities only once the transaction has committed.
+    """
+
+    def __init__(self, db) -> None:
+        self._db = db
+        self.users: list = []
+        self.workouts: list = []
+        self.exercises: list = []
+        self.links: list = []
+        self.favorites: list = []
+        self.completions: list = []
+        self.committed: Optional[dict] = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        # On an exception nothing has been written, so dropping the
+        # queue is the rollback.
+        if exc_type is None and self.committed is None:
+            self.commit()
+
+    def add_user(self, user: User) -> User:
+        self.users.append(user)
+        return user
+
+    def add_workout(self, workout: Workout) -> Workout:
+        self.workouts.append(workout)
+        return workout
+
+    def add_exercise(self, exercise: Exercise) -> Exercise:
+        """Queue an exercise; an existing one with the same name is reused."""
+        self.exercises.append(exercise)
+        return exercise
+
+    def link_workout_exercise(self, workout: Union[Workout, int],
+                              exercise: Union[Exercise, int]) -> None:
+        self.links.append((workout, exercise))
+
+    def add_favorite(self, user_id: int, workout: Union[Workout, int]) -> None:
+        self.favorites.append((user_id, workout))
+
+    def add_completion(self, user_id: int, workout: Union[Workout, int],
+                       date_completed: date = None,
+                       idempotency_key: str = None) -> None:
+        """Queue a completion; date_completed defaults to the server's date."""
+        self.completions.append(
+            (user_id, workout, date_completed, idempotency_key)
+        )
+
+    def is_empty(self) -> bool:
+        return not (self.users or self.workouts or self.exercises
+                    or self.links or self.favorites or self.completions)
+
+    def commit(self) -> dict:
+        """Write the queue atomically; returns the rows written per table."""
+        if self.committed is None:
+            self.committed = (self._db.commit_unit_of_work(self)
+                              if not self.is_empty() else {})
+        return self.committed
@@ -0,0 +1,124 @@
+"""Defines the BatchCli class."""
+
+import csv
+import json
+import sys
+from typing import Iterator
+
+from fitness_app_users_and_workouts.service_layer.app_services import AppServices
+from fitness_app_users_and_workouts.application_base import ApplicationBase
+
+
+class BatchCli(ApplicationBase):
+    """Scriptable subcommands that stream their output row by row.
+
+    Commands return the process exit status: 0, or 1 if a write did not
+    succeed for every id. Persistence errors propagate to the caller.
+    """
+
+    def __init__(self, config: dict, app_services: AppServices,
+                 out=None) -> None:
+        """Initialize batch CLI."""
+        self._config_dict = config
+        self.META = config["meta"]
+        self.app_services = app_services
+        self.out = out or sys.stdout
+
+        super().__init__(
+            subclass_name=self.__class__.__name__,
+            logfile_prefix_name=self.META["log_prefix"],
+        )
+
+        self.max_cell_width = config.get("ui", {}).get("max_cell_width", 40)
+
+
+# COMMANDS
+
+    def list_users(self, fmt: str, limit: int = None, since: int = 0) -> int:
+        self._emit(
+            ["id", "first_name", "middle_name", "last_name", "birthday", "gender"],
+            self.app_services.iter_users(after_id=since or 0, limit=limit),
+            fmt,
+        )
+        return 0
+
+    def list_workouts(self, fmt: str, limit: int = None, since: int = 0) -> int:
+        self._emit(
+            ["id", "title", "description"],
+            self.app_services.iter_workouts(after_id=since or 0, limit=limit),
+            fmt,
+        )
+        return 0
+
+    def user_history(self, user_id: int, fmt: str, limit: int = None,
+                     since: str = None) -> int:
+        self._emit(
+            ["completion_id", "workout_id", "title", "date_completed"],
+            self.app_services.iter_user_history(
+                user_id, since=since or "0001-01-01", limit=limit
+            ),
+            fmt,
+        )
+        return 0
+
+    def complete(self, user_id: int, workout_ids: list, fmt: str) -> int:
+        outcomes = self.app_services.complete_workouts(user_id, workout_ids)
+        return self._emit_results(user_id, workout_ids, outcomes, fmt)
+
+    def favorite(self, user_id: int, workout_ids: list, fmt: str) -> int:
+        outcomes = self.app_services.favorite_workouts(user_id, workout_ids)
+        return self._emit_results(user_id, workout_ids, outcomes, fmt)
+
+    def unfavorite(self, user_id: int, workout_ids: list, fmt: str) -> int:
+        outcomes = self.app_services.unfavorite_workouts(user_id, workout_ids)
+        return self._emit_results(user_id, workout_ids, outcomes, fmt)
+
+
+# OUTPUT
+
+    def _emit_results(self, user_id: int, workout_ids: list, outcomes: dict,
+                      fmt: str) -> int:
+        """One row per workout id; an id already in the wanted state succeeds."""
+        rows = []
+        for wid in dict.fromkeys(workout_ids):
+            outcome = outcomes.get(wid, "failed")
+            rows.append({"user_id": user_id, "workout_id": wid,
+                         "success": outcome not in ("not_found", "failed"),
+                         "outcome": outcome})
+        self._emit(["user_id", "workout_id", "success", "outcome"], rows, fmt)
+        return 0 if all(r["success"] for r in rows) else 1
+
+    def _emit(self, columns: list, rows: Iterator[dict], fmt: str) -> int:
+        """Write rows as they arrive: JSON Lines, CSV or a plain text table.
+
+        Returns the number of rows written.
+        """
+        count = 0
+        if fmt == "json":
+            for row in rows:
+                self.out.write(json.dumps(row, default=str) + "\n")
+                count += 1
+        elif fmt == "csv":
+            writer = csv.writer(self.out)
+            writer.writerow(columns)
+            for row in rows:
+                writer.writerow(["" if row[c] is None else row[c] for c in columns])
+                count += 1
+        else:
+            # Column widths can't depend on rows not yet read, so use the
+            # configured cell width and clip longer values.
+            width = self.max_cell_width
+            self.out.write(" | ".join(c.ljust(width) for c in columns).rstrip() + "\n")
+            self.out.write("-+-".join("-" * width for _ in columns) + "\n")
+            for row in rows:
+                self.out.write(" | ".join(
+                    self._clip(row[c], width).ljust(width) for c in columns
+                ).rstrip() + "\n")
+                count += 1
+        self.out.flush()
+        self._logger.log_debug(f"Emitted {count} row(s) as {fmt}.")
+        return count
+
+    def _clip(self, value, width: int) -> str:
+        text = "" if value is None else str(value).replace("\n", " ")
+        return text if len(text) <= width else text[: width - 1] + "…"
@@ -0,0 +1,385 @@
+"""Defines the HttpApi class."""
+
+import gzip
+import hashlib
+import inspect
+import json
+import re
+import zlib
+from datetime import date
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Iterator, Optional
+
+from fitness_app_users_and_workouts.service_layer.app_services import AppServices
+from fitness_app_users_and_workouts.persistence_layer.resilience import (
+    DatabaseUnavailableError,
+    UnsupportedOperationError,
+)
+from fitness_app_users_and_workouts.application_base import ApplicationBase
+
+
+class HttpApi(ApplicationBase):
+    """Threaded HTTP server exposing AppServices as JSON endpoints."""
+
+    def __init__(self, config: dict, app_services: AppServices) -> None:
+        """Initialize HTTP API."""
+        self._config_dict = config
+        self.META = config["meta"]
+        self.HTTP = config.get("http", {})
+        self.app_services = app_services
+
+        super().__init__(
+            subclass_name=self.__class__.__name__,
+            logfile_prefix_name=self.META["log_prefix"],
+        )
+
+        self.host = self.HTTP.get("host", "127.0.0.1")
+        self.port = self.HTTP.get("port", 8080)
+        self.gzip_min_bytes = self.HTTP.get("gzip_min_bytes", 1024)
+        self.keep_alive_timeout = self.HTTP.get("keep_alive_timeout", 15)
+
+        # Each route: (method, path pattern, handler, ETag). GET routes
+        # with ETag set send validators derived from the database's data
+        # version; the others can change without a write (streaks follow
+        # the date) or are already versioned (changes).
+        self.ROUTES = [
+            ("GET", r"/users", self._get_users, True),
+            ("GET", r"/users/(\d+)/favorites", self._get_user_favorites, True),
+            ("GET", r"/users/(\d+)/completed", self._get_user_completed, True),
+            ("GET", r"/users/(\d+)/profile", self._get_user_profile, True),
+            ("GET", r"/users/(\d+)/streaks", self._get_user_streaks, False),
+            ("GET", r"/users/(\d+)/calendar/(\d+)", self._get_user_calendar,
+                True),
+            ("GET", r"/workouts", self._get_workouts, True),
+            ("GET", r"/workouts/(\d+)/exercises", self._get_workout_exercises,
+                True),
+            ("GET", r"/exercises", self._get_exercises, True),
+            ("GET", r"/changes/(\d+)", self._get_changes, False),
+            ("POST", r"/users", self._post_user, False),
+            ("POST", r"/workouts", self._post_workout, False),
+            ("POST", r"/users/(\d+)/favorites", self._post_user_favorite, False),
+            ("POST", r"/users/(\d+)/completed", self._post_user_completed, False),
+            ("DELETE", r"/users/(\d+)/favorites", self._delete_user_favorites,
+                False),
+        ]
+        self.ROUTES = [
+            (m, re.compile(f"^{p}/?$"), h, v) for (m, p, h, v) in self.ROUTES
+        ]
+
+        self._logger.log_debug("HTTP API initialized!")
+
+
+# SERVER LIFECYCLE
+
+    def start(self) -> None:
+        """Serve requests until interrupted."""
+        server = ThreadingHTTPServer((self.host, self.port), _RequestHandler)
+        server.daemon_threads = True
+        server.api = self
+        self._logger.log_info(f"HTTP API listening on {self.host}:{self.port}")
+        print(f"Serving Fitness App API on http://{self.host}:{self.port}/")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            self._logger.log_info("HTTP API stopped.")
+
+
+# REQUEST DISPATCH
+
+    def dispatch(self, method: str, path: str, headers, body: bytes) -> tuple:
+        """Route a request. Returns (status, headers dict, body).
+
+        body is bytes, or an iterator of bytes for a streamed response.
+        """
+        path = path.split("?", 1)[0]
+        path_matched = False
+
+        for route_method, pattern, handler, use_etag in self.ROUTES:
+            match = pattern.match(path)
+            if not match:
+                continue
+            path_matched = True
+            if route_method != method:
+                continue
+
+            try:
+                args = [int(g) for g in match.groups()]
+
+                if method == "GET" and not use_etag:
+                    return self._json_response(200, handler(*args), headers, {})
+
+                if method == "GET":
+                    # Read before the handler runs, so a write racing it can
+                    # only make the ETag look stale, never fresh.
+                    etag = self._make_etag(path)
+                    if etag is None:
+                        return self._json_response(200, handler(*args),
+                                                   headers, {})
+                    if self._etag_matches(headers.get("If-None-Match"), etag):
+                        return 304, {"ETag": etag}, b""
+                    failures = self.app_services.get_failure_count()
+                    payload = handler(*args)
+                    # A failed call returns an empty fallback, which must
+                    # not be revalidated as if it were the real response.
+                    if self.app_services.get_failure_count() != failures:
+                        return self._json_response(200, payload, headers, {})
+                    return self._json_response(200, payload, headers,
+                                               {"ETag": etag})
+
+                data = json.loads(body or b"{}")
+                status, payload = handler(*args, data)
+                return self._json_response(status, payload, headers, {})
+
+            except DatabaseUnavailableError as e:
+                retry_after = max(1, round(getattr(e, "retry_after", 1)))
+                return self._json_response(
+                    503, json.dumps({"error": "Database unavailable"}),
+                    headers, {"Retry-After": str(retry_after)}
+                )
+            except UnsupportedOperationError as e:
+                return self._json_response(
+                    501, json.dumps({"error": str(e)}), headers, {}
+                )
+            except (ValueError, KeyError, TypeError) as e:
+                return self._json_response(
+                    400, json.dumps({"error": f"Bad request: {e}"}), headers, {}
+                )
+            except Exception as e:
+                self._logger.log_error(
+                    f"{inspect.currentframe().f_code.co_name}: {e}"
+                )
+                return self._json_response(
+                    500, json.dumps({"error": "Internal server error"}),
+                    headers, {}
+                )
+
+        if path_matched:
+            return self._json_response(
+                405, json.dumps({"error": "Method not allowed"}), headers, {}
+            )
+        return self._json_response(
+            404, json.dumps({"error": "Not found"}), headers, {}
+        )
+
+    def _make_etag(self, path: str) -> Optional[str]:
+        validator = self.app_services.get_data_validator()
+        if validator is None:
+            return None
+        digest = hashlib.sha1(
+            f"{path}:{validator}".encode("utf-8")
+        ).hexdigest()[:20]
+        return f'"{digest}"'
+
+    def _etag_matches(self, if_none_match, etag: str) -> bool:
+        if not if_none_match:
+            return False
+        candidates = [c.strip() for c in if_none_match.split(",")]
+        return "*" in candidates or etag in candidates or f"W/{etag}" in candidates
+
+    def _json_response(self, status: int, payload, request_headers,
+                       extra_headers: dict) -> tuple:
+        response_headers = {"Content-Type": "application/json; charset=utf-8"}
+        response_headers.update(extra_headers)
+        accept_encoding = request_headers.get("Accept-Encoding", "") or ""
+
+        if not isinstance(payload, str):
+            # Streamed: sent chunked as the handler produces it. Its content
+            # isn't known when the headers go out, so it gets no ETag.
+            response_headers.pop("ETag", None)
+            compress = "gzip" in accept_encoding
+            if compress:
+                response_headers["Content-Encoding"] = "gzip"
+            return status, response_headers, self._encode_chunks(payload,
+                                                                 compress)
+
+        body = payload.encode("utf-8")
+        if len(body) >= self.gzip_min_bytes and "gzip" in accept_encoding:
+            body = gzip.compress(body, compresslevel=5)
+            response_headers["Content-Encoding"] = "gzip"
+        if "ETag" in response_headers:
+            response_headers["Vary"] = "Accept-Encoding"
+
+        return status, response_headers, body
+
+
+    def _encode_chunks(self, chunks: Iterator[str],
+                       compress: bool) -> Iterator[bytes]:
+        compressor = zlib.compressobj(5, zlib.DEFLATED, 31) if compress else None
+        for chunk in chunks:
+            data = chunk.encode("utf-8")
+            if compressor is not None:
+                data = compressor.compress(data)
+            if data:
+                yield data
+        if compressor is not None:
+            yield compressor.flush()
+
+
+# GET HANDLERS
+
+    def _get_users(self) -> str:
+        return self.app_services.get_all_users_as_json()
+
+    def _get_user_favorites(self, user_id: int) -> str:
+        return self.app_services.get_user_favorites_as_json(user_id)
+
+    def _get_user_completed(self, user_id: int) -> str:
+        return self.app_services.get_user_completed_as_json(user_id)
+
+    def _get_user_profile(self, user_id: int) -> str:
+        return self.app_services.get_user_profile_as_json(user_id)
+
+    def _get_user_streaks(self, user_id: int) -> str:
+        return json.dumps(self.app_services.get_user_streaks(user_id))
+
+    def _get_user_calendar(self, user_id: int, year: int) -> str:
+        return json.dumps(self.app_services.get_user_calendar(user_id, year))
+
+    def _get_workouts(self) -> str:
+        return self.app_services.get_all_workouts_as_json()
+
+    def _get_workout_exercises(self, workout_id: int) -> str:
+        return self.app_services.get_workout_exercises_as_json(workout_id)
+
+    def _get_exercises(self) -> str:
+        exercises = self.app_services.get_all_exercises()
+        return json.dumps([ex.to_dict() for ex in exercises])
+
+    def _get_changes(self, version: int) -> str:
+        return self.app_services.get_changes_since_as_json(version)
+
+
+# POST HANDLERS
+
+    def _post_user(self, data: dict) -> tuple:
+        if not data.get("first_name") or not data.get("last_name"):
+            raise ValueError("first_name and last_name are required")
+        success = self.app_services.add_user(
+            first_name=data["first_name"],
+            middle_name=data.get("middle_name", ""),
+            last_name=data["last_name"],
+            birthday=data.get("birthday", ""),
+            gender=data.get("gender", ""),
+        )
+        return self._write_result(success, 201)
+
+    def _post_workout(self, data: dict) -> tuple:
+        if not data.get("title"):
+            raise ValueError("title is required")
+        success = self.app_services.add_workout(
+            title=data["title"],
+            description=data.get("description", ""),
+            existing_exercise_ids=[int(i) for i in data.get("exercise_ids", [])],
+            new_exercises_data=list(data.get("new_exercises", [])),
+        )
+        return self._write_result(success, 201)
+
+    def _post_user_favorite(self, user_id: int, data: dict) -> tuple:
+        if "workout_ids" in data:
+            return self._bulk_result(self.app_services.favorite_workouts(
+                user_id, self._workout_ids(data)
+            ))
+        success = self.app_services.favorite_workout(
+            user_id, int(data["workout_id"])
+        )
+        return self._write_result(success, 201)
+
+    def _post_user_completed(self, user_id: int, data: dict) -> tuple:
+        if "workout_ids" in data:
+            date_completed = data.get("date_completed")
+            return self._bulk_result(self.app_services.complete_workouts(
+                user_id, self._workout_ids(data),
+                date.fromisoformat(date_completed) if date_completed else None,
+            ))
+        success = self.app_services.complete_workout(
+            user_id, int(data["workout_id"]), data.get("idempotency_key")
+        )
+        return self._write_result(success, 201)
+
+    def _delete_user_favorites(self, user_id: int, data: dict) -> tuple:
+        return self._bulk_result(self.app_services.unfavorite_workouts(
+            user_id, self._workout_ids(data)
+        ))
+
+    def _workout_ids(self, data: dict) -> list:
+        workout_ids = [int(i) for i in data["workout_ids"]]
+        if not workout_ids:
+            raise ValueError("workout_ids is empty")
+        return workout_ids
+
+    def _bulk_result(self, outcomes: dict) -> tuple:
+        """200 with per-id outcomes; 409 if nothing could be written."""
+        if not outcomes:
+            return 409, json.dumps({"success": False})
+        return 200, json.dumps({
+            "success": True,
+            "results": {str(k): v for k, v in outcomes.items()},
+        })
+
+    def _write_result(self, success: bool, status: int) -> tuple:
+        if success:
+            return status, json.dumps({"success": True})
+        return 409, json.dumps({"success": False})
+
+
+class _RequestHandler(BaseHTTPRequestHandler):
+    """Adapts http.server requests to HttpApi.dispatch()."""
+
+    # HTTP/1.1 keeps connections alive as long as Content-Length is sent.
+    protocol_version = "HTTP/1.1"
+    server_version = "FitnessAppHTTP/1.0"
+
+    def setup(self) -> None:
+        super().setup()
+        self.request.settimeout(self.server.api.keep_alive_timeout)
+
+    def do_GET(self) -> None:
+        self._handle("GET")
+
+    def do_POST(self) -> None:
+        self._handle("POST")
+
+    def do_DELETE(self) -> None:
+        self._handle("DELETE")
+
+    def _handle(self, method: str) -> None:
+        length = int(self.headers.get("Content-Length", 0) or 0)
+        body = self.rfile.read(length) if length else b""
+
+        status, headers, payload = self.server.api.dispatch(
+            method, self.path, self.headers, body
+        )
+
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        if isinstance(payload, bytes):
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            if payload:
+                self.wfile.write(payload)
+            return
+
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        try:
+            for chunk in payload:
+                self.wfile.write(f"{len(chunk):X}\r\n".encode("ascii")
+                                 + chunk + b"\r\n")
+            self.wfile.write(b"0\r\n\r\n")
+        except Exception as e:
+            # The status is already sent; dropping the connection without
+            # the last chunk tells the client the body is incomplete.
+            self.server.api._logger.log_error(
+                f"{inspect.currentframe().f_code.co_name}: {method} "
+                f"{self.path}: {e}"
+            )
+            self.close_connection = True
+
+    def log_message(self, format: str, *args) -> None:
+        self.server.api._logger.log_debug(
+            f"{self.address_string()} {format % args}"
+        )
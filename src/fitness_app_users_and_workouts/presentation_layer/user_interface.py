@@ -1,11 +1,16 @@
 # Defines the Console User Interface for the Fitness App.
 
+import json
 import sys
 from typing import List
 
-from prettytable import PrettyTable
-
 from fitness_app_users_and_workouts.service_layer.app_services import AppServices
+from fitness_app_users_and_workouts.service_layer.memory_accounting import (
+    MemoryBudgetExceededError,
+)
+from fitness_app_users_and_workouts.persistence_layer.resilience import (
+    DatabaseUnavailableError,
+)
 from fitness_app_users_and_workouts.application_base import ApplicationBase
 from fitness_app_users_and_workouts.infrastructure_layer.user import User
 from fitness_app_users_and_workouts.infrastructure_layer.workout import Workout
@@ -26,8 +31,18 @@ class UserInterface(ApplicationBase):
             logfile_prefix_name=self.META["log_prefix"],
         )
 
+        self.UI = config.get("ui", {})
+        self.page_size = self.UI.get("page_size", 10)
+        self.max_cell_width = self.UI.get("max_cell_width", 40)
+        self.max_cell_lines = self.UI.get("max_cell_lines", 5)
+
         self._logger.log_debug("User Interface initialized!")
 
+    def _table(self):
+        # prettytable is imported on first use so the menu doesn't wait on it.
+        from prettytable import PrettyTable
+        return PrettyTable()
+
 
 # DISPLAY MENU
 
@@ -38,8 +53,9 @@ class UserInterface(ApplicationBase):
         print("\t3. Add User")
         print("\t4. Favorite Workout(s) for a User")
         print("\t5. Add Workout")
-        print("\t6. Mark Workout as Completed")
-        print("\t7. Exit\n")
+        print("\t6. Mark Workout(s) as Completed")
+        print("\t7. Unfavorite Workout(s) for a User")
+        print("\t8. Exit\n")
 
 # PROCESS MENU CHOICE
 
@@ -60,6 +76,8 @@ class UserInterface(ApplicationBase):
             case "6":
                 self.mark_workout_completed()
             case "7":
+                self.unfavorite_workouts_for_user()
+            case "8":
                 print("Goodbye!")
                 sys.exit(0)
             case _:
@@ -69,14 +87,7 @@ class UserInterface(ApplicationBase):
 # MENU OPTION 1: LIST USERS
 
     def list_users(self) -> None:
-        users: List[User] = self.app_services.get_all_users()
-
-        if not users:
-            print("\nNo users found.\n")
-            return
-
-        table = PrettyTable()
-        table.field_names = [
+        field_names = [
             "ID",
             "First Name",
             "Middle Name",
@@ -86,71 +97,155 @@ class UserInterface(ApplicationBase):
             "Completed Workouts",
             "Favorite Workouts",
         ]
-        table.align = "l"
 
-        for user in users:
-            completed_str = "None"
-            if getattr(user, "completed_workouts", []):
-                completed_str = "\n".join(
-                    f"- {w.title} (completed: {w.date_completed})"
-                    for w in user.completed_workouts
-                )
-
-            favorites_str = "None"
-            if getattr(user, "favorite_workouts", []):
-                favorites_str = "\n".join(
-                    f"- {w.title}" for w in user.favorite_workouts
-                )
-
-            table.add_row(
-                [
-                    user.id,
-                    user.first_name,
-                    user.middle_name,
-                    user.last_name,
-                    user.gender,
-                    user.birthday,
-                    completed_str,
-                    favorites_str,
-                ]
+        def user_row(user: User) -> list:
+            completed_str = self._lines_cell(
+                (f"- {c.workout.title} (completed: {c.date_completed})"
+                 for c in user.completed_workouts),
+                user.completed_workouts_total,
+            )
+            favorites_str = self._lines_cell(
+                (f"- {w.title}" for w in user.favorite_workouts),
+                user.favorite_workouts_total,
+            )
+            return [
+                user.id,
+                user.first_name,
+                user.middle_name,
+                user.last_name,
+                user.gender,
+                user.birthday,
+                completed_str,
+                favorites_str,
+            ]
+
+        def fetch_page(*args, **kwargs) -> tuple:
+            # Only as many workouts per user as a cell shows are read.
+            return self.app_services.get_users_page(
+                *args, items_per_user=self.max_cell_lines, **kwargs
             )
 
-        print("\nUSERS\n")
-        print(table)
+        self._page_through(
+            "USERS", "users", field_names, fetch_page, user_row,
+        )
 
 # MENU OPTION 2: LIST WORKOUTS
 
     def list_workouts(self) -> None:
-        workouts: List[Workout] = self.app_services.get_all_workouts()
+        field_names = ["ID", "Title", "Description", "Exercises"]
 
-        if not workouts:
-            print("\nNo workouts found.\n")
-            return
+        def workout_row(w: Workout) -> list:
+            exercises_str = self._lines_cell(
+                f"- {ex.name}: {ex.instructions}" for ex in w.exercises
+            )
+            return [w.id, w.title, w.description, exercises_str]
 
-        table = PrettyTable()
-        table.field_names = ["ID", "Title", "Description", "Exercises"]
-        table.align = "l"
+        self._page_through(
+            "WORKOUTS", "workouts", field_names,
+            self.app_services.get_workouts_page, workout_row,
+        )
 
-        for w in workouts:
-            if getattr(w, "exercises", []):
-                exercises_str = "\n".join(
-                    f"- {ex.name}: {ex.instructions}"
-                    for ex in w.exercises
-                )
-            else:
-                exercises_str = "None"
-
-            table.add_row(
-                [
-                    w.id,
-                    w.title,
-                    w.description,
-                    exercises_str,
-                ]
+
+# PAGED TABLE RENDERING
+
+    def _page_through(self, heading: str, noun: str, field_names: list,
+                      fetch_page, make_row) -> None:
+        """Render one page at a time; only the visible page is fetched.
+
+        The matching total is counted once per filter, and each page seen
+        records the id the next one starts after, so paging forward, back
+        or to a visited page doesn't scan the rows before it.
+        """
+        page = 0
+        text_filter = ""
+        known_total = None
+        starts_after = {0: 0}
+
+        while True:
+            known = max(p for p in starts_after if p <= page)
+            items, total = fetch_page(
+                page - known, self.page_size, text_filter,
+                after_id=starts_after[known], total=known_total,
             )
+            # An empty page (or a failed call) is recounted next time.
+            known_total = total if items else None
+            if items:
+                starts_after[page + 1] = items[-1].id
+            page_count = max(1, -(-total // self.page_size))
+
+            if total == 0:
+                if text_filter:
+                    print(f"\nNo {noun} match '{text_filter}'.\n")
+                else:
+                    print(f"\nNo {noun} found.\n")
+                    return
+            elif page >= page_count:
+                page = page_count - 1
+                continue
+            else:
+                table = self._table()
+                table.field_names = field_names
+                table.align = "l"
+                for item in items:
+                    table.add_row([self._truncate(v) for v in make_row(item)])
+
+                print(f"\n{heading}\n")
+                print(table)
+
+            filter_note = f", filter '{text_filter}'" if text_filter else ""
+            print(f"Page {page + 1} of {page_count} "
+                  f"({total} {noun}{filter_note})")
+            command = input(
+                "[n]ext, [p]rev, [j] <page>, [f] <text> filter, "
+                "Enter to return: "
+            ).strip()
 
-        print("\nWORKOUTS\n")
-        print(table)
+            if not command:
+                return
+
+            action, _, argument = command.partition(" ")
+            match action.lower():
+                case "n":
+                    page = min(page + 1, page_count - 1)
+                case "p":
+                    page = max(page - 1, 0)
+                case "j":
+                    try:
+                        page = min(max(int(argument) - 1, 0), page_count - 1)
+                    except ValueError:
+                        print("Invalid page number.")
+                case "f":
+                    text_filter = argument.strip()
+                    page = 0
+                    known_total = None
+                    starts_after = {0: 0}
+                case _:
+                    print(f"Invalid command: {command}")
+
+    def _truncate(self, value) -> str:
+        """Clip each line of a cell to the configured column width."""
+        if value is None:
+            return ""
+        lines = str(value).split("\n")
+        width = self.max_cell_width
+        return "\n".join(
+            line if len(line) <= width else line[: width - 1] + "…"
+            for line in lines
+        )
+
+    def _lines_cell(self, lines, total: int = None) -> str:
+        """Join lines for a multi-line cell, capped at max_cell_lines.
+
+        total is the full line count when lines holds only the first few.
+        """
+        lines = list(lines)
+        total = len(lines) if total is None else total
+        if not lines:
+            return "None"
+        lines = lines[: self.max_cell_lines]
+        if total > len(lines):
+            lines.append(f"(+{total - len(lines)} more)")
+        return "\n".join(lines)
 
 
 # MENU OPTION 3: ADD USER
@@ -193,7 +288,7 @@ class UserInterface(ApplicationBase):
             return
 
         # Show users
-        user_table = PrettyTable()
+        user_table = self._table()
         user_table.field_names = ["ID", "First Name", "Last Name"]
         user_table.align = "l"
 
@@ -222,7 +317,7 @@ class UserInterface(ApplicationBase):
             print("No workouts available.")
             return
 
-        workout_table = PrettyTable()
+        workout_table = self._table()
         workout_table.field_names = ["ID", "Title"]
         workout_table.align = "l"
 
@@ -233,29 +328,38 @@ class UserInterface(ApplicationBase):
         print(workout_table)
         print()
 
-        ids_str = input(
+        workout_ids = self._read_workout_ids(
             "Enter workout ID(s) to favorite for this user (comma-separated): "
-        ).strip()
+        )
+        if not workout_ids:
+            return
 
+        outcomes = self.app_services.favorite_workouts(user_id, workout_ids)
+        if not outcomes:
+            print("\nFailed to favorite workouts. See logs for details.\n")
+            return
+        self._print_outcomes(outcomes, {
+            "exists": "already a favorite",
+            "not_found": "not found",
+        })
+        added = sum(1 for o in outcomes.values() if o == "added")
+        print(f"\n{added} workout(s) favorited for user {user_id}.\n")
+
+    def _print_outcomes(self, outcomes: dict, messages: dict) -> None:
+        for workout_id, outcome in outcomes.items():
+            if outcome in messages:
+                print(f"Workout ID {workout_id}: {messages[outcome]}. Skipped.")
+
+    def _read_workout_ids(self, prompt: str):
+        ids_str = input(prompt).strip()
         if not ids_str:
             print("No workouts selected.")
-            return
-
+            return None
         try:
-            workout_ids = [int(x.strip()) for x in ids_str.split(",") if x.strip()]
+            return [int(x.strip()) for x in ids_str.split(",") if x.strip()]
         except ValueError:
             print("Invalid workout ID list.")
-            return
-
-        success_count = 0
-        for wid in workout_ids:
-            if any(w.id == wid for w in workouts):
-                if self.app_services.favorite_workout(user_id, wid):
-                    success_count += 1
-            else:
-                print(f"Workout ID {wid} not found. Skipping.")
-
-        print(f"\n{success_count} workout(s) favorited for user {user_id}.\n")
+            return None
 
 
 # MENU OPTION 5: ADD WORKOUT (OPTION B: PICK EXISTING OR ADD NEW)
@@ -275,7 +379,7 @@ class UserInterface(ApplicationBase):
         existing_ids: list[int] = []
 
         if existing_exercises:
-            ex_table = PrettyTable()
+            ex_table = self._table()
             ex_table.field_names = ["ID", "Name", "Instructions"]
             ex_table.align = "l"
 
@@ -347,7 +451,7 @@ class UserInterface(ApplicationBase):
             return
 
     # Display users
-        table = PrettyTable()
+        table = self._table()
         table.field_names = ["ID", "First Name", "Last Name"]
         for u in users:
             table.add_row([u.id, u.first_name, u.last_name])
@@ -365,24 +469,70 @@ class UserInterface(ApplicationBase):
             print("No workouts found.")
             return
 
-        table = PrettyTable()
+        table = self._table()
         table.field_names = ["ID", "Title"]
         for w in workouts:
             table.add_row([w.id, w.title])
         print(table)
 
+        workout_ids = self._read_workout_ids(
+            "Enter Workout ID(s) (comma-separated): "
+        )
+        if not workout_ids:
+            return
+
+        outcomes = self.app_services.complete_workouts(user_id, workout_ids)
+        if not outcomes:
+            print("\nFailed to record completed workouts.\n")
+            return
+        self._print_outcomes(outcomes, {
+            "duplicate": "already recorded",
+            "not_found": "not found",
+        })
+        completed = sum(1 for o in outcomes.values() if o == "completed")
+        print(f"\n{completed} workout(s) marked as completed!\n")
+
+
+# MENU OPTION 7: UNFAVORITE WORKOUT(S) FOR A USER
+
+    def unfavorite_workouts_for_user(self) -> None:
+        print("\nUnfavorite Workout(s) for a User\n")
+
         try:
-            workout_id = int(input("Enter Workout ID: ").strip())
+            user_id = int(input("Enter the ID of the user: ").strip())
         except ValueError:
-            print("Invalid Workout ID.")
+            print("Invalid user ID.")
             return
 
-        success = self.app_services.complete_workout(user_id, workout_id)
+        favorites = json.loads(
+            self.app_services.get_user_favorites_as_json(user_id)
+        )
+        if not favorites:
+            print("This user has no favorite workouts.")
+            return
 
-        if success:
-            print("\nWorkout marked as completed!\n")
-        else:
-            print("\nFailed to record completed workout.\n")
+        table = self._table()
+        table.field_names = ["ID", "Title"]
+        table.align = "l"
+        for w in favorites:
+            table.add_row([w["id"], w["title"]])
+        print("\nFavorite Workouts:")
+        print(table)
+        print()
+
+        workout_ids = self._read_workout_ids(
+            "Enter workout ID(s) to unfavorite (comma-separated): "
+        )
+        if not workout_ids:
+            return
+
+        outcomes = self.app_services.unfavorite_workouts(user_id, workout_ids)
+        if not outcomes:
+            print("\nFailed to unfavorite workouts. See logs for details.\n")
+            return
+        self._print_outcomes(outcomes, {"not_favorite": "not a favorite"})
+        removed = sum(1 for o in outcomes.values() if o == "removed")
+        print(f"\n{removed} workout(s) unfavorited for user {user_id}.\n")
 
 
 
@@ -391,7 +541,16 @@ class UserInterface(ApplicationBase):
 
         while True:
             self.display_menu()
-            self.process_menu_choice()
+            try:
+                self.process_menu_choice()
+            except DatabaseUnavailableError as e:
+                self._logger.log_warning(f"Database unavailable: {e}")
+                print("The database is unavailable right now. "
+                      "Please try again shortly.")
+            except MemoryBudgetExceededError as e:
+                self._logger.log_warning(f"{e}")
+                print("That list is too large to load within the memory "
+                      "budget.")
 
     
 
@@ -0,0 +1,141 @@
+"""Defines the ActivityCalendar class."""
+
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, timedelta
+from typing import Callable, Iterable, Optional
+
+
+class ActivityCalendar:
+    """Per-user day bitsets of workout activity, for streaks and heatmaps.
+
+    Each cached user holds one int per year in which bit i is set if the
+    user completed a workout on day i of that year (0 = January 1).
+    Users are loaded on first use from their distinct completion dates,
+    kept in an LRU of max_users, reloaded after reload_seconds (to pick
+    up completions recorded by other processes) and updated in place by
+    record().
+
+    Streaks and weekly counts are computed with shifts, masks and
+    int.bit_count() over the bitsets instead of scanning completions.
+    """
+
+    def __init__(self, load_dates: Callable[[int], Iterable[date]],
+                 max_users: int = 100_000, reload_seconds: float = 300) -> None:
+        self._load_dates = load_dates
+        self.max_users = max_users
+        self.reload_seconds = reload_seconds
+        self._users: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def record(self, user_id: int, day: date) -> None:
+        """Mark day active for user_id if the user is cached."""
+        with self._lock:
+            entry = self._users.get(user_id)
+            if entry is not None:
+                years = entry[1]
+                years[day.year] = years.get(day.year, 0) | (
+                    1 << self._day_index(day)
+                )
+
+    def streaks(self, user_id: int, today: Optional[date] = None) -> dict:
+        """Return current and longest streaks of consecutive active days.
+
+        The current streak still counts when today has no activity yet but
+        yesterday did.
+        """
+        today = today or date.today()
+        years = self._years(user_id)
+        first_year = min(years, default=today.year)
+        first_day = date(first_year, 1, 1)
+
+        # All years as one bitset; bit i is first_day + i days.
+        bits = 0
+        for year, year_bits in years.items():
+            bits |= year_bits << (date(year, 1, 1) - first_day).days
+
+        end = (today - first_day).days
+        if not (bits >> end) & 1:
+            end -= 1
+        current = 0
+        if end >= 0 and (bits >> end) & 1:
+            # Distance from end down to the nearest inactive day.
+            gaps = ~bits & ((1 << (end + 1)) - 1)
+            current = end + 1 - gaps.bit_length()
+
+        # Each step shortens every run of ones by one; the number of steps
+        # until nothing is left is the longest run.
+        longest = 0
+        runs = bits
+        while runs:
+            runs &= runs >> 1
+            longest += 1
+
+        return {
+            "current": current,
+            "longest": longest,
+            "active_days": bits.bit_count(),
+            "last_active": (
+                (first_day + timedelta(days=bits.bit_length() - 1)).isoformat()
+                if bits else None
+            ),
+        }
+
+    def calendar(self, user_id: int, year: int) -> dict:
+        """Return a Monday-first weekly heatmap and counts for year.
+
+        weeks[k][d] is 1 or 0 for day d (Monday = 0) of week k, and None
+        for days of the first and last week that fall outside year.
+        """
+        year_bits = self._years(user_id).get(year, 0)
+        first_weekday = date(year, 1, 1).weekday()
+        days_in_year = (date(year + 1, 1, 1) - date(year, 1, 1)).days
+
+        # Shift so bit 0 is the Monday of the week containing January 1.
+        aligned = year_bits << first_weekday
+        week_count = -(-(days_in_year + first_weekday) // 7)
+
+        weeks = []
+        weekly_counts = []
+        for k in range(week_count):
+            week_bits = (aligned >> (7 * k)) & 0x7F
+            weekly_counts.append(week_bits.bit_count())
+            weeks.append([
+                (week_bits >> d) & 1
+                if 0 <= 7 * k + d - first_weekday < days_in_year else None
+                for d in range(7)
+            ])
+
+        return {
+            "year": year,
+            "active_days": year_bits.bit_count(),
+            "weekly_counts": weekly_counts,
+            "weeks": weeks,
+        }
+
+    def invalidate(self, user_id: int) -> None:
+        """Drop user_id so the next call reloads it."""
+        with self._lock:
+            self._users.pop(user_id, None)
+
+    def _years(self, user_id: int) -> dict:
+        with self._lock:
+            entry = self._users.get(user_id)
+            if entry is not None and time.monotonic() - entry[0] < self.reload_seconds:
+                self._users.move_to_end(user_id)
+                return dict(entry[1])
+
+        years: dict = {}
+        for day in self._load_dates(user_id):
+            years[day.year] = years.get(day.year, 0) | (1 << self._day_index(day))
+
+        with self._lock:
+            self._users[user_id] = (time.monotonic(), years)
+            self._users.move_to_end(user_id)
+            while len(self._users) > self.max_users:
+                self._users.popitem(last=False)
+            return dict(years)
+
+    def _day_index(self, day: date) -> int:
+        return day.timetuple().tm_yday - 1
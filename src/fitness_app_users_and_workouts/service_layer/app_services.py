@@ -2,21 +2,56 @@
 
 import json
 import inspect
-from typing import List
+import threading
+from datetime import date
+from typing import Iterator, List, Optional, Union
 
 from fitness_app_users_and_workouts.application_base import ApplicationBase
 from fitness_app_users_and_workouts.persistence_layer.mysql_persistence_wrapper import (
     MySQLPersistenceWrapper,
 )
+from fitness_app_users_and_workouts.persistence_layer.catalog_snapshot import (
+    CatalogSnapshot,
+)
+from fitness_app_users_and_workouts.persistence_layer.completion_write_behind import (
+    CompletionWriteBehind,
+)
+from fitness_app_users_and_workouts.persistence_layer.profile_rebuilder import (
+    ProfileRebuilder,
+)
+from fitness_app_users_and_workouts.persistence_layer.resilience import (
+    DatabaseUnavailableError,
+    UnsupportedOperationError,
+)
+from fitness_app_users_and_workouts.service_layer.activity_calendar import (
+    ActivityCalendar,
+)
+from fitness_app_users_and_workouts.service_layer.data_validator import DataValidator
+from fitness_app_users_and_workouts.service_layer.duplicate_filter import DuplicateFilter
+from fitness_app_users_and_workouts.service_layer.memory_accounting import (
+    MemoryAccountant,
+    MemoryBudgetExceededError,
+    accounted,
+)
+from fitness_app_users_and_workouts.service_layer.response_cache import ResponseCache
 from fitness_app_users_and_workouts.infrastructure_layer.user import User
 from fitness_app_users_and_workouts.infrastructure_layer.workout import Workout
 from fitness_app_users_and_workouts.infrastructure_layer.exercise import Exercise
 
 
 class AppServices(ApplicationBase):
-    """AppServices class for interacting with the Fitness App database."""
+    """AppServices class for interacting with the Fitness App database.
+
+    Methods return empty results or False when nothing matches or a query
+    fails, and raise DatabaseUnavailableError when MySQL can't be reached
+    (or the circuit breaker is open) so callers can report an outage.
+
+    With background=False (one-shot commands) the write-behind buffer,
+    catalog snapshot and profile rebuilder are not started: writes go
+    straight to MySQL and no threads outlive the command.
+    """
 
-    def __init__(self, config: dict, db) -> None:
+    def __init__(self, config: dict, db, background: bool = True) -> None:
         """Initializes object."""
         self._config_dict = config
         self.DB = db
@@ -25,10 +60,182 @@ class AppServices(ApplicationBase):
             subclass_name=self.__class__.__name__,
             logfile_prefix_name=self.META["log_prefix"],
         )
-        
 
+        # Optional tracemalloc accounting of each call (app_settings.json).
+        self._memory = MemoryAccountant(config)
+
+        # The database's data version, for ETags and the response cache.
+        # Kept in process and polled in the background, so a 304 costs no
+        # MySQL round trip. A change it sees may be a catalog write made
+        # by another process, which the catalog snapshot must pick up.
+        self._validator = DataValidator(config, db,
+                                        on_change=self._refresh_catalog)
+
+        # Per-thread count of calls that failed and returned an empty
+        # fallback, so callers can tell "[]" from an empty result.
+        self._failures = threading.local()
+
+        # Versioned cache of encoded *_as_json responses.
+        cache_config = config.get("cache", {})
+        self._response_cache = None
+        if cache_config.get("enabled", True):
+            self._response_cache = ResponseCache(
+                max_bytes=cache_config.get("max_bytes", 8 * 1024 * 1024)
+            )
+
+        # Optional write-behind buffer for completion events. Completions
+        # become visible to reads once flushed, so bump the version again then.
+        self._completion_buffer = None
+        write_behind = config.get("database", {}).get("write_behind", {})
+        if background and write_behind.get("enabled", False):
+            self._completion_buffer = CompletionWriteBehind(
+                config, db,
+                on_flush=self._data_changed,
+            )
+            self._completion_buffer.start()
+
+        # Completion idempotency: "day" derives a key from workout and date
+        # when the caller gives none; "none" only dedupes explicit keys.
+        completions_config = config.get("completions", {})
+        self._completion_dedupe_rule = completions_config.get("dedupe_rule", "none")
+        self._duplicate_filter = None
+        filter_config = completions_config.get("duplicate_filter", {})
+        if filter_config.get("enabled", False):
+            self._duplicate_filter = DuplicateFilter(
+                expected_keys=filter_config.get("expected_keys", 1_000_000),
+                false_positive_rate=filter_config.get("false_positive_rate", 0.01),
+                recent_keys=filter_config.get("recent_keys", 100_000),
+            )
+
+        # Day bitsets per user for streaks and activity calendars.
+        activity = config.get("activity", {})
+        self._activity = ActivityCalendar(
+            db.select_user_completion_dates,
+            max_users=activity.get("max_users", 100_000),
+            reload_seconds=activity.get("reload_seconds", 300),
+        )
+
+        # Optional on-disk catalog snapshot so catalog reads after startup
+        # don't wait on MySQL. When the catalog it serves changes, cached
+        # responses built from the old one are dropped.
+        self._catalog_snapshot = None
+        if background and config.get("catalog_snapshot", {}).get("enabled", False):
+            self._catalog_snapshot = CatalogSnapshot(
+                config, db,
+                on_change=self._catalog_changed,
+            )
+            self._catalog_snapshot.start()
+
+        # Background rebuild of missing or stale user profile documents.
+        self._profile_rebuilder = None
+        if background and config.get("profiles", {}).get("background_rebuild",
+                                                         False):
+            self._profile_rebuilder = ProfileRebuilder(config, db)
+            self._profile_rebuilder.start()
+
+        if background:
+            self._validator.start()
+
+
+# DATA VERSIONS
 
 
+    def _data_changed(self) -> None:
+        # After a local write: re-read the validator on the next request.
+        self._validator.invalidate()
+
+    def _catalog_changed(self) -> None:
+        # The catalog snapshot swapped what it serves without a database
+        # write, so the validator alone would not retire cached bodies.
+        self._validator.invalidate()
+        if self._response_cache is not None:
+            self._response_cache.clear()
+
+    def _refresh_catalog(self) -> None:
+        # Stop serving the snapshot until it is checked against the
+        # database; it is reused at once if the catalog is unchanged.
+        if self._catalog_snapshot is not None:
+            self._catalog_snapshot.invalidate()
+
+    def get_data_validator(self) -> Optional[tuple]:
+        """Return a validator that changes whenever the stored data does.
+
+        Derived from MySQL, so it also covers writes made by other
+        processes once the next poll sees them. None if it can't be read.
+        """
+        try:
+            return self._validator.get()
+        except DatabaseUnavailableError:
+            raise
+        except Exception as e:
+            self._logger.log_error(
+                f"{inspect.currentframe().f_code.co_name}: {e}"
+            )
+            return None
+
+    def get_failure_count(self) -> int:
+        """Return how many calls on this thread returned a failure fallback."""
+        return getattr(self._failures, "count", 0)
+
+    def _note_failure(self) -> None:
+        self._failures.count = self.get_failure_count() + 1
+
+    def get_cache_stats(self) -> dict:
+        """Return response cache statistics (empty if caching is disabled)."""
+        if self._response_cache is None:
+            return {}
+        return self._response_cache.stats()
+
+    def get_write_behind_metrics(self) -> dict:
+        """Return completion write-behind metrics (empty if disabled)."""
+        if self._completion_buffer is None:
+            return {}
+        return self._completion_buffer.metrics()
+
+    def get_resilience_stats(self) -> dict:
+        """Return database circuit breaker state and retry counters."""
+        return self.DB.get_resilience_stats()
+
+    def get_memory_stats(self) -> dict:
+        """Return per-method memory accounting (empty if disabled)."""
+        return self._memory.stats()
+
+    def close(self) -> None:
+        """Flush buffered writes before shutdown."""
+        if self._completion_buffer is not None:
+            self._completion_buffer.stop()
+        if self._profile_rebuilder is not None:
+            self._profile_rebuilder.stop()
+        self._validator.stop()
+
+    def _cached_json(self, key: tuple, build) -> str:
+        """Serve key from the response cache, building it on a miss.
+
+        Entries are keyed by the data validator the ETags use, so a write
+        from any process retires them once the validator shows it.
+        """
+        if self._response_cache is None:
+            return build()
+
+        # Read the validator before building so a concurrent write can only
+        # make the stored entry look stale, never make a stale entry look
+        # fresh.
+        validator = self.get_data_validator()
+        if validator is None:
+            return build()
+        payload = self._response_cache.get(key, validator)
+        if payload is not None:
+            return payload.decode("utf-8")
+
+        failures = self.get_failure_count()
+        result = build()
+        if self.get_failure_count() == failures:
+            self._response_cache.put(key, validator, result.encode("utf-8"))
+        return result
+
+
+
+    @accounted
     def get_all_users(self) -> List[User]:
         """Return all users with completed and favorite workouts populated."""
         self._logger.log_debug(
@@ -37,104 +244,271 @@ class AppServices(ApplicationBase):
         try:
             users = self.DB.select_all_users()
 
+            # One Workout per id, shared by every user's completions and
+            # favorites.
+            workouts: dict = {}
             for user in users:
-                user.completed_workouts = self.DB.select_user_completed(user.id)
-                user.favorite_workouts = self.DB.select_user_favorites(user.id)
+                user.completed_workouts = self.DB.select_user_completed(
+                    user.id, workouts
+                )
+                user.favorite_workouts = self.DB.select_user_favorites(
+                    user.id, workouts
+                )
+                self._memory.check_budget("get_all_users")
 
             return users
 
+        except (DatabaseUnavailableError, MemoryBudgetExceededError):
+            raise
         except Exception as e:
             self._logger.log_error(
                 f"{inspect.currentframe().f_code.co_name}: {e}"
             )
+            self._note_failure()
             return []
 
-    def get_all_users_as_json(self) -> str:
-        """Returns all users (with workouts) as JSON string."""
+    @accounted
+    def get_users_page(self, page: int, page_size: int,
+                       name_filter: str = "", after_id: int = 0,
+                       total: int = None, items_per_user: int = None) -> tuple:
+        """Return (users, total matching) for one page, 0-based.
+
+        Pages are counted from the first matching user after after_id.
+        total, if the caller already knows it, skips the count query.
+        Users carry completed/favorite workout titles but no exercises;
+        with items_per_user, at most that many of each, and the
+        *_workouts_total attributes hold the full counts.
+        """
         self._logger.log_debug(
             f"In {inspect.currentframe().f_code.co_name}()..."
         )
         try:
-            users = self.get_all_users()
-            return json.dumps([json.loads(u.to_json()) for u in users])
+            if total is None:
+                total = self.DB.count_users(name_filter)
+            users = self.DB.select_users_page(
+                page * page_size, page_size, name_filter, after_id
+            )
+
+            user_ids = [u.id for u in users]
+            workouts: dict = {}
+            completed_totals: dict = {}
+            favorite_totals: dict = {}
+            completed = self.DB.select_completed_for_users(
+                user_ids, workouts, items_per_user, completed_totals
+            )
+            favorites = self.DB.select_favorites_for_users(
+                user_ids, workouts, items_per_user, favorite_totals
+            )
+            for user in users:
+                user.completed_workouts = completed.get(user.id, [])
+                user.favorite_workouts = favorites.get(user.id, [])
+                if items_per_user is not None:
+                    user.completed_workouts_total = completed_totals.get(user.id, 0)
+                    user.favorite_workouts_total = favorite_totals.get(user.id, 0)
+
+            return users, total
+
+        except DatabaseUnavailableError:
+            raise
         except Exception as e:
             self._logger.log_error(
                 f"{inspect.currentframe().f_code.co_name}: {e}"
             )
+            self._note_failure()
+            return [], 0
+
+    @accounted
+    def get_all_users_as_json(self) -> Union[str, Iterator[str]]:
+        """Returns all users (with workouts) as JSON string.
+
+        Over the memory budget with the "stream" policy, returns an
+        iterator of JSON chunks instead, read from MySQL as it is consumed.
+        """
+        self._logger.log_debug(
+            f"In {inspect.currentframe().f_code.co_name}()..."
+        )
+        try:
+            try:
+                users = self.get_all_users()
+            except MemoryBudgetExceededError as e:
+                if self._memory.policy != "stream":
+                    raise
+                self._logger.log_warning(f"{e}; streaming users instead.")
+                return self._stream_users_as_json()
+            return json.dumps([u.to_dict() for u in users], default=str)
+        except (DatabaseUnavailableError, MemoryBudgetExceededError):
+            raise
+        except Exception as e:
+            self._logger.log_error(
+                f"{inspect.currentframe().f_code.co_name}: {e}"
+            )
+            self._note_failure()
             return "[]"
 
 
 
+    def _stream_users_as_json(self) -> Iterator[str]:
+        # Same output as get_all_users_as_json(), but each user's graph is
+        # hydrated, encoded and dropped before the next one is read.
+        workouts: dict = {}
+        separator = ""
+        yield "["
+        for row in self.DB.stream_users_page(0, self.NO_LIMIT):
+            user = User()
+            (user.id, user.first_name, user.middle_name, user.last_name,
+             user.birthday, user.gender) = row
+            user.completed_workouts = self.DB.select_user_completed(
+                user.id, workouts
+            )
+            user.favorite_workouts = self.DB.select_user_favorites(
+                user.id, workouts
+            )
+            yield separator + user.to_json()
+            separator = ", "
+        yield "]"
+
+    @accounted
     def get_all_workouts(self) -> List[Workout]:
         """Returns all workouts with exercises."""
         self._logger.log_debug(
             f"In {inspect.currentframe().f_code.co_name}()..."
         )
         try:
+            if self._catalog_snapshot is not None:
+                workouts = self._catalog_snapshot.get_workouts()
+                if workouts is not None:
+                    return workouts
+
             workouts = self.DB.select_all_workouts()
             return workouts
+        except DatabaseUnavailableError:
+            raise
         except Exception as e:
             self._logger.log_error(
                 f"{inspect.currentframe().f_code.co_name}: {e}"
             )
+            self._note_failure()
             return []
 
+    @accounted
+    def get_workouts_page(self, page: int, page_size: int,
+                          title_filter: str = "", after_id: int = 0,
+                          total: int = None) -> tuple:
+        """Return (workouts with exercises, total matching) for one page.
+
+        after_id and total work as in get_users_page().
+        """
+        self._logger.log_debug(
+            f"In {inspect.currentframe().f_code.co_name}()..."
+        )
+        try:
+            if total is None:
+                total = self.DB.count_workouts(title_filter)
+            workouts = self.DB.select_workouts_page(
+                page * page_size, page_size, title_filter, after_id
+            )
+            return workouts, total
+        except DatabaseUnavailableError:
+            raise
+        except Exception as e:
+            self._logger.log_error(
+                f"{inspect.currentframe().f_code.co_name}: {e}"
+            )
+            self._note_failure()
+            return [], 0
+
+    @accounted
     def get_all_workouts_as_json(self) -> str:
         """Returns all workouts as JSON string."""
         self._logger.log_debug(
             f"In {inspect.currentframe().f_code.co_name}()..."
         )
         try:
-            workouts = self.get_all_workouts()
-            return json.dumps([json.loads(w.to_json()) for w in workouts])
+            return self._cached_json(
+                ("get_all_workouts_as_json",),
+                lambda: json.dumps(
+                    [w.to_dict() for w in self.get_all_workouts()]
+                ),
+            )
+        except DatabaseUnavailableError:
+            raise
         except Exception as e:
             self._logger.log_error(
                 f"{inspect.currentframe().f_code.co_name}: {e}"
             )
+            self._note_failure()
             return "[]"
 
+    @accounted
     def get_workout_exercises_as_json(self, workout_id: int) -> str:
         """Returns all exercises for a workout in JSON format."""
         self._logger.log_debug(
             f"In {inspect.currentframe().f_code.co_name}()..."
         )
         try:
-            results = self.DB.select_workout_exercises(workout_id)
-            return json.dumps([json.loads(ex.to_json()) for ex in results])
+            return self._cached_json(
+                ("get_workout_exercises_as_json", workout_id),
+                lambda: json.dumps(
+                    [ex.to_dict()
+                     for ex in self.DB.select_workout_exercises(workout_id)]
+                ),
+            )
+        except DatabaseUnavailableError:
+            raise
         except Exception as e:
             self._logger.log_error(
                 f"{inspect.currentframe().f_code.co_name}: {e}"
             )
+            self._note_failure()
             return "[]"
 
+    @accounted
     def get_all_exercises(self) -> List[Exercise]:
         """Return all exercises."""
         self._logger.log_debug(
             f"In {inspect.currentframe().f_code.co_name}()..."
         )
         try:
+            if self._catalog_snapshot is not None:
+                exercises = self._catalog_snapshot.get_exercises()
+                if exercises is not None:
+                    return exercises
+
             return self.DB.select_all_exercises()
+        except DatabaseUnavailableError:
+            raise
         except Exception as e:
             self._logger.log_error(
                 f"{inspect.currentframe().f_code.co_name}: {e}"
             )
+            self._note_failure()
             return []
 
 
+    @accounted
     def get_user_favorites_as_json(self, user_id: int) -> str:
         """Returns user's favorite workouts as JSON."""
         self._logger.log_debug(
             f"In {inspect.currentframe().f_code.co_name}()..."
         )
         try:
-            results = self.DB.select_user_favorites(user_id)
-            return json.dumps([json.loads(w.to_json()) for w in results])
+            return self._cached_json(
+                ("get_user_favorites_as_json", user_id),
+                lambda: json.dumps(
+                    [w.to_dict()
+                     for w in self.DB.select_user_favorites(user_id)]
+                ),
+            )
+        except DatabaseUnavailableError:
+            raise
         except Exception as e:
             self._logger.log_error(
                 f"{inspect.currentframe().f_code.co_name}: {e}"
             )
+            self._note_failure()
             return "[]"
 
+    @accounted
     def get_user_completed_as_json(self, user_id: int) -> str:
         """Returns completed workouts for a user as JSON."""
         self._logger.log_debug(
@@ -142,15 +516,205 @@ class AppServices(ApplicationBase):
         )
         try:
             results = self.DB.select_user_completed(user_id)
-            return json.dumps([json.loads(w.to_json()) for w in results])
+            return json.dumps([c.to_dict() for c in results])
+        except DatabaseUnavailableError:
+            raise
         except Exception as e:
             self._logger.log_error(
                 f"{inspect.currentframe().f_code.co_name}: {e}"
             )
+            self._note_failure()
             return "[]"
 
 
+    @accounted
+    def get_user_profile_as_json(self, user_id: int) -> str:
+        """Returns the user's materialized profile document.
+
+        The document holds the user with completed and favorite workouts
+        and their exercises. A missing or stale one is rebuilt first.
+        """
+        self._logger.log_debug(
+            f"In {inspect.currentframe().f_code.co_name}()..."
+        )
+        try:
+            document = self.DB.select_user_profile(user_id)
+            if document is None:
+                document = self.DB.rebuild_user_profile(user_id)
+            return document if document is not None else "{}"
+        except DatabaseUnavailableError:
+            raise
+        except Exception as e:
+            self._logger.log_error(
+                f"{inspect.currentframe().f_code.co_name}: {e}"
+            )
+            self._note_failure()
+            return "{}"
+
+    @accounted
+    def get_user_streaks(self, user_id: int) -> dict:
+        """Return the user's current and longest workout streaks in days."""
+        self._logger.log_debug(
+            f"In {inspect.currentframe().f_code.co_name}()..."
+        )
+        try:
+            return self._activity.streaks(user_id, self.DB.server_today())
+        except DatabaseUnavailableError:
+            raise
+        except Exception as e:
+            self._logger.log_error(
+                f"{inspect.currentframe().f_code.co_name}: {e}"
+            )
+            self._note_failure()
+            return {}
+
+    @accounted
+    def get_user_calendar(self, user_id: int, year: int = None) -> dict:
+        """Return the user's activity heatmap and weekly counts for a year."""
+        self._logger.log_debug(
+            f"In {inspect.currentframe().f_code.co_name}()..."
+        )
+        try:
+            return self._activity.calendar(
+                user_id, year or self.DB.server_today().year
+            )
+        except DatabaseUnavailableError:
+            raise
+        except Exception as e:
+            self._logger.log_error(
+                f"{inspect.currentframe().f_code.co_name}: {e}"
+            )
+            self._note_failure()
+            return {}
+
+
+# STREAMING READS
+
+
+    # No LIMIT given: MySQL's documented "all rows" value.
+    NO_LIMIT = 18446744073709551615
+
+    def iter_users(self, after_id: int = 0, limit: int = None) -> Iterator[dict]:
+        """Yield users (without workouts) with id > after_id, by id."""
+        columns = ["id", "first_name", "middle_name", "last_name",
+                   "birthday", "gender"]
+        for row in self.DB.stream_users_page(after_id, limit or self.NO_LIMIT):
+            yield dict(zip(columns, row))
+
+    def iter_workouts(self, after_id: int = 0, limit: int = None) -> Iterator[dict]:
+        """Yield workouts (without exercises) with id > after_id, by id."""
+        columns = ["id", "title", "description"]
+        for row in self.DB.stream_workouts_page(after_id, limit or self.NO_LIMIT):
+            yield dict(zip(columns, row))
+
+    def iter_user_history(self, user_id: int, since: str = "0001-01-01",
+                          limit: int = None) -> Iterator[dict]:
+        """Yield a user's completions dated on or after since, oldest first."""
+        columns = ["completion_id", "workout_id", "title", "date_completed"]
+        for row in self.DB.stream_user_history(
+            user_id, since, limit or self.NO_LIMIT
+        ):
+            record = dict(zip(columns, row))
+            record["date_completed"] = str(record["date_completed"])
+            yield record
+
+
+# DELTA SYNC
+
+
+    @accounted
+    def get_changes_since(self, version: int = 0, limit: int = None) -> dict:
+        """Return entities and links inserted after change-log version.
+
+        The result's "version" is the cursor for the next call and
+        "has_more" says whether another page is already waiting. Inserts
+        and removed favorites are logged; rows are returned as they are now.
+        Raises UnsupportedOperationError in sharded mode, where versions
+        are per shard.
+        """
+        self._logger.log_debug(
+            f"In {inspect.currentframe().f_code.co_name}()..."
+        )
+        if not hasattr(self.DB, "select_changes_since"):
+            raise UnsupportedOperationError(
+                "Delta sync is not supported in sharded mode"
+            )
+        delta_sync = self._config_dict.get("delta_sync", {})
+        max_limit = delta_sync.get("max_limit", 1000)
+        limit = max(1, min(limit or max_limit, max_limit))
+        changes = {
+            "version": version, "has_more": False,
+            "users": [], "workouts": [], "exercises": [],
+            "workout_exercises": [], "favorites": [], "unfavorites": [],
+            "completions": [],
+        }
+        try:
+            # Log and entity rows must come from the same server.
+            with self.DB.primary_reads():
+                rows = self.DB.select_changes_since(version, limit + 1)
+                changes["has_more"] = len(rows) > limit
+                rows = rows[:limit]
+                if not rows:
+                    return changes
+                changes["version"] = rows[-1][0]
+
+                keys: dict = {}
+                for _, entity, key1, key2 in rows:
+                    keys.setdefault(entity, []).append((key1, key2))
+
+                def ids(entity: str) -> List[int]:
+                    return [key1 for key1, _ in keys.get(entity, [])]
+
+                # Bare rows: links arrive as their own changes.
+                changes["users"] = [
+                    {"id": u.id, "first_name": u.first_name,
+                     "middle_name": u.middle_name, "last_name": u.last_name,
+                     "birthday": str(u.birthday), "gender": u.gender}
+                    for u in self.DB.select_users_by_ids(ids("user"))
+                ]
+                changes["workouts"] = [
+                    {"id": w.id, "title": w.title, "description": w.description}
+                    for w in self.DB.select_workouts_by_ids(ids("workout"))
+                ]
+                changes["exercises"] = [
+                    ex.to_dict()
+                    for ex in self.DB.select_exercises_by_ids(ids("exercise"))
+                ]
+                changes["workout_exercises"] = [
+                    {"workout_id": w, "exercise_id": e}
+                    for w, e in keys.get("workout_exercise", [])
+                ]
+                changes["favorites"] = [
+                    {"user_id": u, "workout_id": w}
+                    for u, w in keys.get("favorite", [])
+                ]
+                changes["unfavorites"] = [
+                    {"user_id": u, "workout_id": w}
+                    for u, w in keys.get("unfavorite", [])
+                ]
+                changes["completions"] = [
+                    {"id": row[0], "user_id": row[1], "workout_id": row[2],
+                     "date_completed": str(row[3])}
+                    for row in self.DB.select_completions_by_ids(ids("completion"))
+                ]
+            return changes
+        except DatabaseUnavailableError:
+            raise
+        except Exception as e:
+            self._logger.log_error(
+                f"{inspect.currentframe().f_code.co_name}: {e}"
+            )
+            self._note_failure()
+            return changes
+
+    def get_changes_since_as_json(self, version: int = 0,
+                                  limit: int = None) -> str:
+        """Returns get_changes_since() as JSON."""
+        return json.dumps(self.get_changes_since(version, limit), default=str)
 
+
+
+    @accounted
     def add_user(
         self,
         first_name: str,
@@ -172,13 +736,21 @@ class AppServices(ApplicationBase):
             user.gender = gender
 
             user_id = self.DB.insert_user(user)
-            return user_id is not None
+            if user_id is None:
+                return False
+
+            self._data_changed()
+            return True
+        except DatabaseUnavailableError:
+            raise
         except Exception as e:
             self._logger.log_error(
                 f"{inspect.currentframe().f_code.co_name}: {e}"
             )
+            self._note_failure()
             return False
 
+    @accounted
     def add_workout(
         self,
         title: str,
@@ -195,56 +767,224 @@ class AppServices(ApplicationBase):
             workout.title = title
             workout.description = description
 
-            workout_id = self.DB.insert_workout(workout)
-            if workout_id is None:
-                return False
-
-            # Link existing exercises
-            for ex_id in existing_exercise_ids:
-                self.DB.link_workout_exercise(workout_id, ex_id)
-
-            # Insert and link new exercises
-            for ex_data in new_exercises_data:
-                ex = Exercise()
-                ex.name = ex_data.get("name", "")
-                ex.instructions = ex_data.get("instructions", "")
-                ex_id = self.DB.insert_exercise(ex)
-                if ex_id is not None:
-                    self.DB.link_workout_exercise(workout_id, ex_id)
-
+            # One transaction: the workout, any new exercises (resolved by
+            # name, reusing existing rows) and every link, or nothing.
+            with self.DB.session() as uow:
+                uow.add_workout(workout)
+                for ex_id in dict.fromkeys(existing_exercise_ids):
+                    uow.link_workout_exercise(workout, ex_id)
+                for ex_data in new_exercises_data:
+                    ex = Exercise()
+                    ex.name = ex_data.get("name", "")
+                    ex.instructions = ex_data.get("instructions", "")
+                    uow.link_workout_exercise(workout, uow.add_exercise(ex))
+
+            self._data_changed()
+            if self._catalog_snapshot is not None:
+                self._catalog_snapshot.invalidate()
             return True
 
+        except DatabaseUnavailableError:
+            raise
         except Exception as e:
             self._logger.log_error(
                 f"{inspect.currentframe().f_code.co_name}: {e}"
             )
+            self._note_failure()
             return False
 
+    @accounted
     def favorite_workout(self, user_id: int, workout_id: int) -> bool:
         """Mark a workout as favorite for a given user."""
         self._logger.log_debug(
             f"In {inspect.currentframe().f_code.co_name}()..."
         )
         try:
-            return self.DB.insert_user_favorite_workout(user_id, workout_id)
+            success = self.DB.insert_user_favorite_workout(user_id, workout_id)
+            if success:
+                self._data_changed()
+            return success
+        except DatabaseUnavailableError:
+            raise
         except Exception as e:
             self._logger.log_error(
                 f"{inspect.currentframe().f_code.co_name}: {e}"
             )
+            self._note_failure()
             return False
 
-    def complete_workout(self, user_id: int, workout_id: int) -> bool:
-        """Record that a user completed a workout."""
+    @accounted
+    def complete_workout(self, user_id: int, workout_id: int,
+                         idempotency_key: str = None) -> bool:
+        """Record that a user completed a workout.
+
+        Retries with the same idempotency key (or, under the "day" rule,
+        the same workout on the same day) record a single completion and
+        still report success.
+        """
         self._logger.log_debug(
             f"In {inspect.currentframe().f_code.co_name}(): "
             f"Marking workout {workout_id} completed for user {user_id}"
         )
         try:
-            return self.DB.insert_user_completed_workout(user_id, workout_id)
+            # The server's date, which CURDATE() gives the inserted row.
+            day = self.DB.server_today()
+            key = self._completion_key(workout_id, idempotency_key, day)
+            filter_key = f"{user_id}:{key}" if key is not None else None
+
+            verdict = "new"
+            if self._duplicate_filter is not None and filter_key is not None:
+                verdict = self._duplicate_filter.check(filter_key)
+                if verdict == "duplicate":
+                    self._logger.log_debug(
+                        f"Duplicate completion {filter_key} rejected in memory."
+                    )
+                    return True
+
+            if self._completion_buffer is not None:
+                success = self._completion_buffer.append(user_id, workout_id, key)
+                inserted = success
+            else:
+                inserted = self.DB.insert_user_completed_workout_once(
+                    user_id, workout_id, key
+                )
+                success = inserted is not None
+
+            if success and self._duplicate_filter is not None \
+                    and filter_key is not None:
+                self._duplicate_filter.record(filter_key, verdict, bool(inserted))
+            if inserted:
+                self._data_changed()
+                self._activity.record(user_id, day)
+            return success
+        except DatabaseUnavailableError:
+            raise
         except Exception as e:
             self._logger.log_error(
                 f"{inspect.currentframe().f_code.co_name}: {e}"
             )
+            self._note_failure()
             return False
 
+    @accounted
+    def favorite_workouts(self, user_id: int, workout_ids: List[int]) -> dict:
+        """Favorite many workouts in one statement.
+
+        Returns {workout_id: "added" | "exists" | "not_found"}; empty if
+        the user does not exist or the write failed.
+        """
+        self._logger.log_debug(
+            f"In {inspect.currentframe().f_code.co_name}()..."
+        )
+        try:
+            outcomes = self.DB.insert_user_favorite_workouts(user_id, workout_ids)
+            if "added" in outcomes.values():
+                self._data_changed()
+            return outcomes
+        except DatabaseUnavailableError:
+            raise
+        except Exception as e:
+            self._logger.log_error(
+                f"{inspect.currentframe().f_code.co_name}: {e}"
+            )
+            self._note_failure()
+            return {}
+
+    @accounted
+    def unfavorite_workouts(self, user_id: int, workout_ids: List[int]) -> dict:
+        """Remove many favorites in one statement.
+
+        Returns {workout_id: "removed" | "not_favorite"}; empty if the user
+        does not exist or the write failed.
+        """
+        self._logger.log_debug(
+            f"In {inspect.currentframe().f_code.co_name}()..."
+        )
+        try:
+            outcomes = self.DB.delete_user_favorite_workouts(user_id, workout_ids)
+            if "removed" in outcomes.values():
+                self._data_changed()
+            return outcomes
+        except DatabaseUnavailableError:
+            raise
+        except Exception as e:
+            self._logger.log_error(
+                f"{inspect.currentframe().f_code.co_name}: {e}"
+            )
+            self._note_failure()
+            return {}
+
+    @accounted
+    def complete_workouts(self, user_id: int, workout_ids: List[int],
+                          date_completed: date = None) -> dict:
+        """Record completions of many workouts in one statement.
+
+        Returns {workout_id: "completed" | "duplicate" | "not_found"};
+        empty if the user does not exist or the write failed. Duplicates
+        follow the same rules as complete_workout(). Bypasses the
+        completion write-behind buffer.
+        """
+        self._logger.log_debug(
+            f"In {inspect.currentframe().f_code.co_name}(): "
+            f"Marking {len(workout_ids)} workout(s) completed for user {user_id}"
+        )
+        try:
+            # Dated explicitly, so the row, its dedupe key and the calendar
+            # agree even if the server's date changes mid-call.
+            day = date_completed or self.DB.server_today()
+            outcomes: dict = {}
+            verdicts: dict = {}
+            keys: dict = {}
+            for workout_id in dict.fromkeys(workout_ids):
+                key = self._completion_key(workout_id, day=day)
+                keys[workout_id] = key
+                if self._duplicate_filter is not None and key is not None:
+                    verdicts[workout_id] = self._duplicate_filter.check(
+                        f"{user_id}:{key}"
+                    )
+                    if verdicts[workout_id] == "duplicate":
+                        outcomes[workout_id] = "duplicate"
+
+            pending = [w for w in keys if w not in outcomes]
+            written = self.DB.insert_user_completed_workouts_for_user(
+                user_id, pending, day, [keys[w] for w in pending]
+            ) if pending else {}
+            if pending and not written:
+                return {}
+            outcomes.update(written)
+
+            for workout_id, outcome in written.items():
+                if workout_id in verdicts and outcome != "not_found":
+                    self._duplicate_filter.record(
+                        f"{user_id}:{keys[workout_id]}", verdicts[workout_id],
+                        outcome == "completed",
+                    )
+            if "completed" in written.values():
+                self._data_changed()
+                self._activity.record(user_id, day)
+            return {w: outcomes[w] for w in keys}
+        except DatabaseUnavailableError:
+            raise
+        except Exception as e:
+            self._logger.log_error(
+                f"{inspect.currentframe().f_code.co_name}: {e}"
+            )
+            self._note_failure()
+            return {}
+
+    def get_duplicate_filter_stats(self) -> dict:
+        """Return completion duplicate filter statistics (empty if disabled)."""
+        if self._duplicate_filter is None:
+            return {}
+        return self._duplicate_filter.stats()
+
+    def _completion_key(self, workout_id: int, idempotency_key: str = None,
+                        day: date = None):
+        if idempotency_key:
+            return str(idempotency_key)[:64]
+        if self._completion_dedupe_rule == "day":
+            day = day or self.DB.server_today()
+            return f"w{workout_id}:{day.isoformat()}"
+        return None
+
 
@@ -0,0 +1,269 @@
+"""Implements the CompletionAnalytics class."""
+
+import inspect
+import json
+import os
+from datetime import date
+from typing import Iterator, List
+
+import numpy as np
+
+from fitness_app_users_and_workouts.application_base import ApplicationBase
+
+
+class CompletionAnalytics(ApplicationBase):
+    """Columnar snapshot of completion history for vectorized analytics.
+
+    Each column is a memory-mapped .npy file under snapshot_dir. Files are
+    allocated with spare capacity and meta.json records how many rows are
+    valid, so refresh() appends new rows without rewriting existing data.
+
+    New completions are found by change-log version, not completion id:
+    write-behind flushes and concurrent writers can commit a lower id
+    after a higher one, which an id cursor would skip for good. Versions
+    become visible in commit order (see MySQLPersistenceWrapper), and each
+    completion is logged once.
+    """
+
+    # Column name -> dtype. User attributes are denormalized onto each row.
+    COLUMNS = {
+        "completion_id": np.int64,
+        "user_id": np.int32,
+        "workout_id": np.int32,
+        "date_completed": "datetime64[D]",
+        "birthday": "datetime64[D]",
+        "gender": np.uint8,
+    }
+
+    # Gender codes stored in the gender column.
+    GENDER_CODES = {"F": 1, "M": 2}
+    GENDER_OTHER = 3
+    GENDER_UNKNOWN = 0
+    GENDER_LABELS = {0: "unknown", 1: "F", 2: "M", 3: "other"}
+
+    def __init__(self, config: dict, db) -> None:
+        """Initializes analytics snapshot."""
+        self._config_dict = config
+        self.DB = db
+        self.META = config["meta"]
+        self.ANALYTICS = config.get("analytics", {})
+        super().__init__(
+            subclass_name=self.__class__.__name__,
+            logfile_prefix_name=self.META["log_prefix"],
+        )
+
+        self.snapshot_dir = self.ANALYTICS.get("snapshot_dir", "data/analytics")
+        self.chunk_rows = self.ANALYTICS.get("chunk_rows", 65536)
+        self._meta_path = os.path.join(self.snapshot_dir, "meta.json")
+
+
+# SNAPSHOT MAINTENANCE
+
+    def refresh(self) -> int:
+        """Append completions newer than the snapshot. Returns rows added."""
+        self._logger.log_debug(
+            f"In {inspect.currentframe().f_code.co_name}()..."
+        )
+        os.makedirs(self.snapshot_dir, exist_ok=True)
+        meta = self._read_meta()
+
+        added = 0
+        for chunk in self._chunks(
+            self.DB.stream_completion_changes_with_users(meta["last_version"])
+        ):
+            self._append(meta, self._rows_to_columns([r[1:] for r in chunk]))
+            added += len(chunk)
+            meta["last_version"] = int(chunk[-1][0])
+            self._write_meta(meta)
+
+        self._logger.log_info(
+            f"Analytics snapshot refreshed: {added} new row(s), "
+            f"{meta['rows']} total."
+        )
+        return added
+
+    def load(self) -> dict:
+        """Return the snapshot columns as read-only memory-mapped arrays."""
+        meta = self._read_meta()
+        columns = {}
+        for name in self.COLUMNS:
+            path = self._column_path(name)
+            if meta["rows"] == 0 or not os.path.exists(path):
+                columns[name] = np.empty(0, dtype=self.COLUMNS[name])
+            else:
+                columns[name] = np.load(path, mmap_mode="r")[: meta["rows"]]
+        return columns
+
+
+# AGGREGATES
+
+    def weekly_completions_per_user(self) -> dict:
+        """Count completions per (user, ISO week starting Monday)."""
+        c = self.load()
+        # datetime64[W] weeks start on Thursday (1970-01-01); shifting by four
+        # days makes them start on Monday.
+        week_start = ((c["date_completed"] - np.timedelta64(4, "D"))
+                      .astype("datetime64[W]").astype("datetime64[D]")
+                      + np.timedelta64(4, "D"))
+        keys, counts = self._group_count(c["user_id"], week_start)
+        return {"user_id": keys[0], "week_start": keys[1], "completions": counts}
+
+    def cohort_retention(self) -> dict:
+        """Share of each cohort active N months after its first completion.
+
+        Users have no signup timestamp, so the cohort is the month of a
+        user's first completion.
+        """
+        c = self.load()
+        user_ids = c["user_id"]
+        months = c["date_completed"].astype("datetime64[M]").astype(np.int64)
+        if len(user_ids) == 0:
+            empty = np.empty(0, dtype=np.int64)
+            return {"cohort_month": empty.astype("datetime64[M]"),
+                    "month_offset": empty, "active_users": empty,
+                    "cohort_size": empty, "retention": empty.astype(float)}
+
+        uniq_users, user_index = np.unique(user_ids, return_inverse=True)
+        first_month = np.full(len(uniq_users), np.iinfo(np.int64).max)
+        np.minimum.at(first_month, user_index, months)
+
+        cohort = first_month[user_index]
+        offset = months - cohort
+
+        # Distinct (user, cohort, offset), then count users per (cohort, offset).
+        (_, cohort_u, offset_u), _ = self._group_count(user_ids, cohort, offset)
+        (cohort_k, offset_k), active = self._group_count(cohort_u, offset_u)
+
+        cohort_months, cohort_sizes = np.unique(first_month, return_counts=True)
+        size = cohort_sizes[np.searchsorted(cohort_months, cohort_k)]
+
+        return {
+            "cohort_month": cohort_k.astype("datetime64[M]"),
+            "month_offset": offset_k,
+            "active_users": active,
+            "cohort_size": size,
+            "retention": active / size,
+        }
+
+    def completions_by_age_band_and_gender(self, band_years: int = 10) -> dict:
+        """Count completions by age band at completion time and gender."""
+        c = self.load()
+        known = ~np.isnat(c["birthday"])
+        days = (c["date_completed"][known] - c["birthday"][known]).astype(np.int64)
+        band_start = (days // 365.2425 // band_years * band_years).astype(np.int64)
+        (band_k, gender_k), counts = self._group_count(
+            band_start, c["gender"][known]
+        )
+        return {
+            "age_band_start": band_k,
+            "age_band_end": band_k + band_years - 1,
+            "gender": np.array([self.GENDER_LABELS[int(g)] for g in gender_k]),
+            "completions": counts,
+        }
+
+    def _group_count(self, *keys: np.ndarray) -> tuple:
+        """Vectorized GROUP BY keys COUNT(*). Returns (key arrays, counts)."""
+        if len(keys[0]) == 0:
+            return tuple(k[:0] for k in keys), np.empty(0, dtype=np.int64)
+        order = np.lexsort(keys[::-1])
+        sorted_keys = [k[order] for k in keys]
+        boundary = np.zeros(len(order), dtype=bool)
+        boundary[0] = True
+        for k in sorted_keys:
+            boundary[1:] |= k[1:] != k[:-1]
+        starts = np.flatnonzero(boundary)
+        counts = np.diff(np.append(starts, len(order)))
+        return tuple(k[starts] for k in sorted_keys), counts
+
+
+# PRIVATE METHODS
+
+    def _chunks(self, rows: Iterator[tuple]) -> Iterator[List[tuple]]:
+        chunk: List[tuple] = []
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) >= self.chunk_rows:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    def _rows_to_columns(self, rows: List[tuple]) -> dict:
+        return {
+            "completion_id": np.fromiter((r[0] for r in rows), np.int64, len(rows)),
+            "user_id": np.fromiter((r[1] for r in rows), np.int32, len(rows)),
+            "workout_id": np.fromiter((r[2] for r in rows), np.int32, len(rows)),
+            "date_completed": np.array([str(r[3]) for r in rows],
+                                       dtype="datetime64[D]"),
+            "birthday": np.array([self._parse_date(r[4]) for r in rows],
+                                 dtype="datetime64[D]"),
+            "gender": np.fromiter((self._gender_code(r[5]) for r in rows),
+                                  np.uint8, len(rows)),
+        }
+
+    def _parse_date(self, value) -> str:
+        # users.birthday is free-form VARCHAR; unparseable values become NaT.
+        try:
+            return date.fromisoformat(str(value).strip()).isoformat()
+        except (TypeError, ValueError):
+            return "NaT"
+
+    def _gender_code(self, value) -> int:
+        if not value:
+            return self.GENDER_UNKNOWN
+        return self.GENDER_CODES.get(str(value).upper(), self.GENDER_OTHER)
+
+    def _append(self, meta: dict, columns: dict) -> None:
+        rows, capacity = meta["rows"], meta["capacity"]
+        needed = rows + len(columns["completion_id"])
+        new_capacity = capacity
+        if needed > capacity:
+            new_capacity = max(needed, capacity * 2, 1024)
+
+        for name, values in columns.items():
+            path = self._column_path(name)
+            if new_capacity != capacity:
+                self._grow_column(name, path, rows, new_capacity)
+            array = np.lib.format.open_memmap(path, mode="r+")
+            array[rows:needed] = values
+            array.flush()
+            del array
+
+        meta["rows"] = needed
+        meta["capacity"] = new_capacity
+
+    def _grow_column(self, name: str, path: str, rows: int, capacity: int) -> None:
+        tmp_path = f"{path}.tmp"
+        grown = np.lib.format.open_memmap(
+            tmp_path, mode="w+", dtype=self.COLUMNS[name], shape=(capacity,)
+        )
+        if rows and os.path.exists(path):
+            grown[:rows] = np.load(path, mmap_mode="r")[:rows]
+        grown.flush()
+        del grown
+        os.replace(tmp_path, path)
+
+    def _column_path(self, name: str) -> str:
+        return os.path.join(self.snapshot_dir, f"{name}.npy")
+
+    def _read_meta(self) -> dict:
+        try:
+            with open(self._meta_path, "r") as f:
+                meta = json.loads(f.read())
+        except FileNotFoundError:
+            return {"rows": 0, "capacity": 0, "last_version": 0}
+        if "last_version" not in meta:
+            # Built by completion id, so it may miss rows; start over and
+            # reuse the column files.
+            self._logger.log_warning(
+                "Analytics snapshot predates change-log refreshes; rebuilding."
+            )
+            meta = {"rows": 0, "capacity": meta.get("capacity", 0),
+                    "last_version": 0}
+        return meta
+
+    def _write_meta(self, meta: dict) -> None:
+        tmp_path = f"{self._meta_path}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(json.dumps(meta))
+        os.replace(tmp_path, self._meta_path)
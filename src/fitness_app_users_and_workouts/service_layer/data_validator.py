@@ -0,0 +1,144 @@
+"""Defines the DataValidator class."""
+
+import inspect
+import threading
+import time
+from typing import Callable, Optional
+
+from fitness_app_users_and_workouts.application_base import ApplicationBase
+from fitness_app_users_and_workouts.persistence_layer.resilience import (
+    DatabaseUnavailableError,
+)
+
+
+class DataValidator(ApplicationBase):
+    """In-process copy of the database's data version, shared by all threads.
+
+    ETags and cached responses are keyed by this value. Reading it from
+    MySQL on every request would cost a round trip even for a 304, so a
+    background thread re-reads it every refresh_seconds and get() returns
+    the copy. Writes made by other processes are picked up within one
+    interval. invalidate() makes the next get() read it again, so a
+    process never serves its own write under the old value. Without the
+    thread (one-shot commands), get() re-reads the value once it is older
+    than refresh_seconds.
+
+    on_change is called from the thread whenever the value it reads
+    differs from the one before.
+    """
+
+    def __init__(self, config: dict, db,
+                 on_change: Optional[Callable[[], None]] = None) -> None:
+        """Initializes data validator."""
+        self._config_dict = config
+        self.META = config["meta"]
+        self.CACHE = config.get("cache", {})
+        self.DB = db
+        self._on_change = on_change
+
+        super().__init__(
+            subclass_name=self.__class__.__name__,
+            logfile_prefix_name=self.META["log_prefix"],
+        )
+
+        self.refresh_seconds = self.CACHE.get("validator_refresh_ms", 1000) / 1000
+        self._lock = threading.Lock()
+        self._read_lock = threading.Lock()
+        self._value = None
+        self._read_at = 0.0
+        # Bumped by invalidate(); a read that started before a bump is
+        # not stored, since it may predate the write.
+        self._generation = 0
+        self._wakeup = threading.Event()
+        self._stopping = False
+        self._thread = None
+
+
+# LIFECYCLE
+
+    def start(self) -> None:
+        """Start the background refresh thread."""
+        self._thread = threading.Thread(
+            target=self._run, name="data-validator", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the refresh thread."""
+        if self._stopping:
+            return
+        self._stopping = True
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join()
+
+
+# PUBLIC METHODS
+
+    def get(self) -> Optional[tuple]:
+        """Return the current validator, or None if it can't be read."""
+        with self._lock:
+            value = self._value
+            fresh = self._thread is not None or \
+                time.monotonic() - self._read_at < self.refresh_seconds
+        if value is not None and fresh:
+            return value
+        return self._read()
+
+    def invalidate(self) -> None:
+        """Forget the value after a local write; the next get() reads it."""
+        with self._lock:
+            self._generation += 1
+            self._value = None
+
+
+# PRIVATE METHODS
+
+    def _read(self) -> Optional[tuple]:
+        # One read at a time; threads that waited reuse its result.
+        with self._read_lock:
+            with self._lock:
+                generation = self._generation
+                if self._value is not None and \
+                        time.monotonic() - self._read_at < self.refresh_seconds:
+                    return self._value
+            try:
+                value = self.DB.select_data_version()
+            except DatabaseUnavailableError:
+                raise
+            except Exception as e:
+                self._logger.log_error(
+                    f"{inspect.currentframe().f_code.co_name}: {e}"
+                )
+                return None
+
+            with self._lock:
+                if generation == self._generation:
+                    self._value = value
+                    self._read_at = time.monotonic()
+            return value
+
+    def _run(self) -> None:
+        previous = None
+        while not self._stopping:
+            try:
+                with self._lock:
+                    # Let a poll through even if a request read it just now.
+                    self._read_at = 0.0
+                value = self._read()
+                if value is not None and previous is not None \
+                        and value != previous and self._on_change is not None:
+                    self._on_change()
+                if value is not None:
+                    previous = value
+            except DatabaseUnavailableError as e:
+                with self._lock:
+                    self._value = None
+                self._logger.log_warning(
+                    f"{inspect.currentframe().f_code.co_name}: {e}"
+                )
+            except Exception as e:
+                self._logger.log_error(
+                    f"{inspect.currentframe().f_code.co_name}: {e}"
+                )
+            self._wakeup.wait(self.refresh_seconds)
@@ -0,0 +1,126 @@
+"""Defines the DuplicateFilter class."""
+
+import hashlib
+import math
+import sys
+import threading
+from collections import OrderedDict
+
+
+class DuplicateFilter:
+    """Bloom filter plus exact recent-key cache for completion keys.
+
+    check() returns:
+        "new"       the Bloom filter has never seen the key, so it is not
+                    a duplicate of anything recorded since the last reset
+        "duplicate" the key is in the exact recent-key cache
+        "unknown"   the Bloom filter matched but the key is no longer (or
+                    never was) cached; the database decides
+
+    Only exact cache hits are rejected, so a Bloom false positive costs a
+    database round trip, never a lost completion. The filter is cleared
+    once it holds expected_keys keys to keep its false-positive rate bounded.
+    """
+
+    def __init__(self, expected_keys: int = 1_000_000,
+                 false_positive_rate: float = 0.01,
+                 recent_keys: int = 100_000) -> None:
+        self.expected_keys = expected_keys
+        self.target_false_positive_rate = false_positive_rate
+        self.recent_keys = recent_keys
+
+        # Standard Bloom filter sizing for n keys at false-positive rate p.
+        self._bits = max(8, int(-expected_keys * math.log(false_positive_rate)
+                                / (math.log(2) ** 2)))
+        self._hashes = max(1, round(self._bits / expected_keys * math.log(2)))
+        self._array = bytearray((self._bits + 7) // 8)
+        self._count = 0
+
+        self._recent: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+        self._checks = 0
+        self._rejected = 0
+        self._unknown = 0
+        self._unknown_new = 0
+        self._resets = 0
+
+    def check(self, key: str) -> str:
+        with self._lock:
+            self._checks += 1
+            if key in self._recent:
+                self._recent.move_to_end(key)
+                self._rejected += 1
+                return "duplicate"
+            if not self._might_contain(key):
+                return "new"
+            self._unknown += 1
+            return "unknown"
+
+    def record(self, key: str, verdict: str = "new",
+               was_new: bool = True) -> None:
+        """Remember key after it was written (or found) in the database.
+
+        For "unknown" verdicts, was_new tells whether the database actually
+        inserted the row, which measures the observed false-positive rate.
+        """
+        with self._lock:
+            if verdict == "unknown" and was_new:
+                self._unknown_new += 1
+
+            if self._count >= self.expected_keys:
+                self._array = bytearray(len(self._array))
+                self._count = 0
+                self._resets += 1
+            if not self._might_contain(key):
+                for position in self._positions(key):
+                    self._array[position >> 3] |= 1 << (position & 7)
+                self._count += 1
+
+            self._recent[key] = True
+            self._recent.move_to_end(key)
+            while len(self._recent) > self.recent_keys:
+                self._recent.popitem(last=False)
+
+    def stats(self) -> dict:
+        """Return rejection counts, false-positive rates and memory use."""
+        with self._lock:
+            fill = self._count
+            # Checked keys that turned out not to be duplicates.
+            truly_new = (self._checks - self._rejected
+                         - (self._unknown - self._unknown_new))
+            estimated_fp = (1 - math.exp(-self._hashes * fill / self._bits)) \
+                ** self._hashes
+            # Rough per-entry cost of the OrderedDict cache: the key string
+            # plus dict and linked-list overhead.
+            sample = next(iter(self._recent), "")
+            cache_bytes = len(self._recent) * (sys.getsizeof(sample) + 100)
+            return {
+                "checks": self._checks,
+                "rejected_duplicates": self._rejected,
+                "bloom_positives_not_cached": self._unknown,
+                "bloom_false_positives_observed": self._unknown_new,
+                "observed_false_positive_rate":
+                    (self._unknown_new / truly_new) if truly_new else 0.0,
+                "estimated_false_positive_rate": estimated_fp,
+                "target_false_positive_rate": self.target_false_positive_rate,
+                "bloom_keys": fill,
+                "bloom_bits": self._bits,
+                "bloom_hashes": self._hashes,
+                "bloom_bytes": len(self._array),
+                "bloom_resets": self._resets,
+                "recent_keys": len(self._recent),
+                "recent_cache_bytes_estimate": cache_bytes,
+            }
+
+    def _positions(self, key: str):
+        # Kirsch-Mitzenmacher double hashing from one 128-bit digest.
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self._bits for i in range(self._hashes)]
+
+    def _might_contain(self, key: str) -> bool:
+        return all(
+            self._array[p >> 3] & (1 << (p & 7)) for p in self._positions(key)
+        )
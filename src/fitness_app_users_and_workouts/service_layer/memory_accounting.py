@@ -0,0 +1,196 @@
+"""Defines the MemoryAccountant class."""
+
+import functools
+import sys
+import threading
+import tracemalloc
+
+from fitness_app_users_and_workouts.application_base import ApplicationBase
+from fitness_app_users_and_workouts.infrastructure_layer.user import User
+from fitness_app_users_and_workouts.infrastructure_layer.workout import Workout
+from fitness_app_users_and_workouts.infrastructure_layer.completion import Completion
+from fitness_app_users_and_workouts.infrastructure_layer.exercise import Exercise
+
+
+class MemoryBudgetExceededError(Exception):
+    """A call's traced allocations went over the configured memory budget."""
+
+    def __init__(self, method: str, used: int, budget: int) -> None:
+        super().__init__(
+            f"{method} used {used / 2**20:.1f} MiB, "
+            f"over the {budget / 2**20:.1f} MiB budget"
+        )
+        self.method = method
+        self.used = used
+        self.budget = budget
+
+
+class MemoryAccountant(ApplicationBase):
+    """tracemalloc-based memory accounting for AppServices calls.
+
+    Enabled by "memory_accounting" in app_settings.json. tracemalloc's
+    peak counter is process-wide, so calls are sampled: an outermost
+    @accounted call starting while no other one is measured records the
+    peak and retained traced bytes and the footprint of its result broken
+    down by entity type. Calls overlapping it run unmeasured (counted as
+    "unsampled") instead of waiting for it.
+
+    check_budget() raises MemoryBudgetExceededError once traced memory has
+    grown by more than budget_mb since the current call started; every
+    call is checked, sampled or not. Concurrent calls' allocations count
+    too, so the check errs on the strict side. on_budget_exceeded is
+    "abort" (the error reaches the caller) or "stream" (callers with a
+    streaming path, such as get_all_users_as_json, fall back to it).
+    """
+
+    ENTITY_TYPES = (User, Completion, Workout, Exercise)
+    SCALAR_TYPES = (str, bytes, int, float, bool, type(None))
+
+    def __init__(self, config: dict) -> None:
+        """Initializes memory accountant."""
+        self._config_dict = config
+        self.META = config["meta"]
+
+        super().__init__(
+            subclass_name=self.__class__.__name__,
+            logfile_prefix_name=self.META["log_prefix"],
+        )
+
+        settings = self._settings.get("memory_accounting", {})
+        self.enabled = settings.get("enabled", False)
+        self.budget_bytes = int(settings.get("budget_mb", 0) * 2**20)
+        self.policy = settings.get("on_budget_exceeded", "abort")
+
+        # Held by the sampled call; _stats_lock guards the statistics.
+        self._lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._local = threading.local()
+        self._stats: dict = {}
+
+        if self.enabled and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._logger.log_info("Memory accounting enabled (tracemalloc).")
+
+    def measure(self, method: str, fn, *args, **kwargs):
+        """Call fn and account its memory under method."""
+        if not self.enabled or getattr(self._local, "baseline", None) is not None:
+            return fn(*args, **kwargs)
+
+        sampled = self._lock.acquire(blocking=False)
+        baseline = tracemalloc.get_traced_memory()[0]
+        if sampled:
+            tracemalloc.reset_peak()
+        self._local.baseline = baseline
+        self._local.exceeded = False
+        result = None
+        try:
+            result = fn(*args, **kwargs)
+            return result
+        finally:
+            self._local.baseline = None
+            current, peak = tracemalloc.get_traced_memory()
+            if sampled:
+                self._lock.release()
+                # Counted even when the caller fell back to streaming.
+                self._record(method, peak - baseline, current - baseline,
+                             self._footprint(result), self._local.exceeded)
+            else:
+                self._record_unsampled(method, self._local.exceeded)
+
+    def check_budget(self, method: str) -> None:
+        """Raise MemoryBudgetExceededError if the current call is over budget."""
+        baseline = getattr(self._local, "baseline", None)
+        if not self.budget_bytes or baseline is None:
+            return
+        used = tracemalloc.get_traced_memory()[0] - baseline
+        if used > self.budget_bytes:
+            self._local.exceeded = True
+            raise MemoryBudgetExceededError(method, used, self.budget_bytes)
+
+    def stats(self) -> dict:
+        """Return per-method memory statistics."""
+        with self._stats_lock:
+            return {method: dict(entry) for method, entry in self._stats.items()}
+
+    def _entry(self, method: str) -> dict:
+        return self._stats.setdefault(method, {
+            "calls": 0, "unsampled": 0, "budget_exceeded": 0,
+            "max_peak_bytes": 0,
+        })
+
+    def _record(self, method: str, peak: int, retained: int, footprint: dict,
+                exceeded: bool) -> None:
+        with self._stats_lock:
+            entry = self._entry(method)
+            entry["calls"] += 1
+            entry["budget_exceeded"] += exceeded
+            entry["last_peak_bytes"] = peak
+            entry["max_peak_bytes"] = max(entry["max_peak_bytes"], peak)
+            entry["last_retained_bytes"] = retained
+            entry["entities"] = footprint
+        self._logger.log_info(
+            f"{method}: peak {peak / 1024:.1f} KiB, retained "
+            f"{retained / 1024:.1f} KiB, entities {footprint}"
+        )
+
+    def _record_unsampled(self, method: str, exceeded: bool) -> None:
+        with self._stats_lock:
+            entry = self._entry(method)
+            entry["calls"] += 1
+            entry["unsampled"] += 1
+            entry["budget_exceeded"] += exceeded
+
+    def _footprint(self, result) -> dict:
+        """Attribute the result's object graph to entity types.
+
+        Each entity is charged for itself, its __dict__, its scalar
+        attributes and the lists it owns. Shared objects are charged once.
+        Containers outside any entity go to "containers".
+        """
+        totals: dict = {}
+        seen = set()
+        stack = [(result, "containers")]
+
+        while stack:
+            obj, owner = stack.pop()
+            if id(obj) in seen:
+                continue
+            seen.add(id(obj))
+
+            if isinstance(obj, self.ENTITY_TYPES):
+                owner = type(obj).__name__
+                totals.setdefault(owner, {"count": 0, "bytes": 0})["count"] += 1
+                if hasattr(obj, "__dict__"):
+                    size = sys.getsizeof(obj) + sys.getsizeof(obj.__dict__)
+                    children = obj.__dict__.values()
+                else:
+                    size = sys.getsizeof(obj)
+                    children = [getattr(obj, a) for a in obj.__slots__]
+            elif isinstance(obj, (list, tuple, set)):
+                size = sys.getsizeof(obj)
+                children = obj
+            elif isinstance(obj, dict):
+                size = sys.getsizeof(obj)
+                children = list(obj.keys()) + list(obj.values())
+            elif isinstance(obj, self.SCALAR_TYPES):
+                size = sys.getsizeof(obj)
+                children = ()
+            else:
+                continue
+
+            totals.setdefault(owner, {"count": 0, "bytes": 0})["bytes"] += size
+            stack.extend((child, owner) for child in children)
+
+        for entry in totals.values():
+            if entry["count"]:
+                entry["bytes_per_instance"] = entry["bytes"] // entry["count"]
+        return totals
+
+
+def accounted(method):
+    """Decorate an AppServices method to run under self._memory.measure()."""
+    @functools.wraps(method)
+    def call(self, *args, **kwargs):
+        return self._memory.measure(method.__name__, method, self,
+                                    *args, **kwargs)
+    return call
@@ -0,0 +1,84 @@
+"""Defines the ResponseCache class."""
+
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+
+class ResponseCache:
+    """Size-capped LRU cache of encoded JSON responses.
+
+    Each entry is stored with the versions (the data validator) it was
+    built under. A lookup only hits when those versions are still current,
+    so an entry is dropped on first use after the data changes.
+    """
+
+    def __init__(self, max_bytes: int = 8 * 1024 * 1024) -> None:
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._invalidations = 0
+
+    def get(self, key: tuple, versions: tuple) -> Optional[bytes]:
+        """Return the cached bytes for key if built from versions."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._misses += 1
+                return None
+
+            entry_versions, payload = entry
+            if entry_versions != versions:
+                self._remove(key)
+                self._invalidations += 1
+                self._misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return payload
+
+    def put(self, key: tuple, versions: tuple, payload: bytes) -> None:
+        """Store payload for key, evicting least recently used entries."""
+        if len(payload) > self.max_bytes:
+            return
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+            self._entries[key] = (versions, payload)
+            self._bytes += len(payload)
+
+            while self._bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self._evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        """Return hit/miss counters and memory use."""
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+                "invalidations": self._invalidations,
+                "hit_ratio": (self._hits / lookups) if lookups else 0.0,
+            }
+
+    def _remove(self, key: tuple) -> None:
+        _, payload = self._entries.pop(key)
+        self._bytes -= len(payload)
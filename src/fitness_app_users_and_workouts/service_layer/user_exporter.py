@@ -0,0 +1,185 @@
+"""Implements the UserExporter class."""
+
+import csv
+import gzip
+import inspect
+import json
+import os
+import time
+from typing import Iterator
+
+from fitness_app_users_and_workouts.application_base import ApplicationBase
+
+
+class UserExporter(ApplicationBase):
+    """Streams users, their history and the workout catalog to gzip files.
+
+    Users are exported in pages ordered by id. After each page the output
+    files are flushed and their sizes recorded in a state file together
+    with the last exported user id. Resuming truncates the files back to the
+    recorded sizes and continues after that id, so an interrupted export
+    never leaves duplicate or partial rows behind.
+    """
+
+    # Output files and their columns, in raw row order.
+    COLUMNS = {
+        "users": ["id", "first_name", "middle_name", "last_name",
+                  "birthday", "gender"],
+        "completions": ["id", "user_id", "workout_id", "date_completed"],
+        "favorites": ["user_id", "workout_id"],
+        "workouts": ["id", "title", "description"],
+        "exercises": ["id", "name", "instructions"],
+        "workout_exercises": ["workout_id", "exercise_id"],
+    }
+
+    CATALOG_TABLES = ["workouts", "exercises", "workout_exercises"]
+
+    def __init__(self, config: dict, db) -> None:
+        """Initializes exporter."""
+        self._config_dict = config
+        self.DB = db
+        self.META = config["meta"]
+        super().__init__(
+            subclass_name=self.__class__.__name__,
+            logfile_prefix_name=self.META["log_prefix"],
+        )
+
+    def export(self, output_dir: str, fmt: str = "jsonl",
+               page_size: int = 1000, resume: bool = False) -> dict:
+        """Export everything to output_dir. Returns row counts and rate."""
+        self._logger.log_debug(
+            f"In {inspect.currentframe().f_code.co_name}()..."
+        )
+        if fmt not in ("jsonl", "csv"):
+            raise ValueError(f"Unsupported export format: {fmt}")
+
+        os.makedirs(output_dir, exist_ok=True)
+        state_path = os.path.join(output_dir, "export_state.json")
+        state = self._load_state(state_path) if resume else None
+        if state is None or state.get("format") != fmt:
+            state = {"format": fmt, "last_user_id": 0, "catalog_done": False,
+                     "file_sizes": {}}
+            for name in self.COLUMNS:
+                path = self._file_path(output_dir, name, fmt)
+                if os.path.exists(path):
+                    os.remove(path)
+        else:
+            self._truncate_to_state(output_dir, fmt, state)
+
+        counts = {name: 0 for name in self.COLUMNS}
+        started = time.perf_counter()
+
+        if not state["catalog_done"]:
+            for table in self.CATALOG_TABLES:
+                counts[table] += self._write_rows(
+                    output_dir, fmt, table, self.DB.stream_catalog(table)
+                )
+            state["catalog_done"] = True
+            self._save_state(state_path, output_dir, fmt, state)
+
+        while True:
+            after_id = state["last_user_id"]
+            last_id = after_id
+            page_rows = 0
+
+            def users_page() -> Iterator[tuple]:
+                nonlocal last_id, page_rows
+                for row in self.DB.stream_users_page(after_id, page_size):
+                    last_id = row[0]
+                    page_rows += 1
+                    yield row
+
+            counts["users"] += self._write_rows(
+                output_dir, fmt, "users", users_page()
+            )
+            if page_rows == 0:
+                break
+
+            counts["completions"] += self._write_rows(
+                output_dir, fmt, "completions",
+                self.DB.stream_completions_for_user_range(after_id, last_id),
+            )
+            counts["favorites"] += self._write_rows(
+                output_dir, fmt, "favorites",
+                self.DB.stream_favorites_for_user_range(after_id, last_id),
+            )
+
+            state["last_user_id"] = last_id
+            self._save_state(state_path, output_dir, fmt, state)
+
+            elapsed = time.perf_counter() - started
+            total = sum(counts.values())
+            self._logger.log_info(
+                f"Exported through user {last_id}: {total} rows, "
+                f"{total / elapsed if elapsed else 0:.0f} rows/sec"
+            )
+
+        elapsed = time.perf_counter() - started
+        total = sum(counts.values())
+        summary = {
+            "rows": counts,
+            "total_rows": total,
+            "seconds": elapsed,
+            "rows_per_second": total / elapsed if elapsed else 0.0,
+            "last_user_id": state["last_user_id"],
+        }
+        self._logger.log_info(f"Export finished: {summary}")
+        return summary
+
+    def _write_rows(self, output_dir: str, fmt: str, name: str,
+                    rows: Iterator[tuple]) -> int:
+        # Each call appends one gzip member; concatenated members form a
+        # valid gzip stream.
+        path = self._file_path(output_dir, name, fmt)
+        write_header = fmt == "csv" and not os.path.exists(path)
+        count = 0
+
+        with gzip.open(path, "at", encoding="utf-8", newline="") as f:
+            if fmt == "csv":
+                writer = csv.writer(f)
+                if write_header:
+                    writer.writerow(self.COLUMNS[name])
+                for row in rows:
+                    writer.writerow(["" if v is None else str(v) for v in row])
+                    count += 1
+            else:
+                columns = self.COLUMNS[name]
+                for row in rows:
+                    f.write(json.dumps(dict(zip(columns, row)), default=str))
+                    f.write("\n")
+                    count += 1
+        return count
+
+    def _file_path(self, output_dir: str, name: str, fmt: str) -> str:
+        return os.path.join(output_dir, f"{name}.{fmt}.gz")
+
+    def _load_state(self, state_path: str):
+        try:
+            with open(state_path, "r") as f:
+                return json.loads(f.read())
+        except FileNotFoundError:
+            return None
+
+    def _save_state(self, state_path: str, output_dir: str, fmt: str,
+                    state: dict) -> None:
+        state["file_sizes"] = {
+            name: os.path.getsize(self._file_path(output_dir, name, fmt))
+            for name in self.COLUMNS
+            if os.path.exists(self._file_path(output_dir, name, fmt))
+        }
+        tmp_path = f"{state_path}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(json.dumps(state))
+        os.replace(tmp_path, state_path)
+
+    def _truncate_to_state(self, output_dir: str, fmt: str, state: dict) -> None:
+        for name in self.COLUMNS:
+            path = self._file_path(output_dir, name, fmt)
+            if not os.path.exists(path):
+                continue
+            size = state["file_sizes"].get(name, 0)
+            if size == 0:
+                os.remove(path)
+            else:
+                with open(path, "r+b") as f:
+                    f.truncate(size)
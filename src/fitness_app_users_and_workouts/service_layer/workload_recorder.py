@@ -0,0 +1,115 @@
+"""Defines the WorkloadRecorder class."""
+
+import inspect
+import json
+import os
+import threading
+import time
+import types
+
+from fitness_app_users_and_workouts.application_base import ApplicationBase
+
+
+class WorkloadRecorder(ApplicationBase):
+    """Stands in for AppServices and logs every call to a JSONL trace.
+
+    Each line holds the call's offset from the start of recording, the
+    method, its arguments, the elapsed milliseconds and whether it
+    succeeded. Generator results (iter_*) are timed until exhausted. The
+    trace is the input of WorkloadReplayer.
+    """
+
+    # Bookkeeping calls that front ends make on every request.
+    NOT_RECORDED = {
+        "close", "get_data_validator", "get_cache_stats",
+        "get_write_behind_metrics", "get_duplicate_filter_stats",
+        "get_resilience_stats",
+    }
+
+    def __init__(self, config: dict, app_services, path: str = None) -> None:
+        """Initializes recorder around app_services."""
+        self._config_dict = config
+        self.META = config["meta"]
+        self.WORKLOAD = config.get("workload", {})
+        self._app_services = app_services
+
+        super().__init__(
+            subclass_name=self.__class__.__name__,
+            logfile_prefix_name=self.META["log_prefix"],
+        )
+
+        self.path = path or self.WORKLOAD.get("trace_path", "data/workload.jsonl")
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._trace = open(self.path, "a", encoding="utf-8")
+        self._lock = threading.Lock()
+        self._started = time.monotonic()
+        self._recorded = 0
+        self._logger.log_info(f"Recording workload to {self.path}")
+
+    def __getattr__(self, name: str):
+        attribute = getattr(self._app_services, name)
+        if name.startswith("_") or name in self.NOT_RECORDED \
+                or not callable(attribute):
+            return attribute
+
+        def recorded(*args, **kwargs):
+            offset = time.monotonic() - self._started
+            started = time.perf_counter()
+            try:
+                result = attribute(*args, **kwargs)
+            except Exception as e:
+                self._write(name, args, kwargs, offset, started, e)
+                raise
+            if isinstance(result, types.GeneratorType):
+                return self._timed_generator(name, args, kwargs, offset,
+                                             started, result)
+            self._write(name, args, kwargs, offset, started,
+                        None if result is not False else "returned False")
+            return result
+
+        return recorded
+
+    def close(self) -> None:
+        """Close the underlying services and the trace file."""
+        self._app_services.close()
+        with self._lock:
+            if not self._trace.closed:
+                self._trace.close()
+        self._logger.log_info(f"Recorded {self._recorded} call(s) to {self.path}")
+
+    def _timed_generator(self, name, args, kwargs, offset, started, generator):
+        error = None
+        try:
+            yield from generator
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            self._write(name, args, kwargs, offset, started, error)
+
+    def _write(self, name: str, args: tuple, kwargs: dict, offset: float,
+               started: float, error) -> None:
+        record = {
+            "t": round(offset, 6),
+            "method": name,
+            "args": list(args),
+            "kwargs": kwargs,
+            "ms": round((time.perf_counter() - started) * 1000, 3),
+            "ok": error is None,
+        }
+        if error is not None:
+            record["error"] = (type(error).__name__
+                               if isinstance(error, Exception) else str(error))
+        try:
+            line = json.dumps(record, default=str) + "\n"
+            with self._lock:
+                if not self._trace.closed:
+                    self._trace.write(line)
+                    self._trace.flush()
+                    self._recorded += 1
+        except Exception as e:
+            self._logger.log_error(
+                f"{inspect.currentframe().f_code.co_name}: {e}"
+            )
@@ -0,0 +1,178 @@
+"""Defines the WorkloadReplayer class."""
+
+import json
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
+from fitness_app_users_and_workouts.application_base import ApplicationBase
+
+
+class WorkloadReplayer(ApplicationBase):
+    """Replays a WorkloadRecorder trace against an AppServices instance.
+
+    Calls are issued open-loop: each is scheduled at a fixed time (the
+    target rate, or the recorded offsets scaled by speed) and handed to a
+    pool of worker threads, so a slow backend builds a queue instead of
+    quietly lowering the offered load. Latency is measured from the
+    scheduled time, which includes that queueing; service time is
+    reported separately.
+    """
+
+    # Calls that change data; skipped with read_only.
+    WRITE_METHODS = {
+        "add_user", "add_workout", "favorite_workout", "complete_workout",
+        "favorite_workouts", "unfavorite_workouts", "complete_workouts",
+    }
+
+    def __init__(self, config: dict, app_services) -> None:
+        """Initializes replayer."""
+        self._config_dict = config
+        self.META = config["meta"]
+        self.app_services = app_services
+
+        super().__init__(
+            subclass_name=self.__class__.__name__,
+            logfile_prefix_name=self.META["log_prefix"],
+        )
+
+    def load_trace(self, path: str, read_only: bool = False) -> List[dict]:
+        """Read a trace, dropping writes if read_only."""
+        calls = []
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                record = json.loads(line)
+                if read_only and record["method"] in self.WRITE_METHODS:
+                    continue
+                calls.append(record)
+        calls.sort(key=lambda r: r.get("t", 0))
+        return calls
+
+    def replay(self, calls: List[dict], rate: float = None, workers: int = 8,
+               speed: float = 1.0, duration: float = None) -> dict:
+        """Drive calls at rate per second (or recorded pacing / speed).
+
+        With duration, the trace is looped until that many seconds of
+        calls have been scheduled. Returns the overall and per-method report.
+        """
+        if not calls:
+            return self._report({}, 0.0)
+
+        schedule = self._schedule(calls, rate, speed, duration)
+        samples = {}
+        samples_lock = threading.Lock()
+
+        def run(call: dict, scheduled: float) -> None:
+            started = time.perf_counter()
+            error = None
+            try:
+                result = getattr(self.app_services, call["method"])(
+                    *call.get("args", []), **call.get("kwargs", {})
+                )
+                if hasattr(result, "__next__"):
+                    for _ in result:
+                        pass
+                elif result is False:
+                    error = "returned False"
+            except Exception as e:
+                error = type(e).__name__
+            finished = time.perf_counter()
+            with samples_lock:
+                entry = samples.setdefault(
+                    call["method"], {"latency": [], "service": [], "errors": {}}
+                )
+                entry["latency"].append(finished - scheduled)
+                entry["service"].append(finished - started)
+                if error is not None:
+                    entry["errors"][error] = entry["errors"].get(error, 0) + 1
+
+        self._logger.log_info(
+            f"Replaying {len(schedule)} call(s) with {workers} worker(s)..."
+        )
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for offset, call in schedule:
+                scheduled = started + offset
+                delay = scheduled - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                executor.submit(run, call, scheduled)
+        elapsed = time.perf_counter() - started
+
+        report = self._report(samples, elapsed)
+        self._logger.log_info(f"Replay finished: {report['overall']}")
+        return report
+
+    def _schedule(self, calls: List[dict], rate: float, speed: float,
+                  duration: float) -> List[tuple]:
+        if rate:
+            offsets = [i / rate for i in range(len(calls))]
+            span = len(calls) / rate
+        else:
+            base = calls[0].get("t", 0)
+            offsets = [(c.get("t", 0) - base) / speed for c in calls]
+            # Leave the mean gap between the end of one loop and the next.
+            span = offsets[-1] + (offsets[-1] / max(1, len(calls) - 1))
+
+        schedule = list(zip(offsets, calls))
+        if duration and span > 0:
+            schedule = []
+            loop = 0
+            while loop * span < duration:
+                schedule.extend(
+                    (loop * span + offset, call)
+                    for offset, call in zip(offsets, calls)
+                    if loop * span + offset < duration
+                )
+                loop += 1
+        return schedule
+
+    def _report(self, samples: dict, elapsed: float) -> dict:
+        methods = {}
+        all_latency: List[float] = []
+        total_calls = 0
+        total_errors = 0
+        for method, entry in sorted(samples.items()):
+            count = len(entry["latency"])
+            errors = sum(entry["errors"].values())
+            methods[method] = self._summary(entry["latency"], entry["service"],
+                                            count, errors, elapsed)
+            methods[method]["error_types"] = entry["errors"]
+            all_latency.extend(entry["latency"])
+            total_calls += count
+            total_errors += errors
+
+        all_service = [s for e in samples.values() for s in e["service"]]
+        return {
+            "overall": self._summary(all_latency, all_service, total_calls,
+                                     total_errors, elapsed),
+            "methods": methods,
+            "seconds": elapsed,
+        }
+
+    def _summary(self, latency: List[float], service: List[float],
+                 count: int, errors: int, elapsed: float) -> dict:
+        latency = sorted(latency)
+        service = sorted(service)
+        return {
+            "calls": count,
+            "throughput_per_second": count / elapsed if elapsed else 0.0,
+            "error_rate": errors / count if count else 0.0,
+            "p50_ms": self._percentile(latency, 50) * 1000,
+            "p95_ms": self._percentile(latency, 95) * 1000,
+            "p99_ms": self._percentile(latency, 99) * 1000,
+            "service_p50_ms": self._percentile(service, 50) * 1000,
+            "service_p99_ms": self._percentile(service, 99) * 1000,
+        }
+
+    def _percentile(self, ordered: List[float], pct: float) -> float:
+        # Nearest-rank percentile of an already sorted list.
+        if not ordered:
+            return 0.0
+        rank = max(1, math.ceil(pct / 100 * len(ordered)))
+        return ordered[rank - 1]
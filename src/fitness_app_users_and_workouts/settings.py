@@ -27,6 +27,11 @@ class Settings():
                 settings['log_to_console'] = True
                 settings['log_to_file'] = True
                 settings['deployed_to_production'] = False
+                settings['memory_accounting'] = {
+                    'enabled': False,
+                    'budget_mb': 512,
+                    'on_budget_exceeded': 'stream',
+                }
                 
             case _:
                 settings['logs_dir'] = 'logs'
@@ -34,7 +39,12 @@ class Settings():
                 settings['log_level'] = 'debug'
                 settings['log_to_console'] = True
                 settings['log_to_file'] = True
-                settings['deployed_to_production'] = False    
+                settings['deployed_to_production'] = False
+                settings['memory_accounting'] = {
+                    'enabled': False,
+                    'budget_mb': 512,
+                    'on_budget_exceeded': 'stream',
+                }    
         try:
             with open(filename, 'w') as f:
                 f.write(json.dumps(settings))
@@ -3,11 +3,19 @@ sys.path.insert(0, "src")
 
 
 import json
-from argparse import ArgumentParser
-from fitness_app_users_and_workouts.persistence_layer.mysql_persistence_wrapper import MySQLPersistenceWrapper
-from fitness_app_users_and_workouts.service_layer.app_services \
-    import AppServices
-from fitness_app_users_and_workouts.presentation_layer.user_interface import UserInterface
+import os
+import statistics
+import subprocess
+import time
+from argparse import SUPPRESS, ArgumentParser, ArgumentTypeError
+from datetime import date
+from fitness_app_users_and_workouts.persistence_layer.resilience import (
+    DatabaseUnavailableError,
+    PersistenceError,
+)
+
+# Layers, the MySQL driver and prettytable are imported where they are
+# first needed, so the menu isn't held up by modules it doesn't use yet.
 
 
 def main():
@@ -17,62 +25,565 @@ def main():
     with open(args.configfile, 'r') as f:
         config = json.loads(f.read())
 
-    db = MySQLPersistenceWrapper(config)
-    service_layer = AppServices(config, db)
-    ui = UserInterface(config, service_layer)
+    if args.command == 'import':
+        from fitness_app_users_and_workouts.persistence_layer.bulk_loader \
+            import BulkLoader
+        try:
+            summary = BulkLoader(config).load(
+                args.table, args.file, workers=args.workers,
+                relax_checks=args.relax_checks
+            )
+        except Exception as e:
+            # A rejected batch stops its shard; rerunning resumes after the
+            # last committed batch once the input is fixed.
+            print(f"Import failed: {e}", file=sys.stderr)
+            return 1
+        print(f"Loaded {summary['rows']} {args.table} rows with "
+              f"{summary['workers']} workers in {summary['seconds']:.1f}s "
+              f"({summary['rows_per_second']:.0f} rows/sec)")
+        return 0
+
+    if args.command == 'startup-time':
+        return measure_startup_time(args)
+
+    if args.command == 'check-plans':
+        return check_query_plans(config, args)
+
+    if args.command == 'codec-benchmark':
+        return benchmark_codec(args)
+
+    if args.command == 'memory-benchmark':
+        return benchmark_memory(args)
+
+    if config["database"].get("sharding", {}).get("enabled", False):
+        from fitness_app_users_and_workouts.persistence_layer.sharded_persistence_wrapper \
+            import ShardedPersistenceWrapper
+        db = ShardedPersistenceWrapper(config)
+    else:
+        from fitness_app_users_and_workouts.persistence_layer.mysql_persistence_wrapper \
+            import MySQLPersistenceWrapper
+        db = MySQLPersistenceWrapper(config)
+
+    if args.command == 'export':
+        from fitness_app_users_and_workouts.service_layer.user_exporter \
+            import UserExporter
+        summary = UserExporter(config, db).export(
+            args.output_dir, fmt=args.format, resume=args.resume
+        )
+        print(f"Exported {summary['total_rows']} rows in "
+              f"{summary['seconds']:.1f}s "
+              f"({summary['rows_per_second']:.0f} rows/sec)")
+        return 0
+
+    if args.command == 'refresh-analytics':
+        if not hasattr(db, "stream_completion_changes_with_users"):
+            print("refresh-analytics is not supported in sharded mode.",
+                  file=sys.stderr)
+            return 1
+        from fitness_app_users_and_workouts.service_layer.completion_analytics \
+            import CompletionAnalytics
+        added = CompletionAnalytics(config, db).refresh()
+        print(f"Analytics snapshot refreshed with {added} new completion(s).")
+        return 0
+
+    if args.command == 'compact-exercises':
+        result = db.compact_exercises()
+        print(f"Kept {result['kept']} exercise(s), merged {result['merged']} "
+              f"duplicate(s).")
+        return 0
+
+    if args.command == 'reconcile-catalog':
+        if not hasattr(db, "reconcile_catalog"):
+            print("reconcile-catalog only applies to sharded deployments.",
+                  file=sys.stderr)
+            return 1
+        copied = db.reconcile_catalog()
+        print("Copied " + ", ".join(
+            f"{count} {table}" for table, count in copied.items()
+        ) + " row(s) from shard 0.")
+        return 0
+
+    if args.command == 'rebuild-profiles':
+        from fitness_app_users_and_workouts.persistence_layer.profile_rebuilder \
+            import ProfileRebuilder
+        rebuilt = ProfileRebuilder(config, db).rebuild_pending()
+        print(f"Rebuilt {rebuilt} user profile(s).")
+        return 0
+
+    from fitness_app_users_and_workouts.service_layer.app_services \
+        import AppServices
+    # One-shot commands don't start the background services.
+    service_layer = AppServices(
+        config, db, background=args.command in (None, 'serve', 'replay')
+    )
+
+    if args.command == 'replay':
+        from fitness_app_users_and_workouts.service_layer.workload_replay \
+            import WorkloadReplayer
+        replayer = WorkloadReplayer(config, service_layer)
+        try:
+            report = replayer.replay(
+                replayer.load_trace(args.trace, read_only=args.read_only),
+                rate=args.rate, workers=args.workers, speed=args.speed,
+                duration=args.duration,
+            )
+        finally:
+            service_layer.close()
+        print_replay_report(report)
+        return 1 if report["overall"]["error_rate"] else 0
+
+    workload = config.get("workload", {})
+    if args.record_workload or workload.get("record", False):
+        from fitness_app_users_and_workouts.service_layer.workload_recorder \
+            import WorkloadRecorder
+        service_layer = WorkloadRecorder(config, service_layer,
+                                         args.record_workload)
+
+    if args.command == 'serve':
+        from fitness_app_users_and_workouts.presentation_layer.http_api \
+            import HttpApi
+        HttpApi(config, service_layer).start()
+        return 0
 
+    if args.command is not None:
+        from fitness_app_users_and_workouts.presentation_layer.batch_cli \
+            import BatchCli
+        cli = BatchCli(config, service_layer)
+        try:
+            match args.command:
+                case 'list-users':
+                    return cli.list_users(args.format, args.limit, args.since)
+                case 'list-workouts':
+                    return cli.list_workouts(args.format, args.limit, args.since)
+                case 'user-history':
+                    return cli.user_history(args.user_id, args.format,
+                                            args.limit, args.since)
+                case 'complete':
+                    return cli.complete(args.user_id, args.workout_ids, args.format)
+                case 'favorite':
+                    return cli.favorite(args.user_id, args.workout_ids, args.format)
+                case 'unfavorite':
+                    return cli.unfavorite(args.user_id, args.workout_ids,
+                                          args.format)
+        except DatabaseUnavailableError as e:
+            print(f"Database unavailable: {e}", file=sys.stderr)
+            return 2
+        except PersistenceError as e:
+            print(f"Query failed: {e}", file=sys.stderr)
+            return 1
+        finally:
+            service_layer.close()
 
+    from fitness_app_users_and_workouts.presentation_layer.user_interface \
+        import UserInterface
+    ui = UserInterface(config, service_layer)
+    if args.startup_probe:
+        return probe_startup(ui, service_layer, db)
     ui.start()
+    return 0
+
+
+def check_query_plans(config: dict, args) -> int:
+    """EXPLAIN the wrapper's statements; fail on bad plans or plan changes."""
+    from fitness_app_users_and_workouts.persistence_layer.mysql_persistence_wrapper \
+        import MySQLPersistenceWrapper
+    from fitness_app_users_and_workouts.persistence_layer.query_plan_checker \
+        import QueryPlanChecker
+
+    config = json.loads(json.dumps(config))
+    database = config["database"]
+    database["replicas"] = []
+    database["pool"]["warm_up"] = "eager"
+    if args.database:
+        database["connection"]["config"]["database"] = args.database
+    report = QueryPlanChecker(config, MySQLPersistenceWrapper(config)).check(
+        args.snapshot, update=args.update
+    )
+
+    for name, messages in sorted(report["waived"].items()):
+        for message in messages:
+            print(f"expected  {name}: {message}")
+    for name, messages in sorted(report["problems"].items()):
+        for message in messages:
+            print(f"FAIL      {name}: {message}")
+    if report["diff"]:
+        print("\n".join(report["diff"]))
+    print(f"\nChecked {report['statements']} statement(s): "
+          f"{len(report['problems'])} with bad plans, "
+          + ("snapshot created." if report["created"]
+             else "snapshot updated." if args.update and report["diff"]
+             else "plans changed." if report["diff"]
+             else "plans unchanged."))
+    failed = report["problems"] or (report["diff"] and not args.update)
+    return 1 if failed else 0
+
+
+def probe_startup(ui, service_layer, db) -> int:
+    """Render the menu, run the first query the menu would, report times.
+
+    Prints one JSON line with wall-clock (time.time()) marks, which the
+    startup-time command compares to when it launched this process.
+    """
+    with open(os.devnull, "w") as devnull:
+        stdout, sys.stdout = sys.stdout, devnull
+        try:
+            ui.display_menu()
+        finally:
+            sys.stdout = stdout
+    marks = {"menu": time.time()}
+    try:
+        service_layer.get_users_page(0, ui.page_size,
+                                     items_per_user=ui.max_cell_lines)
+        marks["first_query"] = time.time()
+    except DatabaseUnavailableError as e:
+        marks["error"] = str(e)
+    marks["pools"] = db.get_pool_stats()
+    service_layer.close()
+    print(json.dumps(marks))
+    return 0 if "first_query" in marks else 2
+
+
+def measure_startup_time(args) -> int:
+    """Start the menu in fresh processes; report time to menu and first query."""
+    command = [sys.executable, os.path.abspath(__file__),
+               "-c", args.configfile, "--startup-probe"]
+    runs = []
+    for _ in range(args.runs):
+        launched = time.time()
+        result = subprocess.run(command, capture_output=True, text=True)
+        lines = result.stdout.strip().splitlines()
+        marks = json.loads(lines[-1]) if lines else {}
+        if "first_query" not in marks:
+            print(f"Startup probe failed: "
+                  f"{marks.get('error') or result.stderr.strip()}",
+                  file=sys.stderr)
+            return 2
+        runs.append({
+            "menu": marks["menu"] - launched,
+            "first_query": marks["first_query"] - launched,
+            "pool_ready": max(p["ready_seconds"] or 0 for p in marks["pools"]),
+        })
+
+    print(f"{'':<24}{'median_ms':>12}{'min_ms':>12}{'max_ms':>12}")
+    for key, label in [("menu", "time to menu"),
+                       ("first_query", "time to first query"),
+                       ("pool_ready", "pool warm-up")]:
+        values = [run[key] * 1000 for run in runs]
+        print(f"{label:<24}{statistics.median(values):>12.1f}"
+              f"{min(values):>12.1f}{max(values):>12.1f}")
+    return 0
+
+
+def build_sample_users(count: int) -> list:
+    """Users shaped like get_all_users() results, for benchmarks."""
+    from datetime import timedelta
+    from fitness_app_users_and_workouts.infrastructure_layer.completion \
+        import Completion
+    from fitness_app_users_and_workouts.infrastructure_layer.exercise \
+        import Exercise
+    from fitness_app_users_and_workouts.infrastructure_layer.user import User
+    from fitness_app_users_and_workouts.infrastructure_layer.workout \
+        import Workout
+
+    exercises = []
+    for i in range(1, 251):
+        ex = Exercise()
+        ex.id = i
+        ex.name = f"Exercise {i}"
+        ex.instructions = f"Step-by-step instructions for exercise {i}."
+        exercises.append(ex)
+    workouts = []
+    for i in range(1, 51):
+        w = Workout()
+        w.id = i
+        w.title = f"Workout {i}"
+        w.description = f"Description of workout {i}."
+        w.exercises = [exercises[(i * 5 + k) % len(exercises)]
+                       for k in range(5)]
+        workouts.append(w)
+
+    users = []
+    for i in range(1, count + 1):
+        user = User()
+        user.id = i
+        user.first_name = f"First{i}"
+        user.middle_name = "M"
+        user.last_name = f"Last{i}"
+        user.birthday = date(1980, 1, 1) + timedelta(days=i % 9000)
+        user.gender = "F" if i % 2 else "M"
+        user.completed_workouts = [
+            Completion(i, workouts[(i + k) % len(workouts)],
+                       (date(2024, 1, 1) + timedelta(days=k)).isoformat())
+            for k in range(20)
+        ]
+        user.favorite_workouts = [workouts[(i * 7 + k) % len(workouts)]
+                                  for k in range(3)]
+        users.append(user)
+    return users
 
-    users_list = service_layer.get_all_users_as_json()
-    print(users_list)
 
+def benchmark_codec(args) -> int:
+    """Compare EntityCodec with the JSON path on sample users."""
+    from fitness_app_users_and_workouts.infrastructure_layer.entity_codec \
+        import EntityCodec
 
+    def best_ms(function) -> float:
+        timings = []
+        for _ in range(args.runs):
+            start = time.perf_counter()
+            function()
+            timings.append(time.perf_counter() - start)
+        return min(timings) * 1000
 
-    print("\n=== ALL USERS ===")
-    users = db.select_all_users()
-    for user in users:
-        print(user)
+    users = build_sample_users(args.users)
+    codec = EntityCodec()
+    json_data = json.dumps([u.to_dict() for u in users], default=str).encode()
+    binary_data = codec.encode(users)
 
-    print("\n=== ALL WORKOUTS ===")
-    workouts = db.select_all_workouts()
-    for workout in workouts:
-        print(workout)
+    def read_one() -> None:
+        with codec.view(binary_data) as view:
+            view[len(view) // 2]
 
-    print("\n=== EXERCISES FOR EACH WORKOUT ===")
-    for workout in workouts:
-        print(f"\nWorkout: {workout[1]}")
-        exercises = db.select_workout_exercises(workout[0])
-        for exercise in exercises:
-            print(f"  - {exercise[1]}")
+    rows = [
+        ("json", len(json_data),
+         best_ms(lambda: json.dumps([u.to_dict() for u in users],
+                                    default=str).encode()),
+         best_ms(lambda: json.loads(json_data))),
+        ("binary", len(binary_data),
+         best_ms(lambda: codec.encode(users)),
+         best_ms(lambda: codec.decode(binary_data))),
+        ("binary, one user", len(binary_data), None, best_ms(read_one)),
+    ]
 
-    print("\n=== USER FAVORITE WORKOUTS ===")
-    for user in users:
-        print(f"\nFavorites for {user[1]} {user[3]}:")
-        favorites = db.select_user_favorites(user[0])
-        for fav in favorites:
-            print(f"  💞 {fav[1]}")
+    print(f"{args.users} users, best of {args.runs} runs; json decodes to "
+          f"dicts, binary to entities.")
+    print(f"{'':<20}{'bytes':>12}{'encode_ms':>12}{'decode_ms':>12}")
+    for label, size, encode_ms, decode_ms in rows:
+        encode = f"{encode_ms:>12.1f}" if encode_ms is not None else f"{'-':>12}"
+        print(f"{label:<20}{size:>12}{encode}{decode_ms:>12.3f}")
+    return 0
 
-    print("\n=== USER COMPLETED WORKOUTS ===")
-    for user in users:
-        print(f"\nCompleted workouts for {user[1]} {user[3]}:")
-        completed = db.select_user_completed(user[0])
-        for w in completed:
-            print(f"  ✅ {w[1]} on {w[3]}")
+
+def benchmark_memory(args) -> int:
+    """Compare retained memory of shared and per-row completion workouts."""
+    import copy
+    import tracemalloc
+
+    def per_row_copies(users: list) -> list:
+        # The layout before Completion: each completion row was its own
+        # Workout, with its own exercise list, carrying the date.
+        for user in users:
+            rows = []
+            for completion in user.completed_workouts:
+                workout = copy.deepcopy(completion.workout)
+                workout.date_completed = completion.date_completed
+                rows.append(workout)
+            user.completed_workouts = rows
+        return users
+
+    def retained(build) -> int:
+        tracemalloc.start()
+        try:
+            baseline = tracemalloc.get_traced_memory()[0]
+            users = build()
+            used = tracemalloc.get_traced_memory()[0] - baseline
+            del users
+            return used
+        finally:
+            tracemalloc.stop()
+
+    rows = [
+        ("shared workouts", retained(lambda: build_sample_users(args.users))),
+        ("per-row copies", retained(
+            lambda: per_row_copies(build_sample_users(args.users))
+        )),
+    ]
+
+    print(f"{args.users} users with 20 completions each; traced memory "
+          f"retained by the user list.")
+    print(f"{'':<20}{'MiB':>12}{'bytes/user':>12}")
+    for label, used in rows:
+        print(f"{label:<20}{used / 2**20:>12.1f}{used // args.users:>12}")
+    return 0
+
+
+def print_replay_report(report: dict) -> None:
+    columns = ["calls", "throughput_per_second", "error_rate",
+               "p50_ms", "p95_ms", "p99_ms"]
+    print(f"{'method':<28}" + "".join(f"{c:>22}" for c in columns))
+    rows = list(report["methods"].items()) + [("TOTAL", report["overall"])]
+    for method, summary in rows:
+        print(f"{method:<28}" + "".join(
+            f"{summary[c]:>22.3f}" if isinstance(summary[c], float)
+            else f"{summary[c]:>22}" for c in columns
+        ))
+
+
+def iso_date(text: str) -> str:
+    """Argparse type for YYYY-MM-DD dates; returns the text unchanged."""
+    try:
+        date.fromisoformat(text)
+    except ValueError:
+        raise ArgumentTypeError(f"not a YYYY-MM-DD date: {text!r}")
+    return text
 
 
 def configure_and_parse_commandline_arguments():
     parser = ArgumentParser(
         prog='main.py',
-        description='Start the Fitness App with a configuration file.',
+        description='Start the Fitness App with a configuration file. '
+                    'Without a command, the interactive menu is started.',
         epilog='POC: Olivia Clontz | oliviaclontz@gmail.com'
     )
 
     parser.add_argument('-c', '--configfile',
                         help="Configuration file to load.",
                         required=True)
+
+    parser.add_argument('--record-workload', metavar='PATH',
+                        help="Append every service call to this JSONL trace "
+                             "(default path: workload.trace_path).")
+
+    # Used by startup-time: render the menu once, run one query, exit.
+    parser.add_argument('--startup-probe', action='store_true', help=SUPPRESS)
+
+    commands = parser.add_subparsers(dest='command', metavar='COMMAND')
+
+    def add_output_arguments(command):
+        command.add_argument('--format',
+                             choices=['json', 'csv', 'table'],
+                             default='table',
+                             help="Output format (json is one object per line).")
+        command.add_argument('--limit',
+                             type=int,
+                             help="Maximum number of rows to output.")
+        return command
+
+    list_users = commands.add_parser('list-users',
+                                     help="Stream users.")
+    add_output_arguments(list_users)
+    list_users.add_argument('--since', type=int, default=0, metavar='ID',
+                            help="Only users with an id greater than ID.")
+
+    list_workouts = commands.add_parser('list-workouts',
+                                        help="Stream workouts.")
+    add_output_arguments(list_workouts)
+    list_workouts.add_argument('--since', type=int, default=0, metavar='ID',
+                               help="Only workouts with an id greater than ID.")
+
+    user_history = commands.add_parser('user-history',
+                                       help="Stream a user's completed workouts.")
+    user_history.add_argument('user_id', type=int)
+    add_output_arguments(user_history)
+    user_history.add_argument('--since', type=iso_date, metavar='YYYY-MM-DD',
+                              help="Only completions on or after this date.")
+
+    complete = commands.add_parser('complete',
+                                   help="Mark workouts completed for a user.")
+    complete.add_argument('user_id', type=int)
+    complete.add_argument('workout_ids', type=int, nargs='+')
+    complete.add_argument('--format', choices=['json', 'csv', 'table'],
+                          default='table', help="Output format.")
+
+    favorite = commands.add_parser('favorite',
+                                   help="Favorite workouts for a user.")
+    favorite.add_argument('user_id', type=int)
+    favorite.add_argument('workout_ids', type=int, nargs='+')
+    favorite.add_argument('--format', choices=['json', 'csv', 'table'],
+                          default='table', help="Output format.")
+
+    unfavorite = commands.add_parser('unfavorite',
+                                     help="Remove favorite workouts for a user.")
+    unfavorite.add_argument('user_id', type=int)
+    unfavorite.add_argument('workout_ids', type=int, nargs='+')
+    unfavorite.add_argument('--format', choices=['json', 'csv', 'table'],
+                            default='table', help="Output format.")
+
+    import_command = commands.add_parser(
+        'import', help="Bulk load a CSV/JSONL file in parallel (resumable).")
+    import_command.add_argument('table', choices=['users', 'completions'])
+    import_command.add_argument('file')
+    import_command.add_argument('--workers', type=int,
+                                help="Worker processes (default: CPU count).")
+    import_command.add_argument('--relax-checks', action='store_true',
+                                help="Disable foreign key checks (and unique "
+                                     "checks for users) per loader session.")
+
+    export = commands.add_parser(
+        'export', help="Stream users, history and catalog to gzip files.")
+    export.add_argument('output_dir')
+    export.add_argument('--format', choices=['jsonl', 'csv'], default='jsonl',
+                        help="Export file format.")
+    export.add_argument('--resume', action='store_true',
+                        help="Resume after the last exported user id.")
+
+    commands.add_parser('serve',
+                        help="Serve the HTTP/JSON API.")
+
+    commands.add_parser('compact-exercises',
+                        help="Merge duplicate exercise names (one-off "
+                             "migration step).")
+
+    commands.add_parser('rebuild-profiles',
+                        help="Build missing or stale user profile documents "
+                             "(backfill).")
+
+    commands.add_parser('reconcile-catalog',
+                        help="Copy catalog rows missing on a shard from "
+                             "shard 0 (after a failed replica write).")
+
+    commands.add_parser('refresh-analytics',
+                        help="Append new completions to the NumPy analytics "
+                             "snapshot.")
+
+    check_plans = commands.add_parser(
+        'check-plans',
+        help="EXPLAIN every persistence statement against a seeded database "
+             "and compare the plans with a snapshot.")
+    check_plans.add_argument('--database', default='fitness_app_plans',
+                             help="Seeded schema to explain against "
+                                  "(database/initialize_plan_check.sh).")
+    check_plans.add_argument('--snapshot', default='database/query_plans.json',
+                             help="Plan snapshot file.")
+    check_plans.add_argument('--update', action='store_true',
+                             help="Rewrite the snapshot with the current plans.")
+
+    startup_time = commands.add_parser(
+        'startup-time',
+        help="Measure time to menu and to the first query in fresh processes.")
+    startup_time.add_argument('--runs', type=int, default=5,
+                              help="Number of cold starts to measure.")
+
+    codec_benchmark = commands.add_parser(
+        'codec-benchmark',
+        help="Compare the binary entity codec with JSON on sample users.")
+    codec_benchmark.add_argument('--users', type=int, default=2000,
+                                 help="Number of sample users.")
+    codec_benchmark.add_argument('--runs', type=int, default=5,
+                                 help="Timed runs per measurement.")
+
+    memory_benchmark = commands.add_parser(
+        'memory-benchmark',
+        help="Compare memory of shared and per-row completion workouts.")
+    memory_benchmark.add_argument('--users', type=int, default=2000,
+                                  help="Number of sample users.")
+
+    replay = commands.add_parser(
+        'replay', help="Replay a recorded workload trace and report latency.")
+    replay.add_argument('trace')
+    replay.add_argument('--rate', type=float,
+                        help="Calls per second (default: recorded pacing).")
+    replay.add_argument('--speed', type=float, default=1.0,
+                        help="Speed-up factor for recorded pacing.")
+    replay.add_argument('--workers', type=int, default=8,
+                        help="Concurrent worker threads.")
+    replay.add_argument('--duration', type=float, metavar='SECONDS',
+                        help="Loop the trace for this long.")
+    replay.add_argument('--read-only', action='store_true',
+                        help="Skip calls that write data.")
+
     return parser.parse_args()
 
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
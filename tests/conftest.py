@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The package lives under src/, as for src/main.py.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(__file__)), "src"))
@@ -0,0 +1,83 @@
+from datetime import date, timedelta
+
+from fitness_app_users_and_workouts.service_layer.activity_calendar import ActivityCalendar
+
+
+def calendar_for(days):
+    return ActivityCalendar(lambda user_id: days)
+
+
+def days_from(start, count):
+    return [start + timedelta(days=i) for i in range(count)]
+
+
+def test_no_activity():
+    streaks = calendar_for([]).streaks(1, today=date(2024, 3, 10))
+
+    assert streaks == {"current": 0, "longest": 0, "active_days": 0,
+                       "last_active": None}
+
+
+def test_current_streak_ending_today():
+    days = days_from(date(2024, 3, 8), 3)
+
+    streaks = calendar_for(days).streaks(1, today=date(2024, 3, 10))
+
+    assert streaks["current"] == 3
+    assert streaks["last_active"] == "2024-03-10"
+
+
+def test_current_streak_still_counts_when_only_yesterday_was_active():
+    days = days_from(date(2024, 3, 7), 3)
+
+    assert calendar_for(days).streaks(1, today=date(2024, 3, 10))["current"] == 3
+
+
+def test_current_streak_broken_by_a_missed_day():
+    days = days_from(date(2024, 3, 6), 3)
+
+    assert calendar_for(days).streaks(1, today=date(2024, 3, 10))["current"] == 0
+
+
+def test_longest_streak_is_the_longest_run():
+    days = days_from(date(2024, 1, 1), 5) + days_from(date(2024, 2, 1), 2)
+
+    streaks = calendar_for(days).streaks(1, today=date(2024, 3, 10))
+
+    assert streaks["longest"] == 5
+    assert streaks["current"] == 0
+    assert streaks["active_days"] == 7
+
+
+def test_streaks_run_across_a_year_boundary():
+    days = days_from(date(2023, 12, 29), 6)
+
+    streaks = calendar_for(days).streaks(1, today=date(2024, 1, 3))
+
+    assert streaks["current"] == 6
+    assert streaks["longest"] == 6
+
+
+def test_record_updates_a_cached_user():
+    activity = calendar_for([date(2024, 3, 9)])
+    activity.streaks(1, today=date(2024, 3, 10))
+
+    activity.record(1, date(2024, 3, 10))
+
+    assert activity.streaks(1, today=date(2024, 3, 10))["current"] == 2
+
+
+def test_calendar_weeks_start_on_monday():
+    # 2024-01-01 is a Monday; 2023-01-01 is a Sunday.
+    activity = calendar_for([date(2024, 1, 1), date(2024, 1, 3),
+                             date(2024, 1, 8), date(2023, 1, 1)])
+
+    year = activity.calendar(1, 2024)
+    assert year["active_days"] == 3
+    assert year["weeks"][0] == [1, 0, 1, 0, 0, 0, 0]
+    assert year["weekly_counts"][:2] == [2, 1]
+    assert len(year["weeks"]) == 53
+
+    previous = activity.calendar(1, 2023)
+    assert previous["weeks"][0] == [None] * 6 + [1]
+    assert previous["weekly_counts"][0] == 1
@@ -0,0 +1,61 @@
+from fitness_app_users_and_workouts.service_layer.duplicate_filter import DuplicateFilter
+
+
+def test_unseen_key_is_new():
+    duplicate_filter = DuplicateFilter(expected_keys=1000)
+
+    assert duplicate_filter.check("1:k") == "new"
+
+
+def test_recorded_key_is_a_duplicate():
+    duplicate_filter = DuplicateFilter(expected_keys=1000)
+    duplicate_filter.record("1:k")
+
+    assert duplicate_filter.check("1:k") == "duplicate"
+    assert duplicate_filter.stats()["rejected_duplicates"] == 1
+
+
+def test_key_evicted_from_recent_cache_is_left_to_the_database():
+    duplicate_filter = DuplicateFilter(expected_keys=1000, recent_keys=2)
+    for key in ("1:a", "1:b", "1:c"):
+        duplicate_filter.record(key)
+
+    # Still in the Bloom filter, no longer cached exactly.
+    assert duplicate_filter.check("1:a") == "unknown"
+    assert duplicate_filter.check("1:c") == "duplicate"
+
+
+def test_bloom_filter_resets_at_expected_keys():
+    duplicate_filter = DuplicateFilter(expected_keys=10, recent_keys=1)
+    for i in range(11):
+        duplicate_filter.record(f"1:{i}")
+
+    stats = duplicate_filter.stats()
+    assert stats["bloom_resets"] == 1
+    assert stats["bloom_keys"] == 1
+    assert duplicate_filter.check("1:0") == "new"
+
+
+def test_no_false_negatives_and_few_false_positives():
+    duplicate_filter = DuplicateFilter(expected_keys=5000,
+                                       false_positive_rate=0.01,
+                                       recent_keys=1)
+    for i in range(5000):
+        duplicate_filter.record(f"recorded:{i}")
+
+    assert all(duplicate_filter.check(f"recorded:{i}") != "new"
+               for i in range(5000))
+    positives = sum(duplicate_filter.check(f"other:{i}") != "new"
+                    for i in range(5000))
+    assert positives < 5000 * 0.03
+
+
+def test_unknown_verdict_that_was_new_counts_as_false_positive():
+    duplicate_filter = DuplicateFilter(expected_keys=1000, recent_keys=1)
+    duplicate_filter.record("1:a")
+    duplicate_filter.record("1:b")
+    assert duplicate_filter.check("1:a") == "unknown"
+
+    duplicate_filter.record("1:a", verdict="unknown", was_new=True)
+
+    assert duplicate_filter.stats()["bloom_false_positives_observed"] == 1
@@ -0,0 +1,128 @@
+from datetime import date
+
+import pytest
+
+from fitness_app_users_and_workouts.infrastructure_layer.completion import Completion
+from fitness_app_users_and_workouts.infrastructure_layer.entity_codec import EntityCodec
+from fitness_app_users_and_workouts.infrastructure_layer.exercise import Exercise
+from fitness_app_users_and_workouts.infrastructure_layer.user import User
+from fitness_app_users_and_workouts.infrastructure_layer.workout import Workout
+
+
+def make_workout(workout_id, exercises):
+    workout = Workout()
+    workout.id = workout_id
+    workout.title = f"Workout {workout_id}"
+    workout.description = "Ünïcode description"
+    workout.exercises = exercises
+    return workout
+
+
+def make_exercise(exercise_id):
+    exercise = Exercise()
+    exercise.id = exercise_id
+    exercise.name = f"Exercise {exercise_id}"
+    exercise.instructions = None
+    return exercise
+
+
+@pytest.fixture
+def workouts():
+    squat = make_exercise(1)
+    return [make_workout(1, [squat, make_exercise(2)]),
+            make_workout(2, [squat])]
+
+
+@pytest.fixture
+def users(workouts):
+    first = User()
+    first.id = 1
+    first.first_name = "Ada"
+    first.middle_name = None
+    first.last_name = "Lovelace"
+    first.birthday = date(1990, 12, 10)
+    first.gender = "F"
+    first.completed_workouts = [
+        Completion(1, workouts[0], "2024-03-09"),
+        Completion(1, workouts[0], "2024-03-10"),
+        Completion(1, workouts[1], "not a date"),
+    ]
+    first.favorite_workouts = [workouts[1]]
+
+    second = User()
+    second.id = 2
+    second.first_name = "x" * 70000
+    second.birthday = "1985-01-31"
+    return [first, second]
+
+
+def test_users_round_trip(users):
+    codec = EntityCodec()
+
+    decoded = codec.decode(codec.encode(users))
+
+    assert [u.to_dict() for u in decoded] == [u.to_dict() for u in users]
+    assert decoded[0].birthday == date(1990, 12, 10)
+    assert decoded[1].birthday == "1985-01-31"
+
+
+def test_single_entity_decodes_to_an_entity(users):
+    codec = EntityCodec()
+
+    decoded = codec.decode(codec.encode(users[0]))
+
+    assert isinstance(decoded, User)
+    assert decoded.to_dict() == users[0].to_dict()
+
+
+def test_workouts_round_trip(workouts):
+    codec = EntityCodec()
+
+    decoded = codec.decode(codec.encode(workouts))
+
+    assert [w.to_dict() for w in decoded] == [w.to_dict() for w in workouts]
+
+
+def test_completions_round_trip(workouts):
+    codec = EntityCodec()
+    completions = [Completion(1, workouts[0], "2024-03-10"),
+                   Completion(2, None, "2024-03-11")]
+    completions[1].workout_id = 9
+
+    decoded = codec.decode(codec.encode(completions))
+
+    assert [c.to_dict() for c in decoded] == [c.to_dict() for c in completions]
+    assert decoded[1].workout is None
+    assert decoded[1].workout_id == 9
+
+
+def test_completions_of_one_workout_share_it_after_decoding(users):
+    codec = EntityCodec()
+
+    decoded = codec.decode(codec.encode(users[0]))
+
+    first, second, third = decoded.completed_workouts
+    assert first.workout is second.workout
+    assert third.workout is decoded.favorite_workouts[0]
+    assert third.workout.exercises[0] is first.workout.exercises[0]
+
+
+def test_view_decodes_items_on_access(users):
+    codec = EntityCodec()
+
+    with codec.view(codec.encode(users)) as entities:
+        assert len(entities) == 2
+        assert entities[-1].id == 2
+        assert [u.id for u in entities[:1]] == [1]
+        with pytest.raises(IndexError):
+            entities[2]
+
+
+def test_mixed_entity_list_is_rejected(users, workouts):
+    with pytest.raises(ValueError):
+        EntityCodec().encode([users[0], workouts[0]])
+
+
+def test_foreign_buffer_is_rejected():
+    with pytest.raises(ValueError):
+        EntityCodec().decode(b"not an encoded entity")
@@ -0,0 +1,127 @@
+import pytest
+
+from fitness_app_users_and_workouts.persistence_layer import resilience
+from fitness_app_users_and_workouts.persistence_layer.resilience import (
+    CircuitBreaker, CircuitOpenError, DatabaseUnavailableError, QueryError,
+    classify_error,
+)
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(resilience.time, "monotonic", clock)
+    return clock
+
+
+def test_opens_after_failure_threshold(clock):
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=5)
+    breaker.before_call()
+    breaker.record_failure()
+    assert not breaker.is_open
+
+    breaker.before_call()
+    breaker.record_failure()
+
+    assert breaker.is_open
+    with pytest.raises(CircuitOpenError) as raised:
+        breaker.before_call()
+    assert raised.value.retry_after == 5
+    assert raised.value.retry_safe
+    assert breaker.stats()["rejected_calls"] == 1
+
+
+def test_success_resets_consecutive_failures(clock):
+    breaker = CircuitBreaker(failure_threshold=2)
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+
+    assert not breaker.is_open
+    assert breaker.stats()["consecutive_failures"] == 1
+
+
+def test_half_open_after_reset_timeout_admits_limited_probes(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=5,
+                             half_open_max_calls=2)
+    breaker.record_failure()
+    clock.now += 5
+
+    breaker.before_call()
+    breaker.before_call()
+    assert breaker.stats()["state"] == CircuitBreaker.HALF_OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+
+def test_probe_success_closes_the_circuit(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=5)
+    breaker.record_failure()
+    clock.now += 5
+    breaker.before_call()
+
+    breaker.record_success()
+
+    assert breaker.stats()["state"] == CircuitBreaker.CLOSED
+    breaker.before_call()
+
+
+def test_probe_failure_reopens_the_circuit(clock):
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=5)
+    for _ in range(3):
+        breaker.record_failure()
+    clock.now += 5
+    breaker.before_call()
+
+    breaker.record_failure()
+
+    assert breaker.is_open
+    assert breaker.stats()["times_opened"] == 2
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+
+def test_classify_error_keeps_persistence_errors():
+    error = QueryError("bad statement")
+
+    assert classify_error(error) is error
+
+
+@pytest.fixture
+def mysql_errors():
+    return pytest.importorskip("mysql.connector.errors")
+
+
+@pytest.mark.parametrize("errno, retry_safe", [
+    (2003, True),   # can't connect: never sent
+    (1213, True),   # deadlock: rolled back
+    (2013, False),  # lost mid-statement: may have landed
+])
+def test_classify_error_unavailable(mysql_errors, errno, retry_safe):
+    classified = classify_error(
+        mysql_errors.OperationalError(msg="down", errno=errno))
+
+    assert isinstance(classified, DatabaseUnavailableError)
+    assert classified.retry_safe is retry_safe
+
+
+def test_classify_error_pool_exhausted_is_retry_safe(mysql_errors):
+    classified = classify_error(mysql_errors.PoolError(msg="exhausted"))
+
+    assert isinstance(classified, DatabaseUnavailableError)
+    assert classified.retry_safe
+
+
+def test_classify_error_rejected_statement_is_query_error(mysql_errors):
+    classified = classify_error(
+        mysql_errors.ProgrammingError(msg="syntax", errno=1064))
+
+    assert isinstance(classified, QueryError)
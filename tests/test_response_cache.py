@@ -0,0 +1,61 @@
+from fitness_app_users_and_workouts.service_layer.response_cache import ResponseCache
+
+
+def test_hit_while_versions_are_current():
+    cache = ResponseCache()
+    cache.put(("users",), (1, 2), b"[]")
+
+    assert cache.get(("users",), (1, 2)) == b"[]"
+    assert cache.stats()["hits"] == 1
+
+
+def test_version_change_invalidates_only_that_entry():
+    cache = ResponseCache()
+    cache.put(("users",), (1,), b"users")
+    cache.put(("workouts",), (7,), b"workouts")
+
+    assert cache.get(("users",), (2,)) is None
+    assert cache.get(("workouts",), (7,)) == b"workouts"
+    stats = cache.stats()
+    assert stats["invalidations"] == 1
+    assert stats["entries"] == 1
+    assert stats["bytes"] == len(b"workouts")
+
+
+def test_evicts_least_recently_used_over_max_bytes():
+    cache = ResponseCache(max_bytes=10)
+    cache.put(("a",), (1,), b"aaaa")
+    cache.put(("b",), (1,), b"bbbb")
+    cache.get(("a",), (1,))
+    cache.put(("c",), (1,), b"cccc")
+
+    assert cache.get(("b",), (1,)) is None
+    assert cache.get(("a",), (1,)) == b"aaaa"
+    assert cache.get(("c",), (1,)) == b"cccc"
+    assert cache.stats()["evictions"] == 1
+
+
+def test_payload_larger_than_the_cache_is_not_stored():
+    cache = ResponseCache(max_bytes=4)
+    cache.put(("big",), (1,), b"too large")
+
+    assert cache.get(("big",), (1,)) is None
+    assert cache.stats()["bytes"] == 0
+
+
+def test_put_replaces_entry_and_its_size():
+    cache = ResponseCache()
+    cache.put(("users",), (1,), b"old payload")
+    cache.put(("users",), (2,), b"new")
+
+    assert cache.get(("users",), (2,)) == b"new"
+    assert cache.stats()["bytes"] == 3
+
+
+def test_hit_ratio():
+    cache = ResponseCache()
+    cache.put(("users",), (1,), b"[]")
+    cache.get(("users",), (1,))
+    cache.get(("missing",), (1,))
+
+    assert cache.stats()["hit_ratio"] == 0.5